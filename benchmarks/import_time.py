@@ -0,0 +1,77 @@
+"""
+Benchmark dei tempi di avvio: ogni import viene misurato in un interprete
+nuovo (cold start), ripetuto più volte; si riporta la mediana e quali
+librerie pesanti finiscono in memoria.
+
+Uso: python benchmarks/import_time.py [--repeat 5]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('statsmodels', 'sklearn', 'plotly', 'matplotlib', 'scipy')
+
+SCENARIOS = {
+    "pandas (riferimento)": "import pandas",
+    "main": "import main",
+    "src.model": "import src.model",
+    "src.validator": "import src.validator",
+    "src.visualizer": "import src.visualizer",
+    "src.pricing": "import src.pricing",
+    "src.server": "import src.server",
+    # Lookup puntuale dal modello già nel registro (nessuna stima)
+    "prezzo dal registro": (
+        "from src.data_loader import DataLoader\n"
+        "from src.model import GasModel\n"
+        "df = DataLoader(os.path.join(BASE_DIR, 'data', 'Nat_Gas.csv')).get_clean_data()\n"
+        "m = GasModel(save_dir=os.path.join(BASE_DIR, 'models'))\n"
+        "m.load_or_train(df['Prices'])\n"
+        "m.predict_value('12/31/25', df[['Prices']])"
+    ),
+}
+
+PROBE = """
+import os, sys, io, json, time, contextlib
+BASE_DIR = {base!r}
+sys.path.insert(0, BASE_DIR)
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"time": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(code, repeat):
+    script = PROBE.format(base=BASE_DIR, heavy=HEAVY_MODULES,
+                          code="\n".join("    " + line for line in code.splitlines()))
+    runs = []
+    # Il primo run non conta: scalda la cache del disco (e addestra il modello se manca)
+    for _ in range(repeat + 1):
+        out = subprocess.run([sys.executable, "-c", script], cwd=BASE_DIR,
+                             capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(r['time'] for r in runs[1:]), runs[-1]['loaded']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'Scenario':<24}{'Mediana':>10}   Librerie pesanti caricate")
+    for name, code in SCENARIOS.items():
+        try:
+            elapsed, loaded = measure(code, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<24}{'ERRORE':>10}   {e.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"{name:<24}{elapsed * 1000:>8.0f}ms   {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
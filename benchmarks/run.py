@@ -0,0 +1,317 @@
+"""
+Suite di benchmark: ricerca degli ordini, fit dei motori veloci, previsione, lookup dei prezzi,
+valutazione dei contratti, greche del portafoglio, resample giornaliero e dashboard.
+Ogni caso viene misurato su più taglie (lunghezza dello storico, orizzonte,
+numero di eventi): tempo mediano, picco di memoria (tracemalloc) ed esponente
+empirico di scala (pendenza log-log). I risultati si confrontano con una
+baseline JSON e il comando esce con codice 1 se un caso peggiora oltre la soglia.
+
+Uso:
+    python benchmarks/run.py --save-baseline          # registra la baseline
+    python benchmarks/run.py                          # confronta con la baseline
+    python benchmarks/run.py --quick --cases lookup   # solo alcuni casi, taglie ridotte
+"""
+import gc
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import functools
+import contextlib
+import statistics
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from synthetic import write_series
+from src.data_loader import DataLoader
+from src.model import GasModel
+from src.forecasters import HoltWintersForecaster, HarmonicForecaster
+from src.pricing import StorageContract
+from src.registry import library_versions
+from src.utils import to_daily_resolution
+
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+# Sotto questa differenza assoluta un rallentamento è considerato rumore
+NOISE_FLOOR_S = 0.002
+
+CASES = {}
+
+
+def case(name, param, sizes, quick, repeat=5):
+    """Registra un caso: 'setup(size)' prepara i dati e restituisce la funzione da misurare."""
+    def register(setup):
+        CASES[name] = {"param": param, "sizes": sizes, "quick": quick, "repeat": repeat, "setup": setup}
+        return setup
+    return register
+
+
+@functools.lru_cache(maxsize=None)
+def _history(n_months):
+    return DataLoader(write_series(n_months)).get_clean_data()
+
+
+@functools.lru_cache(maxsize=None)
+def _fitted_model(n_months):
+    """Modello con ordini fissi stimato sulla serie sintetica (niente ricerca, niente registro)."""
+    model = GasModel(save_dir=tempfile.mkdtemp(prefix="gas_bench_"), use_registry=False)
+    model.best_order, model.best_seasonal = (0, 1, 1), (0, 1, 1, 12)
+    model._validate_and_train(_history(n_months)['Prices'])
+    return model
+
+
+def _future_dates(df, n, days=730):
+    """n date (anche ripetute) distribuite sui 'days' giorni successivi allo storico."""
+    offsets = np.linspace(1, days, n).astype(int)
+    return list(df.index.max() + pd.to_timedelta(offsets, unit='D'))
+
+
+def _schedule(df, n_events):
+    dates = [d.strftime('%m/%d/%y') for d in _future_dates(df, n_events)]
+    # Blocchi alterni di iniezioni e prelievi
+    inj = [d for i, d in enumerate(dates) if (i // 10) % 2 == 0]
+    wit = [d for i, d in enumerate(dates) if (i // 10) % 2 == 1]
+    return inj, wit
+
+
+@case("fit", "mesi di storico", [48, 96, 144], [48], repeat=1)
+def bench_fit(n_months):
+    series = _history(n_months)['Prices']
+    model = GasModel(search='stepwise', n_jobs=1, use_registry=False)
+    return lambda: model._optimize_params(series)
+
+
+@case("fit_holt_winters", "mesi di storico", [48, 192, 600], [48, 192])
+def bench_fit_holt_winters(n_months):
+    series = _history(n_months)['Prices']
+    return lambda: HoltWintersForecaster().fit(series)
+
+
+@case("fit_harmonic", "mesi di storico", [48, 192, 600], [48, 192])
+def bench_fit_harmonic(n_months):
+    series = _history(n_months)['Prices']
+    return lambda: HarmonicForecaster().fit(series)
+
+
+@case("forecast", "orizzonte (mesi)", [12, 60, 240], [12, 60])
+def bench_forecast(steps):
+    model = _fitted_model(48)
+
+    def run():
+        model._invalidate_forecast_cache()
+        model.get_cached_forecast(steps)
+    return run
+
+
+@case("lookup", "mesi di storico", [48, 192, 600], [48, 192])
+def bench_lookup(n_months):
+    df = _history(n_months)[['Prices']]
+    model = _fitted_model(48)
+    hist_date = df.index[len(df) // 2].strftime('%m/%d/%y')
+
+    def run():
+        model.predict_value(hist_date, df)
+        model.predict_value('03/15/26', df)
+    return run
+
+
+@case("lookup_batch", "numero di date", [100, 10_000, 100_000], [100, 10_000])
+def bench_lookup_batch(n_dates):
+    df = _history(48)[['Prices']]
+    model = _fitted_model(48)
+    dates = _future_dates(df, n_dates)
+    return lambda: model.predict_values(dates, df)
+
+
+@case("valuation", "eventi", [10, 100, 1000], [10, 100], repeat=3)
+def bench_valuation(n_events):
+    df = _history(48)[['Prices']]
+    model = _fitted_model(48)
+    inj, wit = _schedule(df, n_events)
+    return lambda: StorageContract().calculate_valuation(inj, wit, model, df)
+
+
+@case("valuation_vectorized", "eventi", [10, 1000, 100_000], [10, 1000])
+def bench_valuation_vectorized(n_events):
+    df = _history(48)[['Prices']]
+    model = _fitted_model(48)
+    inj, wit = _schedule(df, n_events)
+    return lambda: StorageContract().calculate_valuation_vectorized(inj, wit, model, df)
+
+
+@case("greeks_book", "contratti", [10, 100, 1000], [10, 100], repeat=3)
+def bench_greeks_book(n_contracts):
+    from src.sensitivities import SensitivityEngine
+
+    df = _history(48)[['Prices']]
+    model = _fitted_model(48)
+    inj, wit = _schedule(df, 40)
+    contracts = pd.DataFrame({"injection_dates": [inj] * n_contracts, "withdrawal_dates": [wit] * n_contracts},
+                             index=pd.Index(range(n_contracts), name='contract_id'))
+    return lambda: SensitivityEngine(model, df).book_greeks(contracts)
+
+
+@case("daily_resolution", "mesi di storico", [48, 192, 600], [48, 192])
+def bench_daily_resolution(n_months):
+    df = _history(n_months)[['Prices']]
+    return lambda: to_daily_resolution(df)
+
+
+@case("dashboard", "mesi di storico", [48, 192, 600], [48], repeat=3)
+def bench_dashboard(n_months):
+    from src.visualizer import GasVisualizer
+
+    df = _history(n_months)[['Prices']]
+    model = _fitted_model(n_months)
+    pred, conf = model.get_forecast_for_plot(steps=24)
+    return lambda: GasVisualizer.create_dashboard(df, pred.copy(), conf)
+
+
+def measure(fn, repeat):
+    """Tempo mediano e minimo su 'repeat' esecuzioni (dopo un riscaldamento) e picco di memoria."""
+    if repeat > 1:
+        fn()
+    times = []
+    # Come timeit: il garbage collector non interviene durante le misure
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    # Esecuzione separata: tracemalloc rallenta e falserebbe i tempi
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"median_s": statistics.median(times), "min_s": min(times), "peak_mb": peak / 2**20}
+
+
+def scaling_exponent(sizes, times):
+    """Pendenza log-log tempo/taglia: ~0 costante, ~1 lineare, ~2 quadratico."""
+    if len(sizes) < 2:
+        return None
+    return float(np.polyfit(np.log(sizes), np.log(times), 1)[0])
+
+
+def run_suite(names, quick=False):
+    results = {}
+    for name in names:
+        spec = CASES[name]
+        sizes = spec['quick'] if quick else spec['sizes']
+        rows = {}
+        for size in sizes:
+            # I messaggi di modello e pricing non interessano qui
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn = spec['setup'](size)
+                rows[str(size)] = measure(fn, spec['repeat'])
+            r = rows[str(size)]
+            print(f"   {name:<22}{spec['param'] + ' = ' + str(size):<28}"
+                  f"{r['median_s'] * 1000:>10.2f} ms {r['peak_mb']:>9.2f} MB")
+
+        exponent = scaling_exponent([float(s) for s in sizes], [rows[str(s)]['median_s'] for s in sizes])
+        if exponent is not None:
+            print(f"   {name:<22}{'scala ~ taglia^' + f'{exponent:.2f}':<28}")
+        results[name] = {"param": spec['param'], "sizes": rows, "scaling_exponent": exponent}
+    return results
+
+
+def compare(results, baseline, threshold, mem_threshold):
+    """Elenco delle regressioni rispetto alla baseline (solo casi e taglie presenti in entrambe)."""
+    regressions = []
+    for name, res in results.items():
+        base_case = baseline.get('cases', {}).get(name, {}).get('sizes', {})
+        for size, r in res['sizes'].items():
+            base = base_case.get(size)
+            if base is None:
+                continue
+            slower = r['median_s'] / base['median_s'] - 1
+            if slower > threshold and r['median_s'] - base['median_s'] > NOISE_FLOOR_S:
+                regressions.append(f"{name}[{size}] tempo {base['median_s'] * 1000:.2f} -> "
+                                   f"{r['median_s'] * 1000:.2f} ms (+{slower:.0%})")
+            heavier = r['peak_mb'] / base['peak_mb'] - 1 if base['peak_mb'] > 0 else 0
+            if heavier > mem_threshold:
+                regressions.append(f"{name}[{size}] memoria {base['peak_mb']:.2f} -> "
+                                   f"{r['peak_mb']:.2f} MB (+{heavier:.0%})")
+    return regressions
+
+
+def _metadata():
+    return {
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "versions": library_versions()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark di performance del Quant Gas Pricing System")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--quick', action='store_true', help="Solo le taglie ridotte")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="Sovrascrive la baseline con questi risultati")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Rallentamento tollerato (0.25 = +25%%)")
+    parser.add_argument('--mem-threshold', type=float, default=0.25, help="Aumento di memoria tollerato")
+    parser.add_argument('--out', help="Salva anche i risultati di questa esecuzione (JSON)")
+    args = parser.parse_args()
+
+    print(f">> Benchmark: {', '.join(args.cases)}{' (quick)' if args.quick else ''}")
+    start = time.perf_counter()
+    report = {"meta": _metadata(), "cases": run_suite(args.cases, args.quick)}
+    print(f">> Completato in {time.perf_counter() - start:.1f}s")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        # Si aggiornano solo i casi eseguiti: gli altri restano quelli già registrati
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            baseline['cases'].update(report['cases'])
+            baseline['meta'] = report['meta']
+        else:
+            baseline = report
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"✅ Baseline salvata: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ Nessuna baseline in {args.baseline}: usa --save-baseline per crearla.")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['meta'].get('versions') != report['meta']['versions']:
+        print("⚠️ Baseline registrata con versioni diverse delle librerie: confronto indicativo.")
+
+    regressions = compare(report['cases'], baseline, args.threshold, args.mem_threshold)
+    if regressions:
+        print(f"❌ {len(regressions)} regressioni oltre la soglia:")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+
+    print("✅ Nessuna regressione rispetto alla baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
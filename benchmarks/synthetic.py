@@ -0,0 +1,68 @@
+"""
+Serie sintetiche di prezzi gas (mensili, fine mese) per i benchmark.
+Stesso formato di data/Nat_Gas.csv (Dates MM/GG/AA, Prices): trend lineare,
+stagionalità invernale e rumore AR(1), generate in modo deterministico dal seed.
+Tutte le serie terminano alla stessa data dello storico reale, così le date di
+previsione usate nei benchmark restano valide a qualunque lunghezza.
+
+Uso: python benchmarks/synthetic.py --lengths 48 192 600
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYNTHETIC_DIR = os.path.join(BASE_DIR, 'data', 'synthetic')
+END_DATE = '2024-09-30'
+# L'anno a due cifre (MM/GG/AA) viene riletto con il pivot di %y (69-99 -> 19xx, 00-68 -> 20xx):
+# la serie non può iniziare prima del 1969. 600 mesi da END_DATE partono da ottobre 1974.
+MAX_MONTHS = 600
+
+
+def make_series(n_months, seed=0):
+    if not 24 <= n_months <= MAX_MONTHS:
+        raise ValueError(f"Lunghezza non valida: {n_months} (24-{MAX_MONTHS} mesi)")
+
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=END_DATE, periods=n_months, freq='ME')
+    t = np.arange(n_months)
+
+    noise = np.zeros(n_months)
+    shocks = rng.normal(0, 0.25, n_months)
+    for i in range(1, n_months):
+        noise[i] = 0.6 * noise[i - 1] + shocks[i]
+
+    # Picco invernale (gennaio), minimo estivo
+    seasonal = 0.8 * np.cos(2 * np.pi * (dates.month.values - 1) / 12)
+    prices = 10 + 0.02 * t + seasonal + noise
+    return pd.DataFrame({'Prices': prices.round(4)}, index=pd.DatetimeIndex(dates, name='Dates'))
+
+
+def series_path(n_months, seed=0):
+    return os.path.join(SYNTHETIC_DIR, f"gas_{n_months}m_s{seed}.csv")
+
+
+def write_series(n_months, seed=0):
+    """Scrive la serie (se non esiste già) e ne restituisce il percorso."""
+    path = series_path(n_months, seed)
+    if not os.path.exists(path):
+        os.makedirs(SYNTHETIC_DIR, exist_ok=True)
+        df = make_series(n_months, seed)
+        df.index = df.index.strftime('%m/%d/%y')
+        df.to_csv(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera serie sintetiche in data/synthetic/")
+    parser.add_argument('--lengths', type=int, nargs='+', default=[48, 96, 192, 600])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for n in args.lengths:
+        print(f">> {write_series(n, args.seed)}")
+
+
+if __name__ == "__main__":
+    main()
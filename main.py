@@ -1,14 +1,43 @@
 import os
 import sys
-from src.pricing import StorageContract
-# Aggiungi l'import del nuovo validator
+import time
+import argparse
+import contextlib
+import pandas as pd
 from src.data_loader import DataLoader
-from src.model import GasModel
-from src.visualizer import GasVisualizer
-from src.validator import GasValidator 
+from src import instrumentation
+
+# Le librerie pesanti (statsmodels, plotly, matplotlib) vengono importate
+# solo dai comandi che le usano: la modalità batch resta veloce da avviare.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _ask_schedule():
+    print("\nInserisci le date (formato MM/GG/AA). Lascia vuoto per terminare la lista.")
+    
+    inj_dates = []
+    print(">> Inserisci date di INIEZIONE (Acquisto):")
+    while True:
+        d = input("   Data Inj: ")
+        if d == "": break
+        inj_dates.append(d)
+        
+    wit_dates = []
+    print(">> Inserisci date di PRELIEVO (Vendita):")
+    while True:
+        d = input("   Data With: ")
+        if d == "": break
+        wit_dates.append(d)
+        
+    return inj_dates, wit_dates
 
 def main():
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    from src.pricing import StorageContract
+    from src.optimizer import StorageOptimizer
+    from src.model import GasModel
+    from src.visualizer import GasVisualizer
+    from src.validator import GasValidator
+
     DATA_PATH = os.path.join(BASE_DIR, 'data', 'Nat_Gas.csv')
     
     print("\n" + "="*50)
@@ -25,7 +54,7 @@ def main():
         return
 
     # 2. Modello (Core Logic)
-    model_system = GasModel(save_dir=os.path.join(BASE_DIR, 'models'))
+    model_system = GasModel(save_dir=os.path.join(BASE_DIR, 'models'), n_jobs=-1)
     model_system.load_or_train(df['Prices'])
 
     # 3. Validazione & Quality Assurance 
@@ -44,7 +73,7 @@ def main():
     # 4. Generazione Grafico Dashboard
     print("\n>> Generazione Dashboard...")
     pred, conf = model_system.get_forecast_for_plot(steps=24)
-    fig = GasVisualizer.create_dashboard(df[['Prices']], pred, conf)
+    fig = GasVisualizer.create_dashboard(df[['Prices']], pred, conf, label=model_system.label)
     fig.show()
 
     # 5. Sezione Pricing (Nuova)
@@ -66,21 +95,17 @@ def main():
                                    storage_cost=0.10)
         
         
-        print("\nInserisci le date (formato MM/GG/AA). Lascia vuoto per terminare la lista.")
-        
-        inj_dates = []
-        print(">> Inserisci date di INIEZIONE (Acquisto):")
-        while True:
-            d = input("   Data Inj: ")
-            if d == "": break
-            inj_dates.append(d)
-            
-        wit_dates = []
-        print(">> Inserisci date di PRELIEVO (Vendita):")
-        while True:
-            d = input("   Data With: ")
-            if d == "": break
-            wit_dates.append(d)
+        do_optimize = input(">> Vuoi calcolare la strategia ottimale (24 mesi)? [y/n]: ").lower()
+        if do_optimize == 'y':
+            last_date = df.index.max()
+            value, df_ledger, schedule = StorageOptimizer(contract).solve(
+                model_system, df[['Prices']],
+                last_date + pd.Timedelta(days=1), last_date + pd.DateOffset(months=24))
+            inj_dates = schedule['Date'][schedule['Action'] == 'INJECTION'].dt.strftime('%m/%d/%y').tolist()
+            wit_dates = schedule['Date'][schedule['Action'] == 'WITHDRAWAL'].dt.strftime('%m/%d/%y').tolist()
+            print(f">> Strategia ottimale: {len(inj_dates)} giorni di iniezione, {len(wit_dates)} di prelievo.")
+        else:
+            inj_dates, wit_dates = _ask_schedule()
             
         if inj_dates and wit_dates:
             # Calcolo
@@ -115,6 +140,269 @@ def main():
         else:
             print(f"   ❌ {msg}")
 
-if __name__ == "__main__":
+# --- Modalità batch (non interattiva) ---
+
+@contextlib.contextmanager
+def _stage(name, timings):
+    """Misura il tempo di una fase e lo stampa a fine fase."""
+    start = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - start
+    print(f">> [{name}] {timings[name]:.2f}s")
+
+
+def _read_table(path):
+    reader = DataLoader.COLUMNAR_FORMATS.get(os.path.splitext(path)[1].lower(), pd.read_csv)
+    return reader(path)
+
+
+def _write_table(df, path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        df.to_parquet(path, index=False)
+    elif ext in ('.feather', '.arrow'):
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+    print(f">> Scritto: {path} ({len(df)} righe)")
+
+
+def _parse_dates(values):
+    """Date da file: datetime (Parquet) o stringhe in qualunque formato riconoscibile (MM/GG/AA, ISO...)."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.DatetimeIndex(values)
+    return pd.DatetimeIndex(pd.to_datetime(values, format='mixed', errors='coerce'))
+
+
+def _load_model(args, df, timings):
+    # L'import di statsmodels fa parte del costo della fase
+    with _stage("modello", timings):
+        from src.model import GasModel
+
+        engine = None
+        if args.engine != 'sarima':
+            from src.forecasters import make_engine
+
+            engine = make_engine(args.engine)
+            if args.engine == 'ensemble':
+                # Pesi dagli errori di walk-forward dei membri
+                print(engine.calibrate(df[['Prices']], n_jobs=args.n_jobs)
+                      .to_string(float_format=lambda x: f"{x:.3f}"))
+
+        model_system = GasModel(save_dir=args.models, n_jobs=args.n_jobs, search=args.search, engine=engine)
+        model_system.load_or_train(df['Prices'])
+    return model_system
+
+
+def _cmd_train(args, df, timings):
+    model_system = _load_model(args, df, timings)
+    if model_system.engine is not None:
+        print(f"✅ Modello: {model_system.label} | Fit: {model_system.engine.fit_time * 1000:.2f} ms")
+        return
+    print(f"✅ Modello: {model_system.label} | AIC: {model_system.results.aic:.2f}")
+
+
+def _cmd_backtest(args, df, timings):
+    from src.backtest import WalkForwardBacktest
+
+    model_system = _load_model(args, df, timings)
+    with _stage("backtest", timings):
+        engine = WalkForwardBacktest(model_system.best_order, model_system.best_seasonal,
+                                     horizons=args.horizons, n_jobs=args.n_jobs, forecaster=model_system.engine)
+        errors, metrics = engine.run(df[['Prices']], n_origins=args.origins)
+    print(metrics.to_string(float_format=lambda x: f"{x:.2f}"))
+
+    if args.out:
+        with _stage("scrittura", timings):
+            _write_table(errors, args.out)
+
+
+def _cmd_price(args, df, timings):
+    with _stage("lettura date", timings):
+        table = _read_table(args.dates)
+        column = args.column or table.columns[0]
+        dates = _parse_dates(table[column])
+
+    model_system = _load_model(args, df, timings)
+    with _stage("pricing", timings):
+        if args.quantiles:
+            priced = model_system.predict_quantiles(dates, df[['Prices']], args.quantiles)
+        else:
+            priced = model_system.predict_values(dates, df[['Prices']])
+    print(f">> {priced['Price'].notna().sum()}/{len(priced)} date prezzate")
+
+    with _stage("scrittura", timings):
+        _write_table(priced, args.out)
 
+
+def _read_contracts(path, timings):
+    from src.portfolio import CONTRACT_PARAMS
+
+    with _stage("lettura schedule", timings):
+        # Formato lungo: una riga per evento (contract_id, Date, Action) più
+        # eventuali parametri contrattuali, presi dalla prima riga di ogni contratto
+        events = _read_table(path)
+        events['Date'] = _parse_dates(events['Date'])
+        invalid = events['Date'].isna()
+        if invalid.any():
+            print(f"⚠️ {invalid.sum()} eventi con data non valida ignorati.")
+            events = events[~invalid]
+
+        action = events['Action'].str.upper()
+        grouped = events.groupby('contract_id', sort=False)
+        contracts = pd.DataFrame({
+            'injection_dates': events['Date'].where(action == 'INJECTION').groupby(events['contract_id'], sort=False)
+                                             .agg(lambda d: list(d.dropna())),
+            'withdrawal_dates': events['Date'].where(action == 'WITHDRAWAL').groupby(events['contract_id'], sort=False)
+                                              .agg(lambda d: list(d.dropna()))
+        })
+        params = [c for c in CONTRACT_PARAMS if c in events.columns]
+        if params:
+            contracts = contracts.join(grouped[params].first())
+    return contracts
+
+
+def _cmd_value(args, df, timings):
+    from src.portfolio import StoragePortfolio
+
+    contracts = _read_contracts(args.schedules, timings)
+    model_system = _load_model(args, df, timings)
+    with _stage("valutazione", timings):
+        portfolio = StoragePortfolio(model_system, df[['Prices']], n_jobs=args.n_jobs)
+        summary, ledgers = portfolio.value(contracts, keep_ledgers=bool(args.ledgers))
+    print(f">> {len(summary)} contratti | NPV totale: ${summary['NPV'].sum():,.2f}")
+
+    with _stage("scrittura", timings):
+        _write_table(summary, args.out)
+        if args.ledgers:
+            _write_table(pd.concat(ledgers, names=['contract_id', None]).reset_index(level=0), args.ledgers)
+
+
+def _cmd_risk(args, df, timings):
+    from src.sensitivities import SensitivityEngine
+
+    contracts = _read_contracts(args.schedules, timings)
+    model_system = _load_model(args, df, timings)
+    with _stage("greche", timings):
+        engine = SensitivityEngine(model_system, df[['Prices']],
+                                   curve_bump=args.curve_bump, param_bump=args.param_bump)
+        summary, deltas = engine.book_greeks(contracts)
+    print(f">> Delta parallelo del libro: {summary['parallel_delta'].sum():,.0f} $ per $1/MMBtu")
+
+    with _stage("scrittura", timings):
+        _write_table(summary, args.out)
+        if args.deltas:
+            deltas.columns = deltas.columns.strftime('%Y-%m')
+            _write_table(deltas.reset_index(), args.deltas)
+
+
+def _cmd_plot(args, df, timings):
+    model_system = _load_model(args, df, timings)
+
+    from src.visualizer import GasVisualizer
+
+    with _stage("grafico", timings):
+        pred, conf = model_system.get_forecast_for_plot(steps=args.steps)
+        fig = GasVisualizer.create_dashboard(df[['Prices']], pred, conf, mode=args.mode,
+                                             max_points=args.max_points, downsample=args.downsample,
+                                             label=model_system.label)
+        GasVisualizer.save(fig, args.out)
+    print(f">> Scritto: {args.out}")
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(
+        description="Quant Gas Pricing System - modalità batch (senza argomenti parte la modalità interattiva).")
+    parser.add_argument('--data', default=os.path.join(BASE_DIR, 'data', 'Nat_Gas.csv'),
+                        help="Serie storica (CSV, Parquet o Feather)")
+    parser.add_argument('--models', default=os.path.join(BASE_DIR, 'models'), help="Cartella dei modelli")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Processi (1 = seriale, -1 = tutti i core)")
+    parser.add_argument('--search', choices=('grid', 'stepwise'), default='grid', help="Ricerca degli ordini SARIMA")
+    parser.add_argument('--engine', choices=('sarima', 'holt-winters', 'seasonal-naive', 'harmonic', 'ensemble'),
+                        default='sarima', help="Motore di previsione")
+    parser.add_argument('--metrics', help="Esporta timer e contatori (.json, oppure .prom per Prometheus)")
+    parser.add_argument('--profile', action='store_true', help="Profilo cProfile e picco di memoria del comando")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('train', help="Carica o addestra il modello")
+
+    p = commands.add_parser('backtest', help="Backtest walk-forward")
+    p.add_argument('--origins', type=int, default=12)
+    p.add_argument('--horizons', type=int, nargs='+', default=[1, 3, 6])
+    p.add_argument('--out', help="Errori per origine e orizzonte (CSV/Parquet)")
+
+    p = commands.add_parser('price', help="Prezzi per un elenco di date")
+    p.add_argument('--dates', required=True, help="File con le date (CSV/Parquet)")
+    p.add_argument('--column', help="Colonna delle date (default: la prima)")
+    p.add_argument('--quantiles', type=float, nargs='+',
+                   help="Bande di incertezza invece del solo prezzo (es. 0.05 0.5 0.95)")
+    p.add_argument('--out', required=True)
+
+    p = commands.add_parser('value', help="Valutazione di contratti di stoccaggio")
+    p.add_argument('--schedules', required=True, help="Eventi: contract_id, Date, Action (+ parametri opzionali)")
+    p.add_argument('--out', required=True, help="Riepilogo per contratto")
+    p.add_argument('--ledgers', help="Ledger dettagliati (opzionale)")
+
+    p = commands.add_parser('risk', help="Greche dei contratti: delta per bucket mensile e sensitività")
+    p.add_argument('--schedules', required=True, help="Eventi: contract_id, Date, Action (+ parametri opzionali)")
+    p.add_argument('--out', required=True, help="NPV, delta parallelo e sensitività per contratto")
+    p.add_argument('--deltas', help="Matrice dei delta contratti x bucket mensili (opzionale)")
+    p.add_argument('--curve-bump', type=float, default=0.01, help="Bump dei nodi della curva ($/MMBtu)")
+    p.add_argument('--param-bump', type=float, default=0.01, help="Shock relativo dei parametri (0.01 = 1%%)")
+
+    p = commands.add_parser('plot', help="Dashboard su file")
+    p.add_argument('--out', required=True, help="File .html (o immagine statica)")
+    p.add_argument('--steps', type=int, default=24)
+    p.add_argument('--mode', choices=('svg', 'webgl'), default='svg', help="'webgl' per storici lunghi")
+    p.add_argument('--max-points', type=int, default=2000, help="Punti massimi per traccia (solo webgl)")
+    p.add_argument('--downsample', choices=('lttb', 'minmax'), default='lttb')
+
+    return parser
+
+
+COMMANDS = {
+    'train': _cmd_train,
+    'backtest': _cmd_backtest,
+    'price': _cmd_price,
+    'value': _cmd_value,
+    'risk': _cmd_risk,
+    'plot': _cmd_plot,
+}
+
+
+def run_batch(argv):
+    args = _build_parser().parse_args(argv)
+    timings = {}
+    start = time.perf_counter()
+    if args.metrics or args.profile:
+        instrumentation.enable()
+    profiling = instrumentation.capture(args.command, memory=True) if args.profile else contextlib.nullcontext()
+
+    try:
+        with profiling:
+            with _stage("dati", timings):
+                df = DataLoader(args.data).get_clean_data()
+            COMMANDS[args.command](args, df, timings)
+    except Exception as e:
+        print(f"❌ Errore: {e}")
+        return 1
+
+    print(f"✅ {args.command} completato in {time.perf_counter() - start:.2f}s "
+          f"({', '.join(f'{k}: {v:.2f}s' for k, v in timings.items())})")
+
+    metrics = instrumentation.METRICS
+    if args.profile:
+        print(metrics.profiles[args.command])
+        print(f">> Picco memoria Python: {metrics.gauges[args.command + '.peak_bytes'] / 2**20:.1f} MB")
+    if metrics.timers:
+        print(metrics.summary())
+    if args.metrics:
+        metrics.export(args.metrics)
+        print(f">> Metriche esportate: {args.metrics}")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_batch(sys.argv[1:]))
     main()
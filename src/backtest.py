@@ -0,0 +1,160 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+from src.utils import quiet_fit, resolve_n_jobs
+
+
+def holdout_forecast(df, order, seasonal_order, test_months=6, forecaster=None):
+    """
+    Split temporale singolo: addestra sui dati escludendo gli ultimi 'test_months'
+    e prevede il periodo oscurato. Restituisce (train, test, previsione allineata).
+    Con 'forecaster' si usa una copia di quel motore invece del SARIMA con ordini fissi.
+    """
+    train = df.iloc[:-test_months]
+    test = df.iloc[-test_months:]
+
+    if forecaster is not None:
+        pred_mean = forecaster.clone().fit(train).get_forecast(test_months).predicted_mean
+    else:
+        res = _fit(train, order, seasonal_order)
+        with quiet_fit():
+            pred_mean = res.get_forecast(steps=test_months).predicted_mean
+    pred_mean.index = test.index # Allineamento indici
+
+    return train, test, pred_mean
+
+
+def _fit(train, order, seasonal_order, start_params=None):
+    import statsmodels.api as sm
+
+    model = sm.tsa.statespace.SARIMAX(train,
+                                      order=order,
+                                      seasonal_order=seasonal_order,
+                                      enforce_stationarity=False,
+                                      enforce_invertibility=False)
+    # Parametri iniziali di un modello con ordini diversi: si ignorano
+    if start_params is not None and len(start_params) != model.k_params:
+        start_params = None
+    with quiet_fit():
+        return model.fit(disp=False, start_params=start_params)
+
+
+def _run_block(series, cutoffs, order, seasonal_order, horizons, warm_start, start_params, forecaster=None):
+    """
+    Esegue in sequenza un blocco contiguo di origini.
+    Con warm_start ogni fit parte dai parametri dell'origine precedente del blocco.
+    Con 'forecaster' ogni origine stima una copia di quel motore al posto del SARIMA.
+    """
+    rows = []
+    max_h = max(horizons)
+
+    for cutoff in cutoffs:
+        start = time.perf_counter()
+        try:
+            if forecaster is not None:
+                res = forecaster.clone().fit(series.iloc[:cutoff])
+            else:
+                res = _fit(series.iloc[:cutoff], order, seasonal_order, start_params)
+        except Exception as e:
+            print(f">> Warning: Fit fallito all'origine {series.index[cutoff - 1].date()}: {e}")
+            continue
+        fit_time = time.perf_counter() - start
+
+        if warm_start and forecaster is None:
+            start_params = res.params.values
+
+        with quiet_fit():
+            forecast = np.asarray(res.get_forecast(steps=max_h).predicted_mean)
+        for h in horizons:
+            if cutoff + h > len(series):
+                continue
+            actual = series.iloc[cutoff + h - 1]
+            rows.append({
+                "cutoff": series.index[cutoff - 1],
+                "horizon": h,
+                "date": series.index[cutoff + h - 1],
+                "actual": actual,
+                "forecast": forecast[h - 1],
+                "error": forecast[h - 1] - actual,
+                "fit_time": fit_time
+            })
+
+    return rows
+
+
+class WalkForwardBacktest:
+    def __init__(self, order, seasonal_order, horizons=(1, 3, 6), n_jobs=1, warm_start=False, forecaster=None):
+        """
+        Backtest a origine mobile (finestra in espansione).
+        Per ogni origine il modello viene ristimato sui dati disponibili fino a
+        quella data e valutato sugli orizzonti richiesti (in mesi).
+        Con 'forecaster' (vedi src.forecasters) si valuta quel motore invece del SARIMA.
+        Il warm start concatena le origini in sequenza, quindi si esegue sempre in
+        un solo processo: così l'esito non dipende da n_jobs.
+        """
+        self.order = order
+        self.seasonal_order = seasonal_order
+        self.horizons = tuple(sorted(horizons))
+        self.n_jobs = n_jobs
+        # Riusa i parametri dell'origine precedente come punto di partenza dell'ottimizzatore
+        self.warm_start = warm_start
+        self.forecaster = forecaster
+
+    def run(self, df, n_origins=12, min_train=24, start_params=None):
+        """
+        Restituisce (errori, metriche): un DataFrame con una riga per origine e
+        orizzonte, e le metriche MAE/RMSE/MAPE aggregate per orizzonte.
+        Le origini sono ancorate all'orizzonte più lungo: ogni origine è valutata
+        su tutti gli orizzonti, così le metriche sono confrontabili tra loro.
+        """
+        series = df.iloc[:, 0] if isinstance(df, pd.DataFrame) else df
+
+        last_cutoff = len(series) - self.horizons[-1]
+        cutoffs = list(range(max(min_train, last_cutoff - n_origins + 1), last_cutoff + 1))
+        if not cutoffs:
+            raise ValueError(f"Storico troppo corto: servono almeno {min_train + self.horizons[-1]} osservazioni.")
+
+        n_workers = resolve_n_jobs(self.n_jobs, len(cutoffs))
+        # Il warm start richiede la catena seriale delle origini: blocchi paralleli partirebbero
+        # tutti da 'start_params' e i parametri stimati dipenderebbero dal numero di processi
+        warm_start = self.warm_start and self.forecaster is None
+        if warm_start and n_workers > 1:
+            print(f">> ⚠️ Warm start attivo: esecuzione seriale invece di {n_workers} processi")
+            n_workers = 1
+        print(f">> Walk-forward: {len(cutoffs)} origini x orizzonti {self.horizons} | Processi: {n_workers}")
+
+        # Blocchi contigui di origini, uno per processo
+        blocks = [list(b) for b in np.array_split(cutoffs, n_workers) if len(b)]
+        args = (self.order, self.seasonal_order, self.horizons, warm_start, start_params, self.forecaster)
+
+        start = time.perf_counter()
+        if n_workers == 1:
+            rows = _run_block(series, cutoffs, *args)
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [executor.submit(_run_block, series, block, *args) for block in blocks]
+                rows = [row for f in futures for row in f.result()]
+
+        errors = pd.DataFrame(rows, columns=["cutoff", "horizon", "date", "actual", "forecast", "error", "fit_time"])
+        metrics = self.summarize(errors)
+        print(f">> Walk-forward completato in {time.perf_counter() - start:.2f}s")
+
+        return errors, metrics
+
+    @staticmethod
+    def summarize(errors):
+        """MAE, RMSE e MAPE per orizzonte, più una riga complessiva 'ALL'."""
+        def metrics(g):
+            return pd.Series({
+                "n": len(g),
+                "MAE": np.mean(np.abs(g['error'])),
+                "RMSE": np.sqrt(np.mean(g['error'] ** 2)),
+                "MAPE": np.mean(np.abs(g['error'] / g['actual'])) * 100
+            })
+
+        by_horizon = {h: metrics(g) for h, g in errors.groupby('horizon')}
+        by_horizon['ALL'] = metrics(errors)
+        table = pd.DataFrame(by_horizon).T
+        table.index.name = 'horizon'
+        return table
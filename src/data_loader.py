@@ -1,30 +1,150 @@
 import pandas as pd
+import numpy as np
 import os
+import json
+import hashlib
+from src.instrumentation import timed
 
 class DataLoader:
-    def __init__(self, file_path):
+    # Formati colonnari (richiedono pyarrow, caricato solo se serve)
+    COLUMNAR_FORMATS = {'.parquet': pd.read_parquet, '.feather': pd.read_feather, '.arrow': pd.read_feather}
+
+    def __init__(self, file_path, use_cache=False, cache_dir=None):
         self.file_path = file_path
+        # Cache binaria (date int64 + prezzi float64, letti in mmap) costruita al primo caricamento CSV
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(file_path)), '.cache')
 
+    @timed("data.get_clean_data")
     def get_clean_data(self):
         if not os.path.exists(self.file_path):
             raise FileNotFoundError(f"ERRORE CRITICO: Il file dati non esiste in: {self.file_path}")
 
         try:
-            df = pd.read_csv(self.file_path)
-            
-            # Parsing flessibile della data
-            df['Dates'] = pd.to_datetime(df['Dates'], format='%m/%d/%y')
-            df.set_index('Dates', inplace=True)
+            ext = os.path.splitext(self.file_path)[1].lower()
+            if ext in self.COLUMNAR_FORMATS:
+                df = self._read_columnar(ext)
+            elif self.use_cache:
+                df = self._read_cached()
+            else:
+                df = self._read_csv()
             
-            # Ordina e normalizza alla fine del mese ('ME') per coerenza SARIMA
-            df = df.sort_index().asfreq('ME')
+            return self._clean(df)
             
-            # Controllo NaN post-importazione
-            if df.isnull().values.any():
-                print(">> Warning: Trovati valori nulli. Riempimento automatico (ffill).")
-                df = df.fillna(method='ffill')
-                
+        except Exception as e:
+            raise Exception(f"Errore caricamento dati: {str(e)}")
+
+    def _read_csv(self):
+        df = pd.read_csv(self.file_path)
+        
+        # Parsing flessibile della data
+        df['Dates'] = pd.to_datetime(df['Dates'], format='%m/%d/%y')
+        df.set_index('Dates', inplace=True)
+        return df
+
+    def _read_columnar(self, ext):
+        try:
+            df = self.COLUMNAR_FORMATS[ext](self.file_path)
+        except ImportError as e:
+            raise ImportError(f"Il formato {ext} richiede pyarrow (pip install pyarrow): {e}")
+
+        # Le date possono essere già native o salvate come stringhe MM/GG/AA
+        if not pd.api.types.is_datetime64_any_dtype(df['Dates']):
+            df['Dates'] = pd.to_datetime(df['Dates'], format='%m/%d/%y')
+        return df.set_index('Dates')
+
+    def _read_cached(self):
+        """
+        Legge la cache binaria se il CSV sorgente non è cambiato (mtime/dimensione,
+        oppure hash del contenuto se solo l'mtime è diverso); altrimenti la ricostruisce.
+        """
+        name = os.path.basename(self.file_path)
+        meta_path = os.path.join(self.cache_dir, f"{name}.json")
+        dates_path = os.path.join(self.cache_dir, f"{name}.dates.npy")
+        values_path = os.path.join(self.cache_dir, f"{name}.values.npy")
+
+        stat = os.stat(self.file_path)
+        meta = None
+        if os.path.exists(meta_path) and os.path.exists(dates_path) and os.path.exists(values_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+
+        if meta is not None and (meta['mtime'], meta['size']) != (stat.st_mtime_ns, stat.st_size):
+            if meta['size'] == stat.st_size and meta['sha256'] == self._file_hash():
+                # Contenuto identico (es. file ricopiato): basta aggiornare l'mtime
+                meta['mtime'] = stat.st_mtime_ns
+                self._write_json(meta_path, meta)
+            else:
+                meta = None
+
+        if meta is None:
+            df = self._read_csv()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(dates_path, df.index.as_unit('ns').asi8)
+            np.save(values_path, df.to_numpy(dtype=np.float64))
+            self._write_json(meta_path, {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": self._file_hash(),
+                "columns": list(df.columns)
+            })
             return df
+
+        dates = np.load(dates_path, mmap_mode='r')
+        values = np.load(values_path, mmap_mode='r')
+        index = pd.DatetimeIndex(np.asarray(dates).view('datetime64[ns]'), name='Dates')
+        return pd.DataFrame(np.asarray(values), index=index, columns=meta['columns'])
+
+    def _file_hash(self):
+        h = hashlib.sha256()
+        with open(self.file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    @staticmethod
+    def _write_json(path, payload):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    def get_clean_panel(self, id_col=None, value_col='Prices'):
+        """
+        Carica un CSV con molte serie (hub / scadenze) e restituisce un dict
+        serie_id -> DataFrame pulito come quello di get_clean_data.
+        Formato 'wide': una colonna per serie accanto a 'Dates'.
+        Formato 'long': colonne 'Dates', id_col e value_col.
+        """
+        if not os.path.exists(self.file_path):
+            raise FileNotFoundError(f"ERRORE CRITICO: Il file dati non esiste in: {self.file_path}")
+
+        try:
+            df = pd.read_csv(self.file_path)
+            df['Dates'] = pd.to_datetime(df['Dates'], format='%m/%d/%y')
+
+            if id_col is not None:
+                df = df.pivot(index='Dates', columns=id_col, values=value_col)
+            else:
+                df = df.set_index('Dates')
+
+            panel = {}
+            for series_id in df.columns:
+                series = df[[series_id]].dropna().rename(columns={series_id: value_col})
+                panel[str(series_id)] = self._clean(series)
+            return panel
             
         except Exception as e:
-            raise Exception(f"Errore caricamento dati: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Errore caricamento dati: {str(e)}")
+
+    @staticmethod
+    def _clean(df, freq='ME'):
+        # Ordina e normalizza alla fine del mese ('ME') per coerenza SARIMA
+        df = df.sort_index().asfreq(freq)
+        
+        # Controllo NaN post-importazione
+        if df.isnull().values.any():
+            print(">> Warning: Trovati valori nulli. Riempimento automatico (ffill).")
+            df = df.ffill()
+            
+        return df
\ No newline at end of file
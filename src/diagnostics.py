@@ -0,0 +1,182 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+def stack_residuals(residuals):
+    """
+    Impila i residui (dict etichetta -> array) in una matrice (modelli x tempo),
+    allineati a destra: le serie più corte sono completate con NaN all'inizio.
+    """
+    labels = list(residuals)
+    arrays = [np.asarray(residuals[k], dtype=float).ravel() for k in labels]
+    width = max((len(a) for a in arrays), default=0)
+    matrix = np.full((len(arrays), width), np.nan)
+    for i, a in enumerate(arrays):
+        if len(a):
+            matrix[i, width - len(a):] = a
+    return labels, matrix
+
+
+def _demeaned(R):
+    """Residui centrati con i NaN a zero (non contribuiscono a somme e prodotti) e osservazioni per riga."""
+    valid = ~np.isnan(R)
+    n = valid.sum(axis=1)
+    X = np.where(valid, R - np.nanmean(R, axis=1, keepdims=True), 0.0)
+    return X, n
+
+
+def acf_matrix(R, nlags):
+    """Autocorrelazione dei residui ai lag 0..nlags per ogni riga (stessa definizione di statsmodels.acf)."""
+    X, _ = _demeaned(R)
+    acov = np.empty((R.shape[0], nlags + 1))
+    acov[:, 0] = (X * X).sum(axis=1)
+    for k in range(1, nlags + 1):
+        acov[:, k] = (X[:, :-k] * X[:, k:]).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return acov / acov[:, [0]]
+
+
+def ljung_box(R, lags, acf=None):
+    """Statistica Q e p-value di Ljung-Box per ogni riga e ogni lag (matrici modelli x lag)."""
+    from scipy.stats import chi2
+
+    lags = np.asarray(lags)
+    if acf is None:
+        acf = acf_matrix(R, int(lags.max()))
+    n = (~np.isnan(R)).sum(axis=1)[:, None].astype(float)
+    k = np.arange(1, acf.shape[1])
+    terms = np.cumsum(acf[:, 1:] ** 2 / (n - k), axis=1) * n * (n + 2)
+    stat = terms[:, lags - 1]
+    return stat, chi2.sf(stat, lags)
+
+
+def jarque_bera(R):
+    """Jarque-Bera (normalità dei residui): statistica, p-value, asimmetria e curtosi."""
+    from scipy.stats import chi2
+
+    X, n = _demeaned(R)
+    m2 = (X ** 2).sum(axis=1) / n
+    skew = (X ** 3).sum(axis=1) / n / m2 ** 1.5
+    kurtosis = (X ** 4).sum(axis=1) / n / m2 ** 2
+    stat = n / 6 * (skew ** 2 + (kurtosis - 3) ** 2 / 4)
+    return stat, chi2.sf(stat, 2), skew, kurtosis
+
+
+def breakvar(R):
+    """
+    Test di eteroschedasticità a varianza spezzata (come SARIMAX.test_heteroskedasticity):
+    somma dei quadrati dell'ultimo terzo sul primo terzo, F bilaterale.
+    """
+    from scipy.stats import f
+
+    valid = ~np.isnan(R)
+    n = valid.sum(axis=1)
+    h = np.round(n / 3).astype(int)[:, None]
+    # Posizione di ogni osservazione valida all'interno della propria serie (1..n)
+    rank = np.cumsum(valid, axis=1)
+    sq = np.where(valid, R, 0.0) ** 2
+
+    numer = np.where(valid & (rank > n[:, None] - h), sq, 0.0).sum(axis=1)
+    denom = np.where(valid & (rank <= h), sq, 0.0).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stat = numer / denom
+    dof = h.ravel()
+    pvalue = 2 * np.minimum(f.cdf(stat, dof, dof), f.sf(stat, dof, dof))
+    return stat, pvalue
+
+
+def diagnostics_table(residuals, lags=(6, 12), alpha=0.05, aic=None, nlags=None):
+    """
+    Batteria completa su tutti i residui in un solo passaggio vettoriale.
+    Restituisce una tabella ordinata: prima i modelli che superano tutti i test
+    (p-value > alpha), poi per numero di test falliti e infine per AIC
+    (se fornito, dict etichetta -> AIC) o per p-value minimo.
+    """
+    labels, R = stack_residuals(residuals)
+    lags = tuple(sorted(lags))
+    nlags = nlags or max(lags)
+    acf = acf_matrix(R, max(nlags, max(lags)))
+
+    lb_stat, lb_pvalue = ljung_box(R, lags, acf)
+    jb_stat, jb_pvalue, skew, kurtosis = jarque_bera(R)
+    het_stat, het_pvalue = breakvar(R)
+
+    table = pd.DataFrame({"n": (~np.isnan(R)).sum(axis=1)}, index=pd.Index(labels, name='model'))
+    for j, lag in enumerate(lags):
+        table[f"lb_stat_{lag}"] = lb_stat[:, j]
+        table[f"lb_pvalue_{lag}"] = lb_pvalue[:, j]
+    table["jb_stat"] = jb_stat
+    table["jb_pvalue"] = jb_pvalue
+    table["skew"] = skew
+    table["kurtosis"] = kurtosis
+    table["het_H"] = het_stat
+    table["het_pvalue"] = het_pvalue
+    for k in range(1, nlags + 1):
+        table[f"acf_{k}"] = acf[:, k]
+
+    # Banda di confidenza 95% dell'ACF sotto l'ipotesi di rumore bianco
+    band = 1.96 / np.sqrt(table["n"].values)
+    table["acf_outside_band"] = (np.abs(acf[:, 1:nlags + 1]) > band[:, None]).sum(axis=1)
+
+    pvalues = table[[f"lb_pvalue_{lag}" for lag in lags] + ["jb_pvalue", "het_pvalue"]]
+    table["tests_failed"] = (pvalues.fillna(0) <= alpha).sum(axis=1)
+    table["min_pvalue"] = pvalues.min(axis=1)
+    table["passed"] = table["tests_failed"] == 0
+
+    sort_cols, ascending = ["tests_failed"], [True]
+    if aic is not None:
+        table.insert(0, "aic", pd.Series(aic).reindex(table.index).values)
+        sort_cols.append("aic")
+        ascending.append(True)
+    sort_cols.append("min_pvalue")
+    ascending.append(False)
+
+    table = table.sort_values(sort_cols, ascending=ascending, kind='mergesort')
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table
+
+
+def save_figures(residuals, table, out_dir, top=5, nlags=None):
+    """
+    Figure diagnostiche dei primi 'top' modelli della tabella, scritte su file (PNG).
+    Usa direttamente matplotlib.figure.Figure: nessuna finestra, funziona senza display.
+    """
+    from matplotlib.figure import Figure
+
+    os.makedirs(out_dir, exist_ok=True)
+    acf_cols = [c for c in table.columns if c.startswith("acf_") and c[4:].isdigit()]
+    if nlags:
+        acf_cols = acf_cols[:nlags]
+
+    paths = []
+    for label, row in table.head(top).iterrows():
+        resid = np.asarray(residuals[label], dtype=float)
+        resid = resid[~np.isnan(resid)]
+
+        fig = Figure(figsize=(12, 3.5))
+        ax_res, ax_hist, ax_acf = fig.subplots(1, 3)
+
+        ax_res.plot(resid, color='royalblue', linewidth=1)
+        ax_res.axhline(0, color='grey', linewidth=0.8)
+        ax_res.set_title("Residui standardizzati")
+
+        ax_hist.hist(resid, bins=min(30, max(5, len(resid) // 3)), density=True, color='lightsteelblue')
+        grid = np.linspace(resid.min(), resid.max(), 200)
+        ax_hist.plot(grid, np.exp(-grid ** 2 / 2) / np.sqrt(2 * np.pi), color='darkorange', label='N(0,1)')
+        ax_hist.set_title(f"Istogramma (JB p={row['jb_pvalue']:.3f})")
+        ax_hist.legend()
+
+        band = 1.96 / np.sqrt(row['n'])
+        ax_acf.bar(range(1, len(acf_cols) + 1), row[acf_cols].astype(float).values, color='navy')
+        ax_acf.axhspan(-band, band, color='orange', alpha=0.2)
+        ax_acf.set_title("ACF dei residui")
+
+        fig.suptitle(f"#{row['rank']} {label} | {'PROMOSSO' if row['passed'] else 'BOCCIATO'}")
+        fig.tight_layout()
+
+        safe = "".join(c if c.isalnum() else "_" for c in str(label)).strip("_")
+        path = os.path.join(out_dir, f"diagnostica_{row['rank']:03d}_{safe}.png")
+        fig.savefig(path, dpi=100)
+        paths.append(path)
+    return paths
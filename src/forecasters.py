@@ -0,0 +1,377 @@
+import abc
+import time
+import hashlib
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from src.utils import quiet_fit
+from src.instrumentation import timed
+
+# Periodo stagionale dei dati mensili
+SEASONAL_PERIOD = 12
+
+
+class Forecast:
+    """
+    Risultato di una previsione con la stessa interfaccia minima di statsmodels
+    (predicted_mean, var_pred_mean, conf_int): GasModel lo tratta come get_forecast.
+    """
+    def __init__(self, predicted_mean, var_pred_mean, name='predicted_mean'):
+        self.predicted_mean = predicted_mean
+        self.var_pred_mean = var_pred_mean
+        self.name = name
+
+    def conf_int(self, alpha=0.05):
+        z = NormalDist().inv_cdf(1 - alpha / 2)
+        se = np.sqrt(self.var_pred_mean)
+        return pd.DataFrame({f"lower {self.name}": self.predicted_mean - z * se,
+                             f"upper {self.name}": self.predicted_mean + z * se})
+
+
+class Forecaster(abc.ABC):
+    """
+    Interfaccia comune dei motori di previsione (usata da GasModel, GasValidator
+    e, tramite GasModel.predict_values, da StorageContract).
+    Le sottoclassi implementano _fit(y) e _forecast(steps) -> (media, varianza)
+    su array NumPy; indice delle date, tempi di fit/previsione e metriche sono gestiti qui.
+    """
+    name = 'base'
+
+    def __init__(self):
+        self.fit_time = None
+        self.predict_time = None
+        self.resid = None
+        self.fingerprint = None
+        self._last_date = None
+        self._freq = None
+        self._series_name = None
+
+    @property
+    def label(self):
+        return self.name
+
+    def is_fitted(self):
+        return self.fingerprint is not None
+
+    def clone(self):
+        """Copia non stimata con la stessa configurazione (per backtest e ristime)."""
+        return type(self)(**self.get_params())
+
+    def get_params(self):
+        return {}
+
+    def fit(self, series):
+        series = series.iloc[:, 0] if isinstance(series, pd.DataFrame) else series
+        y = np.asarray(series, dtype=float)
+
+        start = time.perf_counter()
+        with timed(f"forecaster.{self.name}.fit"):
+            self._fit(series, y)
+        self.fit_time = time.perf_counter() - start
+
+        self._last_date = series.index[-1]
+        self._freq = series.index.freq or pd.infer_freq(series.index) or 'ME'
+        self._series_name = series.name or 'predicted_mean'
+        self.fingerprint = hashlib.sha1(y.tobytes()).hexdigest()
+        return self
+
+    def get_forecast(self, steps):
+        if not self.is_fitted():
+            raise ValueError(f"Motore '{self.name}' non stimato: chiamare fit() prima della previsione.")
+
+        start = time.perf_counter()
+        with timed(f"forecaster.{self.name}.predict"):
+            mean, var = self._forecast(steps)
+            index = pd.date_range(self._last_date, periods=steps + 1, freq=self._freq)[1:]
+            forecast = Forecast(pd.Series(mean, index=index, name='predicted_mean'),
+                                pd.Series(var, index=index, name='var_pred_mean'), self._series_name)
+        self.predict_time = time.perf_counter() - start
+        return forecast
+
+    @abc.abstractmethod
+    def _fit(self, series, y):
+        """Stima sui valori 'y' (array) della serie 'series'."""
+
+    @abc.abstractmethod
+    def _forecast(self, steps):
+        """Restituisce (media, varianza) della previsione a 1..steps passi."""
+
+
+class SarimaForecaster(Forecaster):
+    name = 'sarima'
+
+    def __init__(self, order=(1, 1, 1), seasonal_order=(0, 1, 1, SEASONAL_PERIOD)):
+        """SARIMAX di statsmodels con ordini fissi (nessuna ricerca) dietro l'interfaccia comune."""
+        super().__init__()
+        self.order = tuple(order)
+        self.seasonal_order = tuple(seasonal_order)
+        self.results = None
+
+    @property
+    def label(self):
+        return f"SARIMA {self.order}x{self.seasonal_order}"
+
+    def get_params(self):
+        return {"order": self.order, "seasonal_order": self.seasonal_order}
+
+    def _fit(self, series, y):
+        from src.backtest import _fit
+
+        self.results = _fit(series, self.order, self.seasonal_order)
+        self.resid = np.asarray(self.results.resid, dtype=float)
+
+    def _forecast(self, steps):
+        with quiet_fit():
+            forecast = self.results.get_forecast(steps=steps)
+        return np.asarray(forecast.predicted_mean), np.asarray(forecast.var_pred_mean)
+
+
+class SeasonalNaiveForecaster(Forecaster):
+    name = 'seasonal-naive'
+
+    def __init__(self, period=SEASONAL_PERIOD):
+        """Ogni mese futuro ripete lo stesso mese dell'ultimo anno osservato."""
+        super().__init__()
+        self.period = period
+
+    def get_params(self):
+        return {"period": self.period}
+
+    def _fit(self, series, y):
+        if len(y) <= self.period:
+            raise ValueError(f"Storico troppo corto: servono più di {self.period} osservazioni.")
+        self.resid = y[self.period:] - y[:-self.period]
+        self._last_season = y[-self.period:]
+        self._sigma2 = np.mean(self.resid ** 2)
+
+    def _forecast(self, steps):
+        h = np.arange(steps)
+        # Varianza: cresce con il numero di anni interi di distanza dall'ultimo dato
+        return self._last_season[h % self.period], self._sigma2 * (h // self.period + 1)
+
+
+class HoltWintersForecaster(Forecaster):
+    name = 'holt-winters'
+
+    # Griglia dei coefficienti di smoothing (forma a correzione d'errore, additiva)
+    ALPHAS = np.linspace(0.05, 0.95, 19)
+    BETAS = np.array([0.0, 0.01, 0.02, 0.05, 0.1, 0.2])
+    GAMMAS = np.array([0.0, 0.05, 0.1, 0.2, 0.3, 0.5])
+
+    def __init__(self, period=SEASONAL_PERIOD, alpha=None, beta=None, gamma=None):
+        """
+        Holt-Winters additivo (livello, trend, stagionalità).
+        I coefficienti non indicati vengono scelti minimizzando la somma dei quadrati
+        degli errori a un passo: tutte le combinazioni della griglia avanzano insieme
+        in un'unica ricorsione vettoriale sul tempo.
+        """
+        super().__init__()
+        self.period = period
+        self.alpha, self.beta, self.gamma = alpha, beta, gamma
+        self.params_ = None
+
+    @property
+    def label(self):
+        if self.params_ is None:
+            return "Holt-Winters"
+        return "Holt-Winters (alpha={:.2f}, beta={:.2f}, gamma={:.2f})".format(*self.params_)
+
+    def get_params(self):
+        return {"period": self.period, "alpha": self.alpha, "beta": self.beta, "gamma": self.gamma}
+
+    def _grid(self):
+        grids = [np.atleast_1d(self.ALPHAS if self.alpha is None else self.alpha),
+                 np.atleast_1d(self.BETAS if self.beta is None else self.beta),
+                 np.atleast_1d(self.GAMMAS if self.gamma is None else self.gamma)]
+        alpha, beta, gamma = (g.ravel() for g in np.meshgrid(*grids, indexing='ij'))
+        # Vincoli usuali di stabilità: beta <= alpha, gamma <= 1 - alpha
+        keep = (beta <= alpha) & (gamma <= 1 - alpha)
+        if not keep.any():
+            keep[:] = True
+        return alpha[keep], beta[keep], gamma[keep]
+
+    def _fit(self, series, y):
+        m = self.period
+        if len(y) < 2 * m:
+            raise ValueError(f"Storico troppo corto: servono almeno {2 * m} osservazioni (due stagioni).")
+
+        # Stati iniziali dai primi due anni, riportati a prima della prima osservazione
+        first, second = y[:m].mean(), y[m:2 * m].mean()
+        trend0 = (second - first) / m
+        level0 = first - trend0 * (m + 1) / 2
+        season0 = y[:m] - first
+
+        alpha, beta, gamma = self._grid()
+        k = len(alpha)
+        level = np.full(k, level0)
+        trend = np.full(k, trend0)
+        season = np.tile(season0, (k, 1))
+        errors = np.empty((k, len(y)))
+
+        for t, value in enumerate(y):
+            j = t % m
+            e = value - (level + trend + season[:, j])
+            errors[:, t] = e
+            level = level + trend + alpha * e
+            trend = trend + beta * e
+            season[:, j] += gamma * e
+
+        best = int(np.argmin((errors ** 2).sum(axis=1)))
+        self.params_ = (alpha[best], beta[best], gamma[best])
+        self.resid = errors[best]
+        self._sigma2 = np.mean(self.resid ** 2)
+        self._level, self._trend = level[best], trend[best]
+        # Stagionalità riallineata: la posizione 0 corrisponde al primo mese futuro
+        self._season = np.roll(season[best], -(len(y) % m))
+
+    def _forecast(self, steps):
+        alpha, beta, gamma = self.params_
+        h = np.arange(1, steps + 1)
+        mean = self._level + h * self._trend + self._season[(h - 1) % self.period]
+
+        # Varianza analitica del modello ETS(A,A,A): sigma^2 * (1 + somma c_j^2), j < h
+        j = np.arange(1, steps)
+        c = alpha + beta * j + gamma * (j % self.period == 0)
+        var = self._sigma2 * (1 + np.concatenate([[0.0], np.cumsum(c ** 2)]))
+        return mean, var
+
+
+class HarmonicForecaster(Forecaster):
+    name = 'harmonic'
+
+    def __init__(self, n_harmonics=2, period=SEASONAL_PERIOD, trend=True):
+        """
+        Regressione armonica: trend lineare più 'n_harmonics' coppie seno/coseno
+        di periodo annuale, stimata con i minimi quadrati di NumPy (microsecondi).
+        La varianza di previsione include l'incertezza sui coefficienti.
+        """
+        super().__init__()
+        self.n_harmonics = n_harmonics
+        self.period = period
+        self.trend = trend
+        self.coef_ = None
+
+    @property
+    def label(self):
+        return f"Armonica (K={self.n_harmonics}{', trend' if self.trend else ''})"
+
+    def get_params(self):
+        return {"n_harmonics": self.n_harmonics, "period": self.period, "trend": self.trend}
+
+    def _design(self, t):
+        columns = [np.ones(len(t))]
+        if self.trend:
+            columns.append(t.astype(float))
+        for k in range(1, self.n_harmonics + 1):
+            angle = 2 * np.pi * k * t / self.period
+            columns += [np.cos(angle), np.sin(angle)]
+        return np.column_stack(columns)
+
+    def _fit(self, series, y):
+        X = self._design(np.arange(len(y)))
+        if len(y) <= X.shape[1]:
+            raise ValueError(f"Storico troppo corto: servono più di {X.shape[1]} osservazioni.")
+        self.coef_, *_ = np.linalg.lstsq(X, y, rcond=None)
+        self.resid = y - X @ self.coef_
+        self._sigma2 = self.resid @ self.resid / (len(y) - X.shape[1])
+        self._xtx_inv = np.linalg.pinv(X.T @ X)
+        self._n = len(y)
+
+    def _forecast(self, steps):
+        X = self._design(np.arange(self._n, self._n + steps))
+        # Varianza di previsione OLS: sigma^2 * (1 + x (X'X)^-1 x')
+        leverage = np.einsum('ij,jk,ik->i', X, self._xtx_inv, X)
+        return X @ self.coef_, self._sigma2 * (1 + leverage)
+
+
+class EnsembleForecaster(Forecaster):
+    name = 'ensemble'
+
+    def __init__(self, members=None, weights=None):
+        """
+        Media pesata di più motori. Senza pesi espliciti i membri pesano uguale
+        finché calibrate() non li ricava dagli errori di backtest (inverso dell'MSE).
+        La varianza combina le deviazioni standard come se gli errori dei membri
+        fossero perfettamente correlati (stima prudente).
+        """
+        super().__init__()
+        self.members = list(members) if members is not None else default_members()
+        self.weights = None if weights is None else np.asarray(weights, dtype=float)
+        self.backtest_table = None
+
+    @property
+    def label(self):
+        weights = self._weights()
+        return "Ensemble (" + ", ".join(f"{m.name} {w:.2f}" for m, w in zip(self.members, weights)) + ")"
+
+    def get_params(self):
+        return {"members": [m.clone() for m in self.members], "weights": self.weights}
+
+    def _weights(self):
+        weights = np.ones(len(self.members)) if self.weights is None else self.weights
+        return weights / weights.sum()
+
+    def calibrate(self, df, n_origins=12, horizons=(1, 3, 6), n_jobs=1):
+        """Pesi proporzionali all'inverso dell'MSE di walk-forward di ogni membro."""
+        table = compare_forecasters(df, self.members, n_origins=n_origins, horizons=horizons, n_jobs=n_jobs)
+        self.weights = 1 / table['RMSE'].values ** 2
+        table['weight'] = self._weights()
+        self.backtest_table = table
+        return table
+
+    def _fit(self, series, y):
+        for member in self.members:
+            member.fit(series)
+        # Residui combinati sulla coda comune (i membri possono perdere le prime osservazioni)
+        n = min(len(m.resid) for m in self.members)
+        self.resid = sum(w * m.resid[-n:] for m, w in zip(self.members, self._weights()))
+
+    def _forecast(self, steps):
+        forecasts = [m.get_forecast(steps) for m in self.members]
+        weights = self._weights()
+        mean = sum(w * f.predicted_mean.values for f, w in zip(forecasts, weights))
+        se = sum(w * np.sqrt(f.var_pred_mean.values) for f, w in zip(forecasts, weights))
+        return mean, se ** 2
+
+
+ENGINES = {
+    'holt-winters': HoltWintersForecaster,
+    'seasonal-naive': SeasonalNaiveForecaster,
+    'harmonic': HarmonicForecaster,
+    'ensemble': EnsembleForecaster,
+}
+
+
+def default_members():
+    """Membri dell'ensemble di default: i motori veloci, senza statsmodels."""
+    return [HoltWintersForecaster(), HarmonicForecaster(), SeasonalNaiveForecaster()]
+
+
+def make_engine(name, **kwargs):
+    if name not in ENGINES:
+        raise ValueError(f"Motore sconosciuto: {name} (usa {', '.join(ENGINES)})")
+    return ENGINES[name](**kwargs)
+
+
+def compare_forecasters(df, engines, n_origins=12, horizons=(1, 3, 6), n_jobs=1):
+    """
+    Confronto dei motori: errori di walk-forward (tutti gli orizzonti) e tempi
+    di fit e di previsione sull'intero storico, uno per riga.
+    """
+    from src.backtest import WalkForwardBacktest
+
+    series = df.iloc[:, 0] if isinstance(df, pd.DataFrame) else df
+    rows = []
+    for engine in engines:
+        backtest = WalkForwardBacktest(None, None, horizons=horizons, n_jobs=n_jobs, forecaster=engine)
+        _, metrics = backtest.run(series, n_origins=n_origins)
+
+        fitted = engine.clone().fit(series)
+        fitted.get_forecast(max(horizons))
+        rows.append({
+            "engine": engine.name,
+            "fit_ms": fitted.fit_time * 1000,
+            "predict_ms": fitted.predict_time * 1000,
+            **metrics.loc['ALL', ['MAE', 'RMSE', 'MAPE']].to_dict()
+        })
+    return pd.DataFrame(rows).set_index('engine')
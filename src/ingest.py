@@ -0,0 +1,189 @@
+import io
+import os
+import json
+import hashlib
+import itertools
+import pandas as pd
+import numpy as np
+from pandas.tseries.frequencies import to_offset
+from src.data_loader import DataLoader
+
+# Colonne dello stato aggregato per periodo
+STATE_COLUMNS = ['last_ts', 'last_price', 'sum_p', 'count', 'sum_pv', 'sum_v']
+# Byte finali già elaborati usati per verificare che il file non sia stato riscritto
+TAIL_BYTES = 64 * 1024
+
+
+class TickAggregator:
+    AGGREGATIONS = ('last', 'mean', 'vwap')
+
+    def __init__(self, freq='ME', how='last', date_col='Dates', price_col='Prices',
+                 volume_col=None, date_format=None, batch_size=100_000, checkpoint_path=None):
+        """
+        Ingestione a blocchi di prezzi giornalieri / intraday (tick) da CSV molto grandi.
+        Mantiene in modo incrementale gli aggregati per periodo (fine mese di default):
+        ultimo prezzo, media e VWAP. La memoria è limitata a 'batch_size' righe.
+        Con checkpoint_path l'elaborazione riprende dall'ultimo byte letto,
+        così un append giornaliero elabora solo le righe nuove.
+        """
+        if how not in self.AGGREGATIONS:
+            raise ValueError(f"Aggregazione non valida: {how} (usa {self.AGGREGATIONS})")
+        if how == 'vwap' and volume_col is None:
+            raise ValueError("La VWAP richiede 'volume_col'.")
+
+        self.freq = freq
+        self.how = how
+        self.date_col = date_col
+        self.price_col = price_col
+        self.volume_col = volume_col
+        self.date_format = date_format
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+
+        self.state = pd.DataFrame(columns=STATE_COLUMNS, dtype=float)
+        self.offset = 0
+        self.header = None
+        self.rows_processed = 0
+
+    def ingest(self, file_path):
+        """
+        Elabora il file (o solo la parte nuova, se c'è un checkpoint valido)
+        e restituisce il DataFrame pulito, nello stesso formato di get_clean_data.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"ERRORE CRITICO: Il file dati non esiste in: {file_path}")
+
+        self._load_checkpoint(file_path)
+        new_rows = 0
+
+        with open(file_path, 'rb') as f:
+            if self.offset == 0:
+                header = f.readline()
+                self.header = header.decode().strip().split(',')
+                self.offset = len(header)
+            f.seek(self.offset)
+
+            for lines in self._iter_batches(f):
+                content = b''.join(lines)
+                if content.strip():
+                    batch = pd.read_csv(io.BytesIO(content), header=None, names=self.header)
+                    self._merge(self._aggregate(batch))
+                    new_rows += len(batch)
+                self.offset += len(content)
+
+        self.rows_processed += new_rows
+        print(f">> Ingestione: {new_rows} nuove righe | {len(self.state)} periodi aggregati")
+
+        if self.checkpoint_path:
+            self._save_checkpoint(file_path)
+        return self.to_frame()
+
+    def _iter_batches(self, f):
+        """Blocchi di al massimo batch_size righe complete (un'ultima riga senza a capo viene rimandata)."""
+        while True:
+            lines = list(itertools.islice(f, self.batch_size))
+            if lines and not lines[-1].endswith(b'\n'):
+                lines.pop()
+            if not lines:
+                return
+            yield lines
+
+    def _aggregate(self, batch):
+        """Aggregati parziali del blocco, per periodo."""
+        ts = pd.to_datetime(batch[self.date_col], format=self.date_format)
+        prices = batch[self.price_col].astype(float)
+        volumes = batch[self.volume_col].astype(float) if self.volume_col else pd.Series(np.nan, index=batch.index)
+
+        # Fine del periodo di appartenenza (offset con n=0: arrotonda in avanti)
+        period = ts.dt.normalize() + to_offset(self.freq) * 0
+
+        partial = pd.DataFrame({
+            'period': period.values,
+            'last_ts': ts.values.astype('datetime64[ns]').astype(np.int64),
+            'last_price': prices.values,
+            'sum_p': prices.values,
+            'count': 1.0,
+            'sum_pv': (prices * volumes).values,
+            'sum_v': volumes.values
+        })
+        return self._reduce(partial.set_index('period'))
+
+    def _merge(self, partial):
+        self.state = partial if self.state.empty else self._reduce(pd.concat([self.state, partial]))
+
+    @staticmethod
+    def _reduce(frame):
+        # Ordinamento stabile per istante: a parità, vince la riga letta per ultima
+        frame = frame.sort_values('last_ts', kind='mergesort')
+        grouped = frame.groupby(level=0)
+        return pd.DataFrame({
+            'last_ts': grouped['last_ts'].last(),
+            'last_price': grouped['last_price'].last(),
+            'sum_p': grouped['sum_p'].sum(),
+            'count': grouped['count'].sum(),
+            'sum_pv': grouped['sum_pv'].sum(min_count=1),
+            'sum_v': grouped['sum_v'].sum(min_count=1)
+        })
+
+    def to_frame(self):
+        """Serie aggregata, ordinata, a frequenza regolare e senza buchi (ffill), come get_clean_data."""
+        if self.how == 'last':
+            values = self.state['last_price']
+        elif self.how == 'mean':
+            values = self.state['sum_p'] / self.state['count']
+        else:
+            values = self.state['sum_pv'] / self.state['sum_v']
+
+        df = pd.DataFrame({self.price_col: values.astype(float).values},
+                          index=pd.DatetimeIndex(self.state.index, name='Dates'))
+        return DataLoader._clean(df, self.freq)
+
+    def _config(self):
+        return {"freq": self.freq, "date_col": self.date_col, "price_col": self.price_col,
+                "volume_col": self.volume_col, "date_format": self.date_format}
+
+    def _load_checkpoint(self, file_path):
+        """Riprende da un checkpoint solo se il file è stato esteso (non riscritto) e la configurazione è la stessa."""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+
+        with open(self.checkpoint_path) as f:
+            ckpt = json.load(f)
+
+        size = os.path.getsize(file_path)
+        if (ckpt['config'] != self._config() or size < ckpt['offset']
+                or self._tail_hash(file_path, ckpt['offset']) != ckpt['tail_hash']):
+            print(">> Checkpoint non valido per questo file: ingestione completa.")
+            return
+
+        state = pd.DataFrame(ckpt['state'], columns=['period'] + STATE_COLUMNS)
+        state['period'] = pd.to_datetime(state['period'].astype(np.int64), unit='ns')
+        self.state = state.set_index('period').astype(float)
+        self.state['last_ts'] = self.state['last_ts'].astype(np.int64)
+        self.offset = ckpt['offset']
+        self.header = ckpt['header']
+        self.rows_processed = ckpt['rows_processed']
+
+    def _save_checkpoint(self, file_path):
+        state = self.state.reset_index(drop=True)
+        state.insert(0, 'period', pd.DatetimeIndex(self.state.index).as_unit('ns').asi8)
+        payload = {
+            "config": self._config(),
+            "offset": self.offset,
+            "tail_hash": self._tail_hash(file_path, self.offset),
+            "header": self.header,
+            "rows_processed": self.rows_processed,
+            "state": state.astype(object).where(state.notna(), None).values.tolist()
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    @staticmethod
+    def _tail_hash(file_path, offset):
+        with open(file_path, 'rb') as f:
+            f.seek(max(0, offset - TAIL_BYTES))
+            return hashlib.sha256(f.read(offset - max(0, offset - TAIL_BYTES))).hexdigest()
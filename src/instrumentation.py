@@ -0,0 +1,206 @@
+import io
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import contextlib
+import tracemalloc
+from collections import deque
+import numpy as np
+
+# Campioni conservati per timer (quantili su finestra mobile)
+SAMPLE_WINDOW = 1024
+# Prefisso delle metriche nel formato Prometheus
+PROMETHEUS_PREFIX = "gas_"
+
+# Disattivata di default: timer e contatori costano un solo controllo booleano.
+# Si attiva con enable() o con la variabile d'ambiente GAS_METRICS=1
+_enabled = os.environ.get('GAS_METRICS', '') not in ('', '0')
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled():
+    return _enabled
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Registro in memoria di timer, contatori e gauge del processo.
+        Thread-safe: il server di pricing lo aggiorna da più thread.
+        """
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.timers = {}
+            self.counters = {}
+            self.gauges = {}
+            self.profiles = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            t = self.timers.get(name)
+            if t is None:
+                t = self.timers[name] = {"count": 0, "sum": 0.0, "min": float("inf"), "max": 0.0,
+                                         "samples": deque(maxlen=SAMPLE_WINDOW)}
+            t["count"] += 1
+            t["sum"] += seconds
+            t["min"] = min(t["min"], seconds)
+            t["max"] = max(t["max"], seconds)
+            t["samples"].append(seconds)
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """Copia serializzabile: per ogni timer count, totale, media, min, max, p50 e p99 (secondi)."""
+        with self._lock:
+            timers = {}
+            for name, t in self.timers.items():
+                samples = np.fromiter(t["samples"], dtype=float)
+                timers[name] = {
+                    "count": t["count"],
+                    "sum": t["sum"],
+                    "mean": t["sum"] / t["count"],
+                    "min": t["min"],
+                    "max": t["max"],
+                    "p50": float(np.percentile(samples, 50)),
+                    "p99": float(np.percentile(samples, 99))
+                }
+            return {"timers": timers, "counters": dict(self.counters), "gauges": dict(self.gauges)}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        """Formato testuale Prometheus: i timer come summary, i contatori come *_total."""
+        snap = self.snapshot()
+        lines = []
+        for name, t in sorted(snap["timers"].items()):
+            metric = _prometheus_name(name) + "_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            lines.append(f'{metric}{{quantile="0.5"}} {t["p50"]:.9g}')
+            lines.append(f'{metric}{{quantile="0.99"}} {t["p99"]:.9g}')
+            lines.append(f"{metric}_sum {t['sum']:.9g}")
+            lines.append(f"{metric}_count {t['count']}")
+        for name, value in sorted(snap["counters"].items()):
+            metric = _prometheus_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in sorted(snap["gauges"].items()):
+            metric = _prometheus_name(name)
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value:.9g}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Scrive il registro su file: Prometheus per .prom/.txt, altrimenti JSON."""
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def summary(self):
+        """Tabella leggibile dei timer, ordinata per tempo totale."""
+        snap = self.snapshot()["timers"]
+        lines = [f"{'Timer':<36}{'Chiamate':>9}{'Totale':>11}{'Media':>11}{'p99':>11}"]
+        for name, t in sorted(snap.items(), key=lambda kv: -kv[1]["sum"]):
+            lines.append(f"{name:<36}{t['count']:>9}{t['sum']:>10.3f}s"
+                         f"{t['mean'] * 1000:>9.2f}ms{t['p99'] * 1000:>9.2f}ms")
+        return "\n".join(lines)
+
+
+METRICS = MetricsRegistry()
+
+
+def _prometheus_name(name):
+    return PROMETHEUS_PREFIX + "".join(c if c.isalnum() else "_" for c in name)
+
+
+class timed:
+    """
+    Timer usabile come context manager ('with timed("x"):') o decoratore ('@timed("x")').
+    Da disattivato non misura nulla e non tocca il registro.
+    """
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name):
+        self.name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter() if _enabled else None
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            METRICS.observe(self.name, time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                METRICS.observe(name, time.perf_counter() - start)
+        return wrapper
+
+
+def observe(name, seconds):
+    """Registra una durata misurata altrove (es. in un processo worker)."""
+    if _enabled:
+        METRICS.observe(name, seconds)
+
+
+def count(name, n=1):
+    if _enabled:
+        METRICS.inc(name, n)
+
+
+@contextlib.contextmanager
+def capture(name, profile=True, memory=False, top=25):
+    """
+    Profilazione di un blocco su richiesta: con profile=True salva in METRICS.profiles[name]
+    le 'top' funzioni per tempo cumulato (cProfile), con memory=True registra il picco
+    di memoria Python come gauge '<name>.peak_bytes' (tracemalloc).
+    """
+    profiler = cProfile.Profile() if profile else None
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    elif memory:
+        tracemalloc.reset_peak()
+
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+            METRICS.profiles[name] = out.getvalue()
+        if memory:
+            METRICS.set_gauge(f"{name}.peak_bytes", tracemalloc.get_traced_memory()[1])
+            if started_tracing:
+                tracemalloc.stop()
@@ -1,87 +1,405 @@
 import os
+import time
+import hashlib
 import itertools
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-from statsmodels.tsa.statespace.sarimax import SARIMAXResults
-from sklearn.metrics import mean_squared_error
-from src.utils import to_daily_resolution
-import warnings
+from src.utils import DailyInterpolator, quiet_fit, resolve_n_jobs, to_epoch_days
+from src.backtest import holdout_forecast
+from src.registry import ModelRegistry
+from src.instrumentation import timed, observe, count
+
+# Quantili di default per predict_quantiles (P5/P25/P50/P75/P95)
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Quantile della normale usato da conf_int() (intervallo al 95%)
+Z_95 = NormalDist().inv_cdf(0.975)
+
+
+def _fit_candidate(df, param, param_seasonal, keep_resid=False):
+    """
+    Addestra un singolo candidato della Grid Search.
+    Funzione a livello di modulo per poter essere eseguita in un processo separato.
+    Con keep_resid restituisce anche i residui standardizzati (senza il burn-in iniziale).
+    """
+    import statsmodels.api as sm
+
+    start = time.perf_counter()
+    try:
+        mod = sm.tsa.statespace.SARIMAX(df,
+                                        order=param,
+                                        seasonal_order=param_seasonal,
+                                        enforce_stationarity=False,
+                                        enforce_invertibility=False)
+        with quiet_fit():
+            res = mod.fit(disp=False)
+        aic, bic, status = res.aic, res.bic, "OK"
+    except Exception as e:
+        res, aic, bic, status = None, np.nan, np.nan, f"ERRORE: {e}"
+
+    row = {
+        "order": param,
+        "seasonal_order": param_seasonal,
+        "aic": aic,
+        "bic": bic,
+        "fit_time": time.perf_counter() - start,
+        "status": status
+    }
+    if keep_resid:
+        row["resid"] = standardized_residuals(res) if res is not None else np.array([])
+    return row
+
+
+def standardized_residuals(res):
+    """Errori di previsione standardizzati dopo il burn-in (gli stessi usati dai test di statsmodels)."""
+    burn = max(res.loglikelihood_burn, res.nobs_diffuse)
+    return np.asarray(res.filter_results.standardized_forecasts_error[0, burn:], dtype=float)
 
-# Silenzia warning dei modelli non convergenti
-warnings.filterwarnings("ignore")
 
 class GasModel:
-    def __init__(self, save_dir='models', model_name='sarima_v1.pkl'):
+    SEARCH_STRATEGIES = ('grid', 'stepwise')
+
+    def __init__(self, save_dir='models', model_name='sarima_v1.pkl', n_jobs=1,
+                 search='grid', max_pq=2, max_fits=None, auto_update=True, use_registry=True,
+                 keep_residuals=False, engine=None):
+        if search not in self.SEARCH_STRATEGIES:
+            raise ValueError(f"Strategia di ricerca non valida: {search} (usa {self.SEARCH_STRATEGIES})")
+
         self.save_path = os.path.join(save_dir, model_name)
+        # Registro indirizzato per contenuto (None = pickle singolo in save_path)
+        self.registry = ModelRegistry(os.path.join(save_dir, 'registry')) if use_registry else None
+        # Voce del registro non ancora ricostruita: statsmodels si carica al primo uso di 'results'
+        self._pending_entry = None
         self.results = None
         # Parametri di default un po' più robusti
         self.best_order = (1, 1, 1)
         self.best_seasonal = (1, 1, 1, 12)
+        # Numero di processi per la Grid Search (1 = seriale, -1 = tutti i core)
+        self.n_jobs = n_jobs
+        # Strategia di ricerca: 'grid' (esaustiva) o 'stepwise' (Hyndman-Khandakar)
+        self.search = search
+        # Ordine massimo per p, q (range più ampi sono sostenibili solo in stepwise)
+        self.max_pq = max_pq
+        # Tetto al numero di fit per la stepwise (None = nessun limite)
+        self.max_fits = max_fits
+        # Tabella AIC/BIC di tutti i candidati valutati
+        self.search_results = None
+        # Conserva nella tabella anche i residui di ogni candidato (per la diagnostica)
+        self.keep_residuals = keep_residuals
+        # Motore alternativo (src.forecasters): None = SARIMA con ricerca degli ordini e registro
+        self.engine = engine
+        # Aggiorna il modello salvato con i nuovi mesi invece di riaddestrarlo da zero
+        self.auto_update = auto_update
+        # Cache delle previsioni: conserva l'orizzonte più lungo calcolato finora
+        self._forecast_cache = None
+        # Nodi mensili della deviazione standard per le bande di quantili
+        self._band_cache = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def results(self):
+        if self._results is None and self._pending_entry is not None:
+            entry, series = self._pending_entry
+            self._results = ModelRegistry.rebuild(entry, series)
+            self._pending_entry = None
+        return self._results
+
+    @results.setter
+    def results(self, value):
+        self._results = value
+        self._pending_entry = None
+
+    def is_loaded(self):
+        """True se c'è un modello, anche se non ancora ricostruito dal registro."""
+        if self.engine is not None:
+            return self.engine.is_fitted()
+        return self._results is not None or self._pending_entry is not None
+
+    @property
+    def label(self):
+        """Descrizione del motore, riportata nello Status delle previsioni."""
+        if self.engine is not None:
+            return self.engine.label
+        return f"SARIMA {self.best_order}x{self.best_seasonal}"
+
+    @property
+    def resid(self):
+        return self.engine.resid if self.engine is not None else self.results.resid
 
     def load_or_train(self, df_prices):
-        if os.path.exists(self.save_path):
+        self._invalidate_forecast_cache()
+        if self.engine is not None:
+            # I motori veloci si ristimano sempre: niente ricerca né registro
+            self._fit_engine(df_prices)
+            return
+        if self.registry is not None:
+            if self._load_from_registry(df_prices):
+                return
+        elif os.path.exists(self.save_path):
             print(f">> Caricamento modello da: {self.save_path}")
+            from statsmodels.tsa.statespace.sarimax import SARIMAXResults
             try:
                 self.results = SARIMAXResults.load(self.save_path)
-                return
+                self.best_order = tuple(self.results.model.order)
+                self.best_seasonal = tuple(self.results.model.seasonal_order)
             except:
                 print(">> File modello corrotto. Riaddestramento forzato.")
+                self.results = None
+
+            if self.results is not None:
+                if not self.auto_update or self.update(df_prices) != 'retrain':
+                    return
         
         self._optimize_params(df_prices)
         self._validate_and_train(df_prices)
 
+    def _load_from_registry(self, df_prices):
+        """
+        Cerca nel registro un modello per questi dati esatti; altrimenti uno stimato
+        su un prefisso dello storico, da estendere con update(). True se non serve riaddestrare.
+        """
+        config = self._search_config()
+        entry = self.registry.get(df_prices, config)
+        if entry is None and self.auto_update:
+            entry = self.registry.find_prefix(df_prices, config)
+        if entry is None:
+            return False
+
+        print(f">> Modello dal registro: {entry['key']} ({entry['train_start']} -> {entry['train_end']})")
+        self.best_order = tuple(entry['order'])
+        self.best_seasonal = tuple(entry['seasonal_order'])
+
+        if entry['nobs'] == len(df_prices):
+            # Ricostruzione rinviata: le previsioni salvate bastano al pricing
+            self.results = None
+            self._pending_entry = (entry, df_prices)
+            if entry.get('forecast'):
+                mean, conf = ModelRegistry.forecast_frames(entry['forecast'])
+                # La deviazione standard si ricava dall'ampiezza dell'intervallo al 95%
+                se = (conf.iloc[:, 1] - conf.iloc[:, 0]) / (2 * Z_95)
+                self._forecast_cache = {'key': self._forecast_key(), 'steps': len(mean),
+                                        'mean': mean, 'conf': conf, 'se': se}
+            return True
+
+        self.results = ModelRegistry.rebuild(entry, df_prices.iloc[:entry['nobs']])
+        return self.update(df_prices) != 'retrain'
+
+    def _search_config(self):
+        """Spazio di ricerca degli ordini: fa parte della chiave del registro."""
+        return {"search": self.search, "max_pq": self.max_pq, "max_fits": self.max_fits}
+
+    def _save_results(self, df_prices, fit_time=None):
+        if self.registry is not None:
+            key = self.registry.save(self.results, df_prices, self._search_config(), fit_time)
+            print(f">> Modello registrato: {key}")
+        else:
+            os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
+            self.results.save(self.save_path)
+
+    def update(self, df_prices, refit=False, z_threshold=3.0, lb_alpha=0.01):
+        """
+        Aggiornamento incrementale: estende il modello salvato con le sole nuove
+        osservazioni (SARIMAXResults.append), a parametri fissi o, con refit=True,
+        ristimati partendo da quelli attuali.
+        Restituisce 'invariato', 'aggiornato' oppure 'retrain' se serve una nuova
+        Grid Search (storico modificato, drift o diagnostica peggiorata).
+        Con un motore alternativo (engine) la ristima completa costa poco: si rifà sempre.
+        """
+        if self.engine is not None:
+            self._fit_engine(df_prices)
+            return 'aggiornato'
+
+        from statsmodels.stats.diagnostic import acorr_ljungbox
+
+        old_index = self.results.model._index
+        old_endog = self.results.model.endog[:, 0]
+        n_old = len(old_endog)
+
+        if (len(df_prices) < n_old or not df_prices.index[:n_old].equals(old_index)
+                or not np.allclose(np.asarray(df_prices)[:n_old], old_endog, equal_nan=True)):
+            print(">> Storico diverso da quello del modello salvato: riaddestramento completo.")
+            return 'retrain'
+
+        new_obs = df_prices.iloc[n_old:]
+        if new_obs.empty:
+            return 'invariato'
+
+        start = time.perf_counter()
+        with quiet_fit():
+            if refit:
+                new_results = self.results.append(new_obs, refit=True, fit_kwargs={'disp': False})
+            else:
+                new_results = self.results.append(new_obs)
+
+        # Drift: errori di previsione standardizzati (un passo avanti) sui nuovi mesi
+        z = new_results.filter_results.standardized_forecasts_error[0, -len(new_obs):]
+        max_z = np.nanmax(np.abs(z))
+
+        # Diagnostica: la bianchezza dei residui non deve peggiorare oltre la soglia
+        lags = [max(1, min(12, new_results.nobs // 4))]
+        p_old = acorr_ljungbox(self.results.resid, lags=lags, return_df=True)['lb_pvalue'].iloc[0]
+        p_new = acorr_ljungbox(new_results.resid, lags=lags, return_df=True)['lb_pvalue'].iloc[0]
+
+        if max_z > z_threshold or p_new < lb_alpha <= p_old:
+            print(f">> Drift rilevato (|z| max: {max_z:.2f}, Ljung-Box p: {p_new:.4f}). Nuova Grid Search.")
+            return 'retrain'
+
+        self.results = new_results
+        self._invalidate_forecast_cache()
+        self._save_results(df_prices, time.perf_counter() - start)
+        print(f">> Modello aggiornato con {len(new_obs)} nuovi mesi in {(time.perf_counter() - start) * 1000:.1f} ms.")
+        return 'aggiornato'
+
+    def _fit_engine(self, df_prices):
+        self.engine.fit(df_prices)
+        self._invalidate_forecast_cache()
+        print(f">> Motore {self.engine.label} stimato in {self.engine.fit_time * 1000:.2f} ms")
+
+    @timed("model.optimize_params")
     def _optimize_params(self, df):
-        print(">> Inizio Grid Search (Aumentata)...")
-        
+        start = time.perf_counter()
+
+        if self.search == 'stepwise':
+            print(">> Inizio Ricerca Stepwise (Hyndman-Khandakar)...")
+            rows = self._stepwise_search(df)
+        else:
+            print(">> Inizio Grid Search (Aumentata)...")
+            rows = self._grid_search(df)
+
+        self.search_results = pd.DataFrame(rows)
+        best_aic = self._select_best(self.search_results)
+
+        print(f">> Fit eseguiti: {len(rows)} in {time.perf_counter() - start:.2f}s "
+              f"(media {self.search_results['fit_time'].mean():.3f}s per fit)")
+        print(f">> Parametri ottimali trovati: {self.best_order} x {self.best_seasonal} (AIC: {best_aic:.2f})")
+
+    def _grid_search(self, df):
         # 1: Range più ampio per catturare pattern complessi
-        # p, q fino a 2. d fino a 1 (differenziazione).
-        p = q = range(0, 3) 
+        # p, q fino a max_pq. d fino a 1 (differenziazione).
+        p = q = range(0, self.max_pq + 1)
         d = range(0, 2)
         
         pdq = list(itertools.product(p, d, q))
         # Stagionalità: P, Q ridotti per velocità, ma D=1 è importante per la stagionalità annuale
         seasonal_pdq = [(x[0], x[1], x[2], 12) for x in list(itertools.product([0, 1], [0, 1], [0, 1]))]
         
-        best_aic = float("inf")
-        
-        # Contatore per feedback visivo
-        total_iter = len(pdq) * len(seasonal_pdq)
-        counter = 0
-
-        for param in pdq:
-            for param_seasonal in seasonal_pdq:
-                try:
-                    mod = sm.tsa.statespace.SARIMAX(df,
-                                                    order=param,
-                                                    seasonal_order=param_seasonal,
-                                                    enforce_stationarity=False,
-                                                    enforce_invertibility=False)
-                    res = mod.fit(disp=False)
-                    
-                    if res.aic < best_aic:
-                        best_aic = res.aic
-                        self.best_order = param
-                        self.best_seasonal = param_seasonal
-                except:
-                    continue
-                
-        print(f">> Parametri ottimali trovati: {self.best_order} x {self.best_seasonal} (AIC: {best_aic:.2f})")
+        candidates = [(param, param_seasonal) for param in pdq for param_seasonal in seasonal_pdq]
+        n_workers = resolve_n_jobs(self.n_jobs, len(candidates))
+        print(f">> Candidati da valutare: {len(candidates)} | Processi: {n_workers}")
+
+        if n_workers == 1:
+            return self._fit_batch(df, candidates)
+
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            return self._fit_batch(df, candidates, executor, n_workers)
+
+    def _stepwise_search(self, df):
+        """
+        Ricerca locale: parte da pochi modelli iniziali e si sposta sul vicino
+        con AIC migliore (p, d, q, P, D, Q +/- 1) finché nessun vicino migliora.
+        Ogni candidato viene addestrato al massimo una volta.
+        """
+        bounds = [self.max_pq, 1, self.max_pq, 1, 1, 1]  # p, d, q, P, D, Q
+        max_fits = self.max_fits or float("inf")
+
+        def clip(vec):
+            return tuple(min(max(v, 0), b) for v, b in zip(vec, bounds))
+
+        # Modelli iniziali di Hyndman-Khandakar (con d = D = 1)
+        starts = [(2, 1, 2, 1, 1, 1), (0, 1, 0, 0, 1, 0), (1, 1, 0, 1, 1, 0), (0, 1, 1, 0, 1, 1)]
+        # Mosse: ogni parametro +/- 1, più p/q e P/Q insieme
+        moves = []
+        for i in range(6):
+            for step in (-1, 1):
+                moves.append(tuple(step if j == i else 0 for j in range(6)))
+        for step in (-1, 1):
+            moves.append((step, 0, step, 0, 0, 0))
+            moves.append((0, 0, 0, step, 0, step))
+
+        evaluated = {}
+        rows = []
+        n_workers = resolve_n_jobs(self.n_jobs, len(moves))
+        executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers > 1 else None
+
+        def evaluate(vectors):
+            new = [v for v in dict.fromkeys(clip(v) for v in vectors) if v not in evaluated]
+            new = new[:max(0, int(min(max_fits - len(rows), len(new))))]
+            batch = self._fit_batch(df, [(v[:3], v[3:] + (12,)) for v in new], executor, n_workers)
+            for v, row in zip(new, batch):
+                evaluated[v] = row['aic'] if np.isfinite(row['aic']) else float("inf")
+            rows.extend(batch)
+
+        try:
+            evaluate(starts)
+            current = min(evaluated, key=evaluated.get)
+            while len(rows) < max_fits:
+                evaluate([tuple(c + m for c, m in zip(current, move)) for move in moves])
+                best = min(evaluated, key=evaluated.get)
+                if evaluated[best] >= evaluated[current]:
+                    break
+                current = best
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return rows
+
+    def _fit_batch(self, df, candidates, executor=None, n_workers=1, keep_resid=None):
+        keep_resid = self.keep_residuals if keep_resid is None else keep_resid
+        if executor is None:
+            rows = [_fit_candidate(df, param, param_seasonal, keep_resid) for param, param_seasonal in candidates]
+        else:
+            # map() restituisce i risultati nell'ordine di input: l'esito non dipende dal numero di worker
+            rows = list(executor.map(_fit_candidate,
+                                     itertools.repeat(df, len(candidates)),
+                                     [c[0] for c in candidates],
+                                     [c[1] for c in candidates],
+                                     itertools.repeat(keep_resid, len(candidates)),
+                                     chunksize=max(1, len(candidates) // (n_workers * 4))))
+
+        # I tempi dei singoli fit sono misurati anche nei worker: si registrano qui
+        for row in rows:
+            observe("model.fit_candidate", row['fit_time'])
+            if row['status'] != "OK":
+                count("model.fit_candidate.errors")
+        return rows
+
+    def _select_best(self, table):
+        """
+        Sceglie il candidato con AIC minimo dalla tabella dei risultati.
+        A parità di AIC vince il primo in ordine di griglia (ordinamento stabile).
+        """
+        valid = table[np.isfinite(table['aic'])]
+        if valid.empty:
+            print(">> Warning: Nessun candidato valido. Uso parametri di default.")
+            return float("inf")
+
+        best = valid.sort_values('aic', kind='mergesort').iloc[0]
+        self.best_order = tuple(best['order'])
+        self.best_seasonal = tuple(best['seasonal_order'])
+        return best['aic']
 
     def _validate_and_train(self, df):
         # Training Finale su TUTTI i dati
         print(">> Addestramento modello finale...")
+        import statsmodels.api as sm
+
         final_model = sm.tsa.statespace.SARIMAX(df, 
                                                 order=self.best_order, 
                                                 seasonal_order=self.best_seasonal,
                                                 enforce_stationarity=False,
                                                 enforce_invertibility=False)
-        self.results = final_model.fit(disp=False)
+        start = time.perf_counter()
+        with quiet_fit():
+            self.results = final_model.fit(disp=False)
+        self._invalidate_forecast_cache()
         
-        os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
-        self.results.save(self.save_path)
+        self._save_results(df, time.perf_counter() - start)
         print(">> Modello salvato con successo.")
 
+    @timed("model.predict_value")
     def predict_value(self, date_str, df_history):
         try:
             target_date = pd.to_datetime(date_str, format='%m/%d/%y')
@@ -93,78 +411,225 @@ class GasModel:
 
         # CASO 1: Storico
         if first_hist_date <= target_date <= last_hist_date:
-            df_daily = to_daily_resolution(df_history)
-            idx = df_daily.index.get_indexer([target_date], method='nearest')[0]
-            price = df_daily.iloc[idx].iloc[0]
+            price = DailyInterpolator.from_frame(df_history)(target_date)
             return price, "STORICO", "Dato recuperato dallo storico"
 
         # CASO 2: Futuro
         elif target_date > last_hist_date:
-            if not self.results:
+            if not self.is_loaded():
                 return None, None, "Modello non caricato"
             
-            delta_months = (target_date.year - last_hist_date.year) * 12 + (target_date.month - last_hist_date.month)
-            steps = delta_months + 2 # Buffer aumentato
-            
-            forecast = self.results.get_forecast(steps=steps)
-            pred_series = forecast.predicted_mean
-            
-            # CORREZIONE 2: Allineamento Nomi Colonne per Concat
-            # Assicuriamo che la serie predetta abbia lo stesso nome della colonna prezzi
-            col_name = df_history.columns[0] # Es: 'Prices'
-            pred_series.name = col_name 
+            steps = self._steps_to(last_hist_date, target_date)
             
-            history_tail = df_history.iloc[[-1]]
+            pred_series, _ = self.get_cached_forecast(steps)
             
-            # Ora la concatenazione funziona verticalmente perché i nomi colonne coincidono
-            combined = pd.concat([history_tail, pred_series.to_frame()])
+            # L'interpolazione parte dall'ultimo dato storico reale
+            curve = DailyInterpolator.from_frame(pd.concat([df_history.iloc[:, 0].iloc[[-1]], pred_series]))
             
-            combined_daily = to_daily_resolution(combined)
-            
-            if target_date <= combined_daily.index.max():
-                idx = combined_daily.index.get_indexer([target_date], method='nearest')[0]
-                val = combined_daily.iloc[idx]
-                price = val if isinstance(val, (int, float, np.number)) else val.iloc[0]
-                return price, "PREVISIONE", f"SARIMA {self.best_order}x{self.best_seasonal}"
+            if curve.contains(target_date)[0]:
+                return curve(target_date), "PREVISIONE", self.label
             else:
                  return None, None, "Data fuori range previsionale"
 
         else:
             return None, None, "Data antecedente allo storico"
 
+    @timed("model.predict_values")
+    def predict_values(self, dates, df_history):
+        """
+        Versione vettoriale di predict_value per molte date.
+        Costruisce la curva storico+previsione una sola volta (fino alla data
+        più lontana) e risolve tutte le date con un'unica interpolazione vettoriale.
+        Restituisce un DataFrame allineato all'input: Date, Price, Label, Status.
+        """
+        raw = pd.Series(list(dates))
+        # Date già in formato datetime passano dirette, le stringhe usano il formato MM/GG/AA
+        if not pd.api.types.is_datetime64_any_dtype(raw):
+            raw = pd.to_datetime(raw, format='%m/%d/%y', errors='coerce')
+        target_idx = pd.DatetimeIndex(raw)
+
+        n = len(target_idx)
+        prices = np.full(n, np.nan)
+        labels = np.full(n, None, dtype=object)
+        status = np.full(n, "Formato data errato (usa MM/GG/AA)", dtype=object)
+
+        first_hist_date = df_history.index.min()
+        last_hist_date = df_history.index.max()
+
+        valid = ~target_idx.isna()
+        is_hist = valid & (target_idx >= first_hist_date) & (target_idx <= last_hist_date)
+        is_future = valid & (target_idx > last_hist_date)
+        status[valid & (target_idx < first_hist_date)] = "Data antecedente allo storico"
+
+        if is_future.any() and not self.is_loaded():
+            status[is_future] = "Modello non caricato"
+            is_future[:] = False
+
+        if is_hist.any() or is_future.any():
+            horizon = target_idx[is_future].max() if is_future.any() else None
+            curve = self._build_curve(df_history, horizon)
+
+            lookup = is_hist | is_future
+            prices[lookup] = curve(target_idx[lookup])
+
+            labels[is_hist] = "STORICO"
+            status[is_hist] = "Dato recuperato dallo storico"
+            labels[is_future] = "PREVISIONE"
+            status[is_future] = self.label
+
+        return pd.DataFrame({"Date": target_idx, "Price": prices, "Label": labels, "Status": status})
+
+    @timed("model.predict_quantiles")
+    def predict_quantiles(self, dates, df_history, quantiles=DEFAULT_QUANTILES):
+        """
+        Quantili della previsione a date giornaliere arbitrarie (batch).
+        Media e deviazione standard della previsione (var_pred_mean) sono interpolate
+        linearmente tra i punti mensili, come i prezzi di predict_values: la colonna P50
+        coincide con Price. Sullo storico l'incertezza è nulla e tutti i quantili
+        valgono il prezzo osservato.
+        Restituisce le colonne di predict_values più Std e una colonna per quantile (P5, P25, ...).
+        """
+        quantiles = np.atleast_1d(np.asarray(quantiles, dtype=float))
+        if np.any((quantiles <= 0) | (quantiles >= 1)):
+            raise ValueError(f"Quantili non validi: {quantiles.tolist()} (devono essere in (0, 1))")
+        z = np.array([NormalDist().inv_cdf(q) for q in quantiles])
+
+        base = self.predict_values(dates, df_history)
+        target_idx = pd.DatetimeIndex(base['Date'])
+        is_future = (base['Label'] == "PREVISIONE").values
+
+        std = np.where(base['Price'].notna(), 0.0, np.nan)
+        if is_future.any():
+            knot_days, knot_se = self._forecast_bands(df_history, target_idx[is_future].max())
+            std[is_future] = np.interp(to_epoch_days(target_idx[is_future]), knot_days, knot_se)
+
+        bands = base['Price'].values[:, None] + z[None, :] * std[:, None]
+        table = pd.DataFrame(bands, columns=[f"P{q * 100:g}" for q in quantiles])
+        table.insert(0, "Std", std)
+        table.insert(0, "Price", base['Price'].values)
+        table.insert(0, "Date", target_idx)
+        table["Label"] = base['Label'].values
+        table["Status"] = base['Status'].values
+        return table
+
+    @staticmethod
+    def _steps_to(last_hist_date, horizon):
+        """Passi mensili di previsione per coprire 'horizon' dall'ultimo dato storico (con buffer)."""
+        delta_months = (horizon.year - last_hist_date.year) * 12 + (horizon.month - last_hist_date.month)
+        return delta_months + 2 # Buffer aumentato
+
+    def _forecast_bands(self, df_history, horizon):
+        """
+        Nodi mensili (giorni-epoch, deviazione standard) dall'ultimo dato storico
+        fino a 'horizon'. Calcolati una volta per orizzonte e conservati: orizzonti più
+        corti riusano i nodi di quello più lungo.
+        """
+        last_hist_date = df_history.index.max()
+        steps = self._steps_to(last_hist_date, horizon)
+
+        key = (self._forecast_key(), last_hist_date)
+        cache = self._band_cache
+        if cache is not None and cache['key'] == key and cache['steps'] >= steps:
+            return cache['days'], cache['se']
+
+        pred_series, _ = self.get_cached_forecast(steps)
+        se = self._forecast_cache['se'].iloc[:steps]
+        days = np.concatenate([to_epoch_days(last_hist_date), to_epoch_days(pred_series.index)])
+        se = np.concatenate([[0.0], se.values])
+
+        self._band_cache = {'key': key, 'steps': steps, 'days': days, 'se': se}
+        return days, se
+
+    def _build_curve(self, df_history, horizon=None):
+        """
+        Curva unica storico + previsione SARIMA (fino alla data 'horizon'),
+        interrogabile a qualunque data giornaliera senza resample.
+        """
+        history = df_history.iloc[:, 0]
+        if horizon is None:
+            return DailyInterpolator.from_frame(history)
+
+        last_hist_date = df_history.index.max()
+        steps = self._steps_to(last_hist_date, horizon)
+
+        pred_series, _ = self.get_cached_forecast(steps)
+        return DailyInterpolator.from_frame(pd.concat([history, pred_series]))
+
     def get_forecast_for_plot(self, steps=24):
-        forecast = self.results.get_forecast(steps=steps)
-        return forecast.predicted_mean, forecast.conf_int()
+        return self.get_cached_forecast(steps)
+
+    def get_cached_forecast(self, steps):
+        """
+        Previsione (media + intervallo di confidenza 95%) con memoizzazione.
+        La cache conserva anche la deviazione standard (var_pred_mean) per i quantili.
+        La chiave è l'impronta dei parametri stimati e dei dati di training:
+        se il modello non cambia, orizzonti più corti vengono serviti
+        tagliando quello più lungo già calcolato.
+        """
+        key = self._forecast_key()
+        cache = self._forecast_cache
+
+        if cache is not None and cache['key'] == key and cache['steps'] >= steps:
+            self.cache_hits += 1
+            count("model.forecast_cache.hits")
+        else:
+            self.cache_misses += 1
+            count("model.forecast_cache.misses")
+            source = self.engine if self.engine is not None else self.results
+            # Leggere 'results' può ricostruire il modello dal registro e cambiarne la chiave
+            key = self._forecast_key()
+            with timed("model.get_forecast"), quiet_fit():
+                forecast = source.get_forecast(steps=steps)
+            cache = self._forecast_cache = {
+                'key': key,
+                'steps': steps,
+                'mean': forecast.predicted_mean,
+                'conf': forecast.conf_int(),
+                'se': np.sqrt(forecast.var_pred_mean)
+            }
+
+        # Copie: i chiamanti (es. il visualizer) rinominano le serie restituite
+        return cache['mean'].iloc[:steps].copy(), cache['conf'].iloc[:steps].copy()
+
+    def cache_info(self):
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'steps': self._forecast_cache['steps'] if self._forecast_cache else 0
+        }
+
+    def _forecast_key(self):
+        if self.engine is not None:
+            return 'engine', self.engine.label, self.engine.fingerprint
+        if self._pending_entry is not None:
+            return 'registry', self._pending_entry[0]['key']
+        params = np.asarray(self.results.params, dtype=float)
+        endog = np.ascontiguousarray(self.results.model.endog, dtype=float)
+        params_fp = hashlib.sha1(params.tobytes() + repr(self.results.model.param_names).encode()).hexdigest()
+        history_fp = hashlib.sha1(endog.tobytes()).hexdigest()
+        return params_fp, history_fp
+
+    def _invalidate_forecast_cache(self):
+        self._forecast_cache = None
+        self._band_cache = None
+
     def run_backtest(self, df, test_months=6):
         
         print(f"\n--- AVVIO BACKTEST (Ultimi {test_months} mesi nascosti) ---")
         
-        # 1. Split Temporale
-        train = df.iloc[:-test_months]
-        test = df.iloc[-test_months:] # Questi sono i dati reali che oscuriamo
+        # 1-3. Split temporale, addestramento su dati parziali e previsione sul periodo oscurato
+        # Nota: Usiamo gli stessi best_order trovati (o lo stesso motore), ma i coefficienti vengono ricalcolati
+        train, test, pred_mean = holdout_forecast(df, self.best_order, self.best_seasonal, test_months,
+                                                  forecaster=self.engine)
         
         print(f">> Training set: {len(train)} mesi | Test set: {len(test)} mesi")
         
-        # 2. Addestramento su dati parziali (usando i parametri migliori già trovati)
-        # Nota: Usiamo gli stessi best_order trovati, ma i coefficienti vengono ricalcolati
-        model = sm.tsa.statespace.SARIMAX(train, 
-                                        order=self.best_order, 
-                                        seasonal_order=self.best_seasonal,
-                                        enforce_stationarity=False, 
-                                        enforce_invertibility=False)
-        res = model.fit(disp=False)
-        
-        # 3. Previsione sul periodo oscurato
-        forecast = res.get_forecast(steps=test_months)
-        pred_mean = forecast.predicted_mean
-        pred_mean.index = test.index # Allineamento indici per sicurezza
-        
         # 4. Calcolo Metriche di Errore
         # MAE: Errore medio assoluto (quanto sbaglio in media in $)
         mae = np.mean(np.abs(pred_mean - test.iloc[:,0]))
         
         # RMSE: Radice dell'errore quadratico medio 
-        rmse = np.sqrt(mean_squared_error(test, pred_mean))
+        rmse = np.sqrt(np.mean((test.iloc[:,0] - pred_mean) ** 2))
         
         # MAPE: Errore percentuale medio 
         mape = np.mean(np.abs((test.iloc[:,0] - pred_mean) / test.iloc[:,0])) * 100
@@ -0,0 +1,155 @@
+import pandas as pd
+import numpy as np
+from src.optimizer import StorageOptimizer
+from src.model import GasModel
+
+
+def knot_weights(last_hist_date, dates, horizon=None):
+    """
+    Matrice (date x nodi) dei pesi di interpolazione lineare giornaliera tra i nodi
+    mensili della curva (ultimo dato storico + mesi di previsione fino a 'horizon',
+    di default l'ultima data): prezzi_giornalieri = prezzi_nodi @ pesi.T
+    """
+    horizon = dates.max() if horizon is None else horizon
+    steps = GasModel._steps_to(last_hist_date, horizon)
+
+    knots = pd.date_range(last_hist_date, periods=steps + 1, freq='ME')
+    knot_days = knots.values.astype('datetime64[D]').astype(np.int64)
+    days = dates.values.astype('datetime64[D]').astype(np.int64)
+
+    left = np.clip(np.searchsorted(knot_days, days, side='right') - 1, 0, len(knot_days) - 2)
+    frac = (days - knot_days[left]) / (knot_days[left + 1] - knot_days[left])
+
+    weights = np.zeros((len(days), len(knot_days)))
+    rows = np.arange(len(days))
+    weights[rows, left] = 1 - frac
+    weights[rows, left + 1] = frac
+    return weights, knots
+
+
+class MonteCarloValuator:
+    def __init__(self, price_model, df_history, n_paths=10000, chunk_size=5000, seed=None):
+        """
+        Valutazione Monte Carlo dei contratti di stoccaggio.
+        I percorsi di prezzo sono simulati dal modello SARIMA stimato (forma
+        state-space, come SARIMAXResults.simulate), a blocchi di 'chunk_size'
+        percorsi per tenere limitata la memoria anche con 100k percorsi.
+        Con lo stesso seed (e lo stesso chunk_size) i risultati sono riproducibili.
+        """
+        self.price_model = price_model
+        self.df_history = df_history
+        self.n_paths = n_paths
+        self.chunk_size = chunk_size
+        self.seed = seed
+
+    def value_schedule(self, contract, injection_dates, withdrawal_dates, alpha=0.05):
+        """
+        Distribuzione dell'NPV di una strategia fissata (date di iniezione/prelievo).
+        Restituisce (statistiche, array degli NPV per percorso).
+        """
+        dates, actions, raw_dates = contract._sort_events(injection_dates, withdrawal_dates)
+        base = self.price_model.predict_values(raw_dates, self.df_history)
+        return self._value_events(contract, dates, actions, base, alpha)
+
+    def value_intrinsic(self, contract, start_date, end_date, freq='D', alpha=0.05):
+        """
+        Valore intrinseco: la strategia ottimale sulla curva attesa (StorageOptimizer)
+        viene mantenuta fissa e valutata su tutti i percorsi simulati.
+        """
+        _, _, schedule = StorageOptimizer(contract).solve(
+            self.price_model, self.df_history, start_date, end_date, freq=freq)
+
+        injections = schedule['Date'][schedule['Action'] == 'INJECTION']
+        withdrawals = schedule['Date'][schedule['Action'] == 'WITHDRAWAL']
+        return self.value_schedule(contract, list(injections), list(withdrawals), alpha)
+
+    def _value_events(self, contract, dates, actions, base, alpha):
+        base_prices = base['Price'].values
+        valid = ~np.isnan(base_prices)
+        future = (base['Label'] == 'PREVISIONE').values
+
+        # Con la strategia fissata i volumi non dipendono dal prezzo:
+        # NPV(percorso) = costante + somma(volume_con_segno * prezzo_evento)
+        base_value, df_ledger = contract._value_schedule(dates, actions, base_prices)
+        moves = df_ledger[df_ledger['Action'] != 'CARRYING COST']
+
+        signed_vol = np.zeros(len(dates))
+        signed_vol[valid] = np.where(moves['Action'] == 'INJECTION', -1.0, 1.0) * moves['Volume'].values
+        constant = base_value - signed_vol[valid] @ base_prices[valid]
+
+        # Gli eventi storici hanno prezzo certo e finiscono nella costante
+        hist = valid & ~future
+        constant += signed_vol[hist] @ base_prices[hist]
+
+        npv = np.full(self.n_paths, constant)
+        if future.any():
+            weights, steps = self._interp_weights(dates[future])
+            done = 0
+            for paths in self.iter_paths(steps):
+                npv[done:done + len(paths)] += (paths @ weights.T) @ signed_vol[future]
+                done += len(paths)
+
+        return self.summarize(npv, alpha), npv
+
+    def iter_paths(self, steps):
+        """
+        Generatore di percorsi mensili simulati, a blocchi.
+        Ogni blocco ha forma (percorsi, 1 + steps): la prima colonna è l'ultimo
+        prezzo storico, da cui parte l'interpolazione giornaliera.
+        """
+        rng = np.random.default_rng(self.seed)
+        last_price = self.df_history.iloc[-1, 0]
+
+        remaining = self.n_paths
+        while remaining > 0:
+            n = min(self.chunk_size, remaining)
+            paths = self._simulate(steps, n, rng)
+            yield np.hstack([np.full((n, 1), last_price), paths])
+            remaining -= n
+
+    def _simulate(self, steps, n, rng):
+        """
+        Simulazione vettoriale di n percorsi dal modello in forma state-space,
+        equivalente a SARIMAXResults.simulate(anchor='end') ma con tutti i
+        percorsi avanzati insieme (simulate di statsmodels cicla sulle ripetizioni).
+        """
+        engine = getattr(self.price_model, 'engine', None)
+        if engine is not None and not hasattr(engine, 'results'):
+            raise ValueError(f"Simulazione disponibile solo per i modelli SARIMA (motore: {engine.label})")
+        res = engine.results if engine is not None else self.price_model.results
+        ssm = res.filter_results
+
+        # Matrici del sistema (modello tempo-invariante: si usa la prima fetta)
+        design, obs_intercept, obs_cov = ssm.design[..., 0], ssm.obs_intercept[:, 0], ssm.obs_cov[..., 0]
+        transition, state_intercept = ssm.transition[..., 0], ssm.state_intercept[:, 0]
+        selection, state_cov = ssm.selection[..., 0], ssm.state_cov[..., 0]
+
+        # Stato iniziale estratto dalla distribuzione predetta a fine campione
+        state = rng.multivariate_normal(res.predicted_state[:, -1], res.predicted_state_cov[:, :, -1], size=n)
+        state_chol = selection @ np.linalg.cholesky(state_cov)
+        obs_chol = np.linalg.cholesky(obs_cov) if np.any(obs_cov) else None
+
+        paths = np.empty((n, steps))
+        for t in range(steps):
+            obs = state @ design.T + obs_intercept
+            if obs_chol is not None:
+                obs += rng.standard_normal((n, len(obs_intercept))) @ obs_chol.T
+            paths[:, t] = obs[:, 0]
+            state = state @ transition.T + state_intercept + rng.standard_normal((n, state_cov.shape[0])) @ state_chol.T
+        return paths
+
+    def _interp_weights(self, dates):
+        weights, knots = knot_weights(self.df_history.index.max(), dates)
+        return weights, len(knots) - 1
+
+    @staticmethod
+    def summarize(npv, alpha=0.05, percentiles=(5, 25, 50, 75, 95)):
+        """Statistiche della distribuzione: media, percentili, VaR e CVaR (coda sinistra)."""
+        stats = {"paths": len(npv), "mean": npv.mean(), "std": npv.std(ddof=1) if len(npv) > 1 else 0.0}
+        for q, v in zip(percentiles, np.percentile(npv, percentiles)):
+            stats[f"p{q}"] = v
+
+        var = np.quantile(npv, alpha)
+        stats[f"VaR_{alpha:.0%}"] = var
+        stats[f"CVaR_{alpha:.0%}"] = npv[npv <= var].mean()
+        return stats
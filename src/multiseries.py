@@ -0,0 +1,146 @@
+import io
+import sys
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from src.model import GasModel, standardized_residuals
+from src.registry import ModelRegistry
+from src.utils import resolve_n_jobs
+
+
+def _train_series(series_id, df_series, save_dir, model_kwargs):
+    """
+    Ricerca degli ordini e fit di una singola serie, con caching nel registro.
+    Gira nei worker: restituisce (riepilogo, stima). La stima è il motore stimato
+    oppure ordini e parametri del SARIMA (None se il training è fallito).
+    """
+    start = time.perf_counter()
+    # Il parallelismo è già tra le serie: ogni worker stima in un solo processo
+    kwargs = {**model_kwargs, 'n_jobs': 1}
+    if kwargs.get('engine') is not None:
+        # Ogni serie stima la propria copia del motore
+        kwargs['engine'] = kwargs['engine'].clone()
+    model = GasModel(save_dir=save_dir, **kwargs)
+
+    # I messaggi di ogni serie si sovrapporrebbero: si tiene solo l'esito
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            model.load_or_train(df_series.iloc[:, 0])
+            status = "OK"
+        except Exception as e:
+            status = f"ERRORE: {e}"
+
+    fitted = None
+    if status == "OK":
+        if model.engine is not None:
+            fitted = model.engine
+        else:
+            fitted = {"order": list(model.best_order), "seasonal_order": list(model.best_seasonal),
+                      "params": [float(p) for p in model.results.params]}
+
+    row = {
+        "series_id": series_id,
+        "order": model.best_order,
+        "seasonal_order": model.best_seasonal,
+        "aic": model.results.aic if model.results is not None else float("nan"),
+        "nobs": len(df_series),
+        "time": time.perf_counter() - start,
+        "status": status
+    }
+    return row, fitted
+
+
+def _peak_memory_mb():
+    """
+    Picco di memoria (MB) del processo principale e dei worker, oppure None
+    dove il modulo 'resource' non esiste (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss è in KB su Linux, in byte su macOS
+    scale = 1024 ** 2 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+class MultiSeriesModel:
+    def __init__(self, save_dir='models', n_jobs=-1, **model_kwargs):
+        """
+        Un GasModel per ogni serie (hub / scadenza), addestrati in parallelo.
+        Tutte le serie condividono lo stesso registro dei modelli: le serie
+        già stimate sugli stessi dati non vengono riaddestrate.
+        Gli altri argomenti (search, max_pq, ...) sono passati a ogni GasModel.
+        """
+        self.save_dir = save_dir
+        self.n_jobs = n_jobs
+        self.model_kwargs = model_kwargs
+        self.models = {}
+        self.history = {}
+        self.report = None
+
+    def train(self, panel):
+        """
+        Addestra tutte le serie di 'panel' (dict serie_id -> DataFrame pulito,
+        come da DataLoader.get_clean_panel). Restituisce il report per serie.
+        """
+        start = time.perf_counter()
+        n_workers = resolve_n_jobs(self.n_jobs, len(panel))
+        print(f">> Training multi-serie: {len(panel)} serie | Processi: {n_workers}")
+
+        if n_workers == 1:
+            outputs = [_train_series(sid, df, self.save_dir, self.model_kwargs) for sid, df in panel.items()]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [executor.submit(_train_series, sid, df, self.save_dir, self.model_kwargs)
+                           for sid, df in panel.items()]
+                outputs = [f.result() for f in as_completed(futures)]
+
+        rows = [row for row, _ in outputs]
+        fits = {row['series_id']: fitted for row, fitted in outputs}
+        self.report = pd.DataFrame(rows).set_index('series_id').loc[list(panel)]
+
+        # Il processo principale usa le stime dei worker: nessun nuovo training,
+        # anche senza registro (per il SARIMA basta un passaggio del filtro di Kalman)
+        for series_id, df_series in panel.items():
+            fitted = fits[series_id]
+            if fitted is None:
+                continue
+            model = GasModel(save_dir=self.save_dir, **self.model_kwargs)
+            if isinstance(fitted, dict):
+                model.best_order = tuple(fitted['order'])
+                model.best_seasonal = tuple(fitted['seasonal_order'])
+                model.results = ModelRegistry.rebuild(fitted, df_series.iloc[:, 0])
+            else:
+                model.engine = fitted
+            self.models[series_id] = model
+            self.history[series_id] = df_series
+
+        elapsed = time.perf_counter() - start
+        peak = _peak_memory_mb()
+
+        print(f">> Completato in {elapsed:.2f}s | Throughput: {len(panel) / elapsed * 60:.1f} serie/minuto")
+        if peak is not None:
+            print(f">> Picco memoria: {peak[0]:.0f} MB (principale) | {peak[1]:.0f} MB (worker)")
+        failed = (self.report['status'] != "OK").sum()
+        if failed:
+            print(f"⚠️ {failed} serie non addestrate: vedi report['status'].")
+
+        return self.report
+
+    def predict_values(self, series_id, dates):
+        """Prezzi batch per una serie (stesso output di GasModel.predict_values)."""
+        if series_id not in self.models:
+            raise KeyError(f"Serie non addestrata: {series_id}")
+        return self.models[series_id].predict_values(dates, self.history[series_id])
+
+    def predict_value(self, series_id, date_str):
+        if series_id not in self.models:
+            return None, None, f"Serie non addestrata: {series_id}"
+        return self.models[series_id].predict_value(date_str, self.history[series_id])
+
+    def residuals(self):
+        """Residui standardizzati di ogni serie addestrata (input di GasValidator.diagnose_series)."""
+        return {series_id: standardized_residuals(model.results) for series_id, model in self.models.items()}
@@ -0,0 +1,134 @@
+import math
+import pandas as pd
+import numpy as np
+
+# Codici delle azioni nella policy
+HOLD, INJECTION, WITHDRAWAL = 0, 1, 2
+# Tetto ai livelli della griglia di inventario: la policy occupa passi x livelli byte
+MAX_LEVELS = 2001
+
+
+class StorageOptimizer:
+    def __init__(self, contract, volume_step=None):
+        """
+        Ottimizzatore della strategia di stoccaggio (programmazione dinamica).
+        L'inventario è discretizzato su una griglia di passo 'volume_step':
+        di default il MCD tra max_volume, inj_rate e with_rate, così i livelli
+        raggiungibili dal contratto sono rappresentati esattamente.
+        Se la griglia supererebbe MAX_LEVELS livelli (ratei non "tondi", volumi non interi)
+        si usa il passo più fine ammesso dal tetto: la strategia diventa approssimata,
+        ma il ledger resta valutato con i ratei reali del contratto.
+        """
+        self.contract = contract
+        step = volume_step or self._default_step(contract)
+        if contract.max_volume / step + 1 > MAX_LEVELS:
+            coarse = contract.max_volume / (MAX_LEVELS - 1)
+            print(f"⚠️ Griglia di inventario troppo fine (passo {step}): uso il passo {coarse:.6g} "
+                  f"({MAX_LEVELS} livelli), strategia approssimata.")
+            step = coarse
+        self.volume_step = step
+
+        self.n_levels = int(round(contract.max_volume / step)) + 1
+        # Rateo espresso in livelli di griglia (arrotondato per difetto, almeno un livello)
+        self.inj_levels = max(1, int(contract.inj_rate // step))
+        self.with_levels = max(1, int(contract.with_rate // step))
+
+    @staticmethod
+    def _default_step(contract):
+        volumes = (contract.max_volume, contract.inj_rate, contract.with_rate)
+        if not all(float(v).is_integer() for v in volumes):
+            # Nessun passo esatto: ci pensa il tetto ai livelli
+            return contract.max_volume / (MAX_LEVELS - 1)
+        return math.gcd(*(int(v) for v in volumes))
+
+    def solve(self, price_model, df_history, start_date, end_date, freq='D'):
+        """
+        Trova la strategia (iniezione / prelievo / attesa) che massimizza il valore
+        tra start_date ed end_date, sulla curva forward del modello.
+        Restituisce (NPV, ledger, schedule) con il ledger nello stesso formato
+        di StorageContract.calculate_valuation.
+        """
+        start, end = (pd.to_datetime(d, format='%m/%d/%y') if isinstance(d, str) else pd.Timestamp(d)
+                      for d in (start_date, end_date))
+        dates = pd.date_range(start, end, freq=freq)
+        prices = price_model.predict_values(dates, df_history)['Price'].values
+
+        return self.solve_prices(dates, prices)
+
+    def solve_prices(self, dates, prices):
+        """Ottimizzazione su una curva prezzi già calcolata (date ordinate, prezzi allineati)."""
+        dates = pd.DatetimeIndex(dates)
+        policy, _ = self._backward(dates, np.asarray(prices, dtype=float))
+        actions = self._forward(policy)
+
+        active = actions != HOLD
+        schedule = pd.DataFrame({
+            "Date": dates[active],
+            "Action": np.where(actions[active] == INJECTION, 'INJECTION', 'WITHDRAWAL')
+        })
+
+        value, df_ledger = self.contract._value_schedule(
+            dates[active], schedule['Action'].values.astype(object), np.asarray(prices, dtype=float)[active])
+        return value, df_ledger, schedule
+
+    def _backward(self, dates, prices):
+        """
+        Induzione a ritroso, vettoriale su tutti i livelli di inventario.
+        Il magazzino deve essere vuoto a fine orizzonte (il gas residuo non ha valore
+        nel ledger), e il costo di stoccaggio si paga sui giorni fino al passo successivo.
+        """
+        c = self.contract
+        n_steps = len(dates)
+        levels = np.arange(self.n_levels)
+        volumes = levels * self.volume_step
+
+        # Giorni tra un passo e il successivo (l'ultimo è irrilevante: inventario finale = 0)
+        gaps = np.append(np.diff(dates.asi8) // (86_400 * 10**9), 0)
+
+        # Transizioni (indici di livello) con i vincoli di spazio e disponibilità
+        inj_to = np.minimum(levels + self.inj_levels, self.n_levels - 1)
+        with_to = np.maximum(levels - self.with_levels, 0)
+        inj_vol = volumes[inj_to] - volumes
+        with_vol = volumes - volumes[with_to]
+
+        value = np.where(levels == 0, 0.0, -np.inf)
+        policy = np.zeros((n_steps, self.n_levels), dtype=np.int8)
+
+        for t in range(n_steps - 1, -1, -1):
+            # Valore di continuazione al netto del costo di stoccaggio fino al passo successivo
+            carry = volumes * (c.storage_cost_monthly / 30) * gaps[t]
+            cont = value - carry
+
+            price = prices[t]
+            if np.isnan(price):
+                # Data non prezzabile (es. prima dello storico): si può solo attendere
+                value = cont
+                continue
+
+            candidates = np.vstack([
+                cont,
+                -(inj_vol * (price + c.inj_cost)) + cont[inj_to],
+                with_vol * (price - c.with_cost) + cont[with_to]
+            ])
+            # Le azioni senza volume equivalgono ad attendere
+            candidates[1, inj_vol == 0] = -np.inf
+            candidates[2, with_vol == 0] = -np.inf
+
+            # argmax sceglie il primo massimo: a parità di valore si preferisce attendere
+            policy[t] = np.argmax(candidates, axis=0)
+            value = candidates[policy[t], levels]
+
+        return policy, value[0]
+
+    def _forward(self, policy):
+        """Ricostruisce le azioni ottimali partendo dal magazzino vuoto."""
+        level = 0
+        actions = np.empty(len(policy), dtype=np.int8)
+        for t, row in enumerate(policy):
+            action = row[level]
+            actions[t] = action
+            if action == INJECTION:
+                level = min(level + self.inj_levels, self.n_levels - 1)
+            elif action == WITHDRAWAL:
+                level = max(level - self.with_levels, 0)
+        return actions
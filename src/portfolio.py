@@ -0,0 +1,221 @@
+import math
+import itertools
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+from src.pricing import StorageContract
+from src.utils import resolve_n_jobs
+
+# Colonne dei parametri contrattuali (nomi degli argomenti di StorageContract)
+CONTRACT_PARAMS = ('max_volume', 'inj_rate', 'with_rate', 'inj_cost', 'with_cost', 'storage_cost')
+# Attributo di StorageContract per ogni parametro
+CONTRACT_ATTRIBUTES = {'max_volume': 'max_volume', 'inj_rate': 'inj_rate', 'with_rate': 'with_rate',
+                       'inj_cost': 'inj_cost', 'with_cost': 'with_cost', 'storage_cost': 'storage_cost_monthly'}
+
+# Blocco di contratti allineato per la valutazione vettoriale (vedi event_matrix)
+EventMatrix = namedtuple('EventMatrix', ['contract_ids', 'params', 'date_ns', 'injection', 'events', 'values'])
+
+
+def contract_records(contracts):
+    """(contract_id, parametri, date di iniezione, date di prelievo) per ogni riga del portafoglio."""
+    params = [c for c in CONTRACT_PARAMS if c in contracts.columns]
+    # Senza colonne di parametri to_dict('records') restituirebbe una lista vuota
+    param_rows = contracts[params].to_dict('records') if params else itertools.repeat({}, len(contracts))
+    return zip(contracts.index, param_rows, contracts['injection_dates'], contracts['withdrawal_dates'])
+
+
+def _value_chunk(rows, price_lookup, date_lookup, keep_ledgers):
+    """
+    Valuta un blocco di contratti usando la curva prezzi condivisa (anche in un worker).
+    Il ledger completo (_value_schedule) si costruisce solo se richiesto: altrimenti
+    tutto il blocco è valutato insieme, un contratto per riga (_value_rows).
+    """
+    if not keep_ledgers:
+        return _value_rows(rows, price_lookup, date_lookup), None
+
+    summary = []
+    ledgers = {}
+    for contract_id, params, inj_dates, wit_dates in rows:
+        contract = StorageContract(**params)
+
+        raw_dates = list(inj_dates) + list(wit_dates)
+        actions = np.array(['INJECTION'] * len(inj_dates) + ['WITHDRAWAL'] * len(wit_dates), dtype=object)
+        date_ns = np.array([date_lookup[d] for d in raw_dates], dtype=np.int64)
+        order = np.argsort(date_ns, kind='stable')
+
+        dates = pd.DatetimeIndex(date_ns[order])
+        prices = np.array([price_lookup[raw_dates[i]] for i in order], dtype=float)
+        value, df_ledger = contract._value_schedule(dates, actions[order], prices)
+        ledgers[contract_id] = df_ledger
+
+        summary.append({
+            "contract_id": contract_id,
+            "NPV": value,
+            "Events": len(raw_dates),
+            "Skipped": int(np.isnan(prices).sum()),
+            "FinalInventory": df_ledger['Inventory'].iloc[-1] if len(df_ledger) else 0
+        })
+
+    return pd.DataFrame(summary), ledgers
+
+
+def event_matrix(rows, date_lookup, **lookups):
+    """
+    Eventi di un blocco di contratti (righe di contract_records) in matrici
+    contratti x eventi, ordinate per data riga per riga (ordinamento stabile,
+    come _sort_events), con padding in coda.
+    Ogni dizionario in 'lookups' (data -> valore, es. i prezzi) diventa una matrice
+    allineata in 'values', con NaN nel padding e per le date assenti.
+    """
+    contract_ids, params, inj_lists, wit_lists = zip(*rows)
+    contracts = [StorageContract(**p) for p in params]
+
+    n_inj = np.fromiter(map(len, inj_lists), dtype=np.int64, count=len(rows))
+    n_events = n_inj + np.fromiter(map(len, wit_lists), dtype=np.int64, count=len(rows))
+    flat = [d for inj, wit in zip(inj_lists, wit_lists) for d in itertools.chain(inj, wit)]
+
+    # Posizione (riga, colonna) di ogni evento nella matrice
+    row = np.repeat(np.arange(len(rows)), n_events)
+    col = np.arange(len(flat)) - np.repeat(np.cumsum(n_events) - n_events, n_events)
+    width = int(n_events.max())
+
+    date_ns = np.full((len(rows), width), np.iinfo(np.int64).max)
+    date_ns[row, col] = np.fromiter((date_lookup[d] for d in flat), dtype=np.int64, count=len(flat))
+    injection = np.zeros((len(rows), width), dtype=bool)
+    injection[row, col] = col < n_inj[row]
+    values = {}
+    for name, lookup in lookups.items():
+        values[name] = np.full((len(rows), width), np.nan)
+        values[name][row, col] = np.fromiter((lookup.get(d, np.nan) for d in flat), dtype=float, count=len(flat))
+
+    order = np.argsort(date_ns, axis=1, kind='stable')
+    date_ns, injection = np.take_along_axis(date_ns, order, axis=1), np.take_along_axis(injection, order, axis=1)
+    values = {name: np.take_along_axis(v, order, axis=1) for name, v in values.items()}
+    events = np.arange(width) < n_events[:, None]
+    # Il padding ripete l'ultima data reale: nessun giorno di stoccaggio in più
+    last = np.take_along_axis(date_ns, np.maximum(n_events - 1, 0)[:, None], axis=1)
+    date_ns = np.where(events, date_ns, last)
+
+    contract_params = {name: np.array([getattr(c, attr) for c in contracts], dtype=float)
+                       for name, attr in CONTRACT_ATTRIBUTES.items()}
+    return EventMatrix(list(contract_ids), contract_params, date_ns, injection, events, values)
+
+
+def _value_rows(rows, price_lookup, date_lookup):
+    """NPV e inventario finale di un blocco di contratti senza ciclo per contratto (event_matrix)."""
+    batch = event_matrix(rows, date_lookup, price=price_lookup)
+    prices = batch.values['price']
+    valid = batch.events & ~np.isnan(prices)
+
+    npv, final_inventory = value_rows(batch, prices, valid)
+
+    return pd.DataFrame({
+        "contract_id": batch.contract_ids,
+        "NPV": npv,
+        "Events": batch.events.sum(axis=1),
+        "Skipped": (batch.events & np.isnan(prices)).sum(axis=1),
+        "FinalInventory": final_inventory
+    })
+
+
+def value_rows(batch, prices, valid, repeat=1, **shocks):
+    """
+    Valuta le righe di un EventMatrix su 'prices' (stessa forma delle matrici del blocco).
+    Con repeat > 1 ogni contratto ha 'repeat' scenari consecutivi: 'prices' ha
+    len(contratti) * repeat righe e 'shocks' (come in _value_batch) un valore per riga.
+    Restituisce (NPV, inventario finale) per riga.
+    """
+    def rows(a):
+        return np.repeat(a, repeat, axis=0)
+
+    params = {name: shocks.get(name, rows(batch.params[name])) for name in CONTRACT_ATTRIBUTES}
+    is_inj = rows(batch.injection) & valid
+    is_wit = ~rows(batch.injection) & valid
+    return StorageContract._npv_rows(
+        rows(batch.date_ns), is_inj, is_wit, valid, prices,
+        params['inj_rate'], params['with_rate'], params['inj_cost'], params['with_cost'],
+        params['storage_cost'], params['max_volume'], events=rows(batch.events))
+
+
+class StoragePortfolio:
+    def __init__(self, price_model, df_history, n_jobs=1, chunk_size=1000):
+        """
+        Valutazione batch di molti contratti di stoccaggio sulla stessa curva prezzi.
+        I prezzi vengono calcolati una sola volta per tutte le date uniche del portafoglio.
+        """
+        self.price_model = price_model
+        self.df_history = df_history
+        self.n_jobs = n_jobs
+        # Contratti per blocco: limita la memoria con portafogli molto grandi
+        self.chunk_size = chunk_size
+
+    def value(self, contracts, keep_ledgers=False):
+        """
+        Valuta tutto il portafoglio e restituisce (summary, ledgers).
+        'ledgers' è un dict contract_id -> ledger (None se keep_ledgers=False).
+        """
+        summaries = []
+        ledgers = {} if keep_ledgers else None
+
+        for summary, chunk_ledgers in self.iter_value(contracts, keep_ledgers):
+            summaries.append(summary)
+            if keep_ledgers:
+                ledgers.update(chunk_ledgers)
+
+        if not summaries:
+            return pd.DataFrame(columns=["contract_id", "NPV", "Events", "Skipped", "FinalInventory"]), ledgers
+        return pd.concat(summaries, ignore_index=True), ledgers
+
+    def iter_value(self, contracts, keep_ledgers=False):
+        """
+        Generatore: restituisce (summary, ledgers) blocco per blocco, in ordine.
+        Al massimo 2 blocchi per processo sono in volo, così la memoria resta limitata.
+
+        'contracts' è un DataFrame (indice = contract_id) con le colonne
+        injection_dates, withdrawal_dates (liste di date) e, opzionalmente,
+        i parametri di StorageContract (altrimenti valgono i default).
+        """
+        price_lookup, date_lookup = self.lookups(contracts)
+        chunks = self.iter_chunks(contracts)
+
+        n_workers = resolve_n_jobs(self.n_jobs, math.ceil(len(contracts) / self.chunk_size))
+        if n_workers == 1:
+            for rows in chunks:
+                yield _value_chunk(rows, price_lookup, date_lookup, keep_ledgers)
+            return
+
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            pending = deque()
+            for rows in chunks:
+                pending.append(executor.submit(_value_chunk, rows, price_lookup, date_lookup, keep_ledgers))
+                if len(pending) >= 2 * n_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def lookups(self, contracts):
+        """
+        Prezzo e data (ns) per ogni data unica del portafoglio, con un solo passaggio sul modello.
+        Restituisce (price_lookup, date_lookup), dizionari data grezza -> valore.
+        """
+        unique_dates = pd.unique(np.fromiter(
+            itertools.chain.from_iterable(itertools.chain(contracts['injection_dates'], contracts['withdrawal_dates'])),
+            dtype=object))
+
+        priced = self.price_model.predict_values(unique_dates, self.df_history)
+        parsed = pd.DatetimeIndex(pd.to_datetime(pd.Series(unique_dates, dtype=object), format='mixed'))
+
+        price_lookup = dict(zip(unique_dates, priced['Price'].values))
+        date_lookup = dict(zip(unique_dates, parsed.as_unit('ns').asi8))
+        return price_lookup, date_lookup
+
+    def iter_chunks(self, contracts):
+        """Righe di contract_records a blocchi di chunk_size contratti (input di event_matrix)."""
+        records = contract_records(contracts)
+
+        while True:
+            rows = list(itertools.islice(records, self.chunk_size))
+            if not rows:
+                return
+            yield rows
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 from datetime import timedelta
+from src.instrumentation import timed
+from src.utils import NS_PER_DAY
 
 class StorageContract:
     def __init__(self, 
@@ -19,10 +21,11 @@ class StorageContract:
         self.storage_cost_monthly = storage_cost
         self.inventory = 0 # Partiamo con il magazzino vuoto
 
+    @timed("pricing.calculate_valuation")
     def calculate_valuation(self, injection_dates, withdrawal_dates, price_model, df_history):
         """
         Calcola il valore del contratto basandosi su date pianificate.
-        Usa il modello SARIMA per stimare i prezzi futuri.
+        Usa il modello di previsione (SARIMA o un motore di src.forecasters) per i prezzi futuri.
         """
         print("\n" + "="*50)
         print("  VALUTAZIONE CONTRATTO STORAGE")
@@ -109,4 +112,181 @@ class StorageContract:
 
         # Creiamo un DataFrame leggibile per l'utente
         df_ledger = pd.DataFrame(ledger)
-        return total_value, df_ledger
\ No newline at end of file
+        return total_value, df_ledger
+
+    @timed("pricing.calculate_valuation_vectorized")
+    def calculate_valuation_vectorized(self, injection_dates, withdrawal_dates, price_model, df_history):
+        """
+        Versione vettoriale di calculate_valuation (stesso NPV, stesso ledger).
+        Le date vengono lette tutte insieme e i prezzi arrivano da un'unica
+        chiamata batch al modello (predict_values).
+        """
+        dates, actions, raw_dates = self._sort_events(injection_dates, withdrawal_dates)
+        prices = price_model.predict_values(raw_dates, df_history)['Price'].values
+
+        for date_str in np.asarray(raw_dates, dtype=object)[np.isnan(prices)]:
+            print(f"⚠️ Saltato evento del {date_str}: Data non valida per il modello.")
+
+        return self._value_schedule(dates, actions, prices)
+
+    def _sort_events(self, injection_dates, withdrawal_dates):
+        """Unisce e ordina (ordinamento stabile) gli eventi, come in calculate_valuation."""
+        raw_dates = list(injection_dates) + list(withdrawal_dates)
+        actions = np.array(['INJECTION'] * len(injection_dates) + ['WITHDRAWAL'] * len(withdrawal_dates), dtype=object)
+
+        # 'mixed' interpreta ogni data singolarmente, come pd.to_datetime(date_str)
+        dates = pd.DatetimeIndex(pd.to_datetime(pd.Series(raw_dates, dtype=object), format='mixed'))
+        order = np.argsort(dates.asi8, kind='stable')
+
+        return dates[order], actions[order], [raw_dates[i] for i in order]
+
+    def _value_schedule(self, dates, actions, prices):
+        """
+        Motore di calcolo su array già ordinati per data.
+        Gli eventi con prezzo NaN vengono saltati (ma, come nel ciclo originale,
+        il costo di stoccaggio fino alla loro data viene comunque addebitato).
+        Restituisce (NPV, ledger) con il ledger costruito direttamente dagli array.
+        """
+        n = len(dates)
+        prices = np.asarray(prices, dtype=float)
+        valid = ~np.isnan(prices)
+        is_inj = (actions == 'INJECTION') & valid
+        is_wit = (actions == 'WITHDRAWAL') & valid
+
+        # 1. Inventario vincolato a [0, max_volume] (rateo e spazio disponibile)
+        # Volumi interi restano interi nel ledger, come nel ciclo originale
+        vol_dtype = np.result_type(self.max_volume, self.inj_rate, self.with_rate, 0)
+        vol_before, vol_moved = self._inventory(is_inj, is_wit, self.inj_rate, self.with_rate, self.max_volume)
+        vol_before, vol_moved = vol_before[0].astype(vol_dtype), vol_moved[0].astype(vol_dtype)
+        vol_after = vol_before + np.where(is_wit, -vol_moved, vol_moved)
+
+        # 2. Flussi di cassa degli eventi
+        cash_flow = np.zeros(n)
+        cash_flow[is_inj] = -(vol_moved[is_inj] * (prices[is_inj] + self.inj_cost))
+        cash_flow[is_wit] = vol_moved[is_wit] * (prices[is_wit] - self.with_cost)
+
+        # 3. Costi di stoccaggio: giorni dall'ultimo evento valido precedente
+        has_prev, days_passed = self._carry_days(dates, valid)
+        carrying_cost = np.where(has_prev, vol_before * (self.storage_cost_monthly / 30) * days_passed, 0.0)
+
+        # Somma sequenziale (cumsum) per riprodurre esattamente l'accumulo del ciclo originale
+        flows = np.column_stack([-carrying_cost, np.where(valid, cash_flow, 0.0)]).ravel()
+        total_value = np.cumsum(flows)[-1] if n else 0
+
+        # 4. Ledger colonnare: riga di costo (se giorni > 0) seguita dalla riga evento
+        keep = np.column_stack([has_prev & (days_passed > 0), valid]).ravel()
+        date_str = np.repeat(np.asarray(dates.strftime('%Y-%m-%d'), dtype=object), 2)
+
+        df_ledger = pd.DataFrame({
+            "Date": date_str[keep],
+            "Action": np.column_stack([np.full(n, "CARRYING COST", dtype=object), actions]).ravel()[keep],
+            "Volume": np.column_stack([np.zeros(n, dtype=vol_dtype), vol_moved]).ravel()[keep],
+            "Price": np.column_stack([np.zeros(n), prices]).ravel()[keep],
+            "CashFlow": np.column_stack([-carrying_cost, cash_flow]).ravel()[keep],
+            "Inventory": np.column_stack([vol_before, vol_after]).ravel()[keep]
+        })
+        return total_value, df_ledger
+
+    def _value_batch(self, dates, actions, prices, return_inventory=False, **shocks):
+        """
+        NPV di molti scenari in un solo passaggio, senza ledger.
+        'prices' è una matrice (scenari x eventi) e 'shocks' contiene array per scenario
+        di inj_rate, with_rate, inj_cost, with_cost o storage_cost (gli altri parametri
+        restano quelli del contratto). Stessa logica di _value_schedule: l'inventario
+        avanza evento per evento, ma per tutti gli scenari insieme.
+        Con return_inventory=True restituisce (NPV, inventario finale) per scenario.
+        """
+        prices = np.atleast_2d(np.asarray(prices, dtype=float))
+        n_scen = prices.shape[0]
+
+        def param(name, default):
+            return np.broadcast_to(np.asarray(shocks.get(name, default), dtype=float), (n_scen,))
+
+        inj_rate, with_rate = param('inj_rate', self.inj_rate), param('with_rate', self.with_rate)
+        inj_cost, with_cost = param('inj_cost', self.inj_cost), param('with_cost', self.with_cost)
+        storage_cost = param('storage_cost', self.storage_cost_monthly)
+
+        # Le date valide sono le stesse in tutti gli scenari (gli shock non creano NaN)
+        valid = ~np.isnan(prices[0])
+        is_inj = (actions == 'INJECTION') & valid
+        is_wit = (actions == 'WITHDRAWAL') & valid
+
+        npv, final_inventory = self._npv_rows(dates, is_inj, is_wit, valid, prices, inj_rate, with_rate,
+                                              inj_cost, with_cost, storage_cost, self.max_volume)
+        return (npv, final_inventory) if return_inventory else npv
+
+    @classmethod
+    def _npv_rows(cls, dates, is_inj, is_wit, valid, prices, inj_rate, with_rate, inj_cost, with_cost,
+                  storage_cost, max_volume, events=None):
+        """
+        Nucleo senza ledger: una riga per scenario (eventi comuni) o per contratto
+        (eventi propri, matrici allineate con padding). I parametri sono array per riga;
+        'events' marca le celle che sono eventi reali (None = tutte).
+        Restituisce (NPV, inventario finale) per riga.
+        """
+        vol_before, vol_moved = cls._inventory(is_inj, is_wit, inj_rate, with_rate, max_volume)
+
+        safe_prices = np.where(valid, prices, 0.0)
+        cash_flow = (vol_moved * (safe_prices - with_cost[:, None]) * is_wit
+                     - vol_moved * (safe_prices + inj_cost[:, None]) * is_inj)
+
+        _, days_passed = cls._carry_days(dates, valid)
+        if events is not None:
+            days_passed = days_passed * events
+        carrying_cost = vol_before * (storage_cost[:, None] / 30) * days_passed
+
+        npv = cash_flow.sum(axis=1) - carrying_cost.sum(axis=1)
+        final_inventory = (vol_moved * is_inj).sum(axis=1) - (vol_moved * is_wit).sum(axis=1)
+        return npv, final_inventory
+
+    @staticmethod
+    def _inventory(is_inj, is_wit, inj_rate, with_rate, max_volume):
+        """
+        Inventario prima di ogni evento e volume movimentato (matrici float64 righe x eventi).
+        Ratei e max_volume sono scalari o array per riga; gli eventi (is_inj, is_wit) sono
+        comuni a tutte le righe (1D) o propri di ogni riga (2D, es. un contratto per riga).
+        L'iniezione è limitata dallo spazio libero, il prelievo dal gas disponibile.
+        """
+        inj_rate = np.atleast_1d(np.asarray(inj_rate, dtype=float))
+        with_rate = np.atleast_1d(np.asarray(with_rate, dtype=float))
+        max_volume = np.atleast_1d(np.asarray(max_volume, dtype=float))
+        is_inj, is_wit = np.atleast_2d(is_inj), np.atleast_2d(is_wit)
+        deltas = inj_rate[:, None] * is_inj - with_rate[:, None] * is_wit
+        n_rows = max(deltas.shape[0], len(max_volume))
+        deltas = np.broadcast_to(deltas, (n_rows, deltas.shape[1]))
+        n = deltas.shape[1]
+
+        # Se i limiti non vengono mai toccati l'inventario è una semplice somma cumulata
+        vol_after = np.cumsum(deltas, axis=1)
+        if n == 0 or (vol_after.min() >= 0 and (vol_after <= max_volume[:, None]).all()):
+            vol_before = np.zeros((n_rows, n))
+            vol_before[:, 1:] = vol_after[:, :-1]
+            return vol_before, np.abs(deltas)
+
+        vol = np.zeros(n_rows)
+        vol_before = np.zeros((n_rows, n))
+        vol_moved = np.zeros((n_rows, n))
+        for i in range(n):
+            vol_before[:, i] = vol
+            inj, wit = is_inj[:, i], is_wit[:, i]
+            moved = np.where(inj, np.minimum(inj_rate, max_volume - vol), np.where(wit, np.minimum(with_rate, vol), 0.0))
+            vol_moved[:, i] = moved
+            vol = vol + moved * inj - moved * wit
+        return vol_before, vol_moved
+
+    @staticmethod
+    def _carry_days(dates, valid):
+        """
+        Per ogni evento: se esiste un evento valido precedente e i giorni trascorsi da esso.
+        'dates' è un DatetimeIndex oppure un array di nanosecondi (anche 2D, un contratto per riga).
+        """
+        ns = dates.asi8 if isinstance(dates, pd.DatetimeIndex) else np.asarray(dates, dtype=np.int64)
+        valid = np.asarray(valid, dtype=bool)
+        valid_pos = np.where(valid, np.arange(valid.shape[-1]), -1)
+        prev = np.full(valid_pos.shape, -1)
+        prev[..., 1:] = np.maximum.accumulate(valid_pos, axis=-1)[..., :-1]
+        has_prev = prev >= 0
+        prev_ns = np.take_along_axis(ns, np.maximum(prev, 0), axis=-1)
+        days_passed = np.where(has_prev, (ns - prev_ns) // NS_PER_DAY, 0)
+        return has_prev, days_passed
+
@@ -0,0 +1,144 @@
+import os
+import json
+import glob
+import hashlib
+import tempfile
+from datetime import datetime
+from importlib.metadata import version
+import pandas as pd
+import numpy as np
+from src.utils import quiet_fit
+
+# Mesi di previsione salvati con il modello: il pricing non richiede statsmodels
+FORECAST_STEPS = 60
+
+
+def series_hash(series):
+    """Impronta della serie storica (date, valori e nome)."""
+    h = hashlib.sha256()
+    h.update(pd.DatetimeIndex(series.index).as_unit('ns').asi8.tobytes())
+    h.update(np.ascontiguousarray(series.values, dtype=float).tobytes())
+    h.update(str(series.name).encode())
+    return h.hexdigest()
+
+
+def library_versions():
+    # Versione dai metadati del pacchetto: non serve importare statsmodels
+    return {"statsmodels": version("statsmodels"), "numpy": np.__version__, "pandas": pd.__version__}
+
+
+class ModelRegistry:
+    def __init__(self, root_dir):
+        """
+        Registro dei modelli indirizzato per contenuto.
+        Ogni voce è un piccolo JSON (parametri stimati + metadati) identificato
+        dall'hash di dati, spazio di ricerca e versioni delle librerie:
+        se uno di questi cambia, il modello salvato non viene più riutilizzato.
+        """
+        self.root_dir = root_dir
+
+    def key(self, series, config, versions=None):
+        payload = json.dumps({
+            "data": series_hash(series),
+            "config": config,
+            "versions": versions or library_versions()
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.root_dir, f"{key}.json")
+
+    def save(self, results, series, config, fit_time=None):
+        """Salva parametri e metadati del modello stimato su 'series'. Restituisce la chiave."""
+        key = self.key(series, config)
+        entry = {
+            "key": key,
+            "order": list(results.model.order),
+            "seasonal_order": list(results.model.seasonal_order),
+            "param_names": list(results.model.param_names),
+            "params": [float(p) for p in np.asarray(results.params)],
+            "aic": float(results.aic),
+            "bic": float(results.bic),
+            "fit_time": fit_time,
+            "forecast": self.forecast_snapshot(results),
+            "nobs": int(results.nobs),
+            "train_start": str(series.index[0].date()),
+            "train_end": str(series.index[-1].date()),
+            "data_hash": series_hash(series),
+            "config": config,
+            "versions": library_versions(),
+            "created": datetime.now().isoformat(timespec='seconds')
+        }
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        # Scrittura atomica: un processo concorrente non legge mai un file a metà.
+        # File temporaneo univoco: due worker che salvano la stessa chiave non si sovrascrivono
+        with tempfile.NamedTemporaryFile('w', dir=self.root_dir, suffix=".tmp", delete=False) as f:
+            json.dump(entry, f, indent=2)
+        os.replace(f.name, self._path(key))
+        return key
+
+    def get(self, series, config):
+        """Voce del registro per questi dati e questa configurazione (None se assente)."""
+        path = self._path(self.key(series, config))
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def find_prefix(self, series, config):
+        """
+        Voce più recente stimata su un prefisso di 'series' (stessa configurazione
+        e stesse librerie): è il punto di partenza per un aggiornamento incrementale.
+        Il nome del file è la chiave: si calcolano le chiavi dei prefissi, dal più
+        lungo, e si legge solo il JSON trovato (nessuna scansione dei contenuti).
+        """
+        stored = {os.path.basename(p)[:-len(".json")] for p in glob.glob(os.path.join(self.root_dir, "*.json"))}
+        if not stored:
+            return None
+
+        versions = library_versions()
+        for n in range(len(series) - 1, 0, -1):
+            key = self.key(series.iloc[:n], config, versions)
+            if key in stored:
+                with open(self._path(key)) as f:
+                    return json.load(f)
+        return None
+
+    @staticmethod
+    def forecast_snapshot(results, steps=FORECAST_STEPS):
+        """Media e intervallo di confidenza 95% dei prossimi 'steps' mesi, serializzabili in JSON."""
+        with quiet_fit():
+            forecast = results.get_forecast(steps=steps)
+        mean, conf = forecast.predicted_mean, forecast.conf_int()
+        return {
+            "index": [str(d.date()) for d in mean.index],
+            "freq": mean.index.freqstr,
+            "mean": [float(v) for v in mean],
+            "conf_columns": list(conf.columns),
+            "conf": conf.values.tolist()
+        }
+
+    @staticmethod
+    def forecast_frames(snapshot):
+        """Ricostruisce (predicted_mean, conf_int) come li restituisce get_forecast."""
+        index = pd.DatetimeIndex(snapshot['index'], freq=snapshot['freq'])
+        mean = pd.Series(snapshot['mean'], index=index, name='predicted_mean')
+        conf = pd.DataFrame(snapshot['conf'], index=index, columns=snapshot['conf_columns'])
+        return mean, conf
+
+    @staticmethod
+    def rebuild(entry, series):
+        """
+        Ricostruisce SARIMAXResults dai parametri salvati con un solo passaggio
+        del filtro di Kalman (nessuna ottimizzazione).
+        """
+        import statsmodels.api as sm
+
+        model = sm.tsa.statespace.SARIMAX(series,
+                                          order=tuple(entry['order']),
+                                          seasonal_order=tuple(entry['seasonal_order']),
+                                          enforce_stationarity=False,
+                                          enforce_invertibility=False)
+        with quiet_fit():
+            return model.filter(np.asarray(entry['params']))
@@ -0,0 +1,166 @@
+import time
+import numpy as np
+import pandas as pd
+from src.portfolio import StoragePortfolio, CONTRACT_ATTRIBUTES, event_matrix, value_rows
+from src.montecarlo import knot_weights
+from src.instrumentation import timed
+
+# Parametri del contratto di cui si calcola la sensitività (argomenti di _value_batch)
+SENSITIVITY_PARAMS = ('storage_cost', 'inj_rate', 'with_rate', 'inj_cost', 'with_cost')
+
+
+class SensitivityEngine:
+    def __init__(self, price_model, df_history, curve_bump=0.01, param_bump=0.01):
+        """
+        Greche dei contratti di stoccaggio per bump-and-revalue in un solo passaggio.
+        La curva base viene calcolata una volta; tutti gli scenari (bump di ogni nodo
+        mensile della curva, shock dei parametri) formano una matrice valutata insieme
+        da StorageContract._value_batch. Differenze centrali:
+        - delta per bucket: variazione dell'NPV per $1/MMBtu sul nodo mensile (bump 'curve_bump')
+        - sensitività dei parametri: dNPV/dparametro, con shock relativo 'param_bump'
+        """
+        self.price_model = price_model
+        self.df_history = df_history
+        self.curve_bump = curve_bump
+        self.param_bump = param_bump
+
+    @timed("sensitivities.contract")
+    def contract_greeks(self, contract, injection_dates, withdrawal_dates):
+        """
+        Restituisce (NPV, delta per bucket mensile, sensitività dei parametri).
+        Il delta è una Series indicizzata dalla fine del mese del nodo; la sua somma
+        è il delta parallelo della parte prevista della curva.
+        """
+        dates, actions, raw_dates = contract._sort_events(injection_dates, withdrawal_dates)
+        base = self.price_model.predict_values(raw_dates, self.df_history)
+        prices = base['Price'].values
+        future = (base['Label'] == 'PREVISIONE').values
+
+        if future.any():
+            weights, knots = knot_weights(self.df_history.index.max(), dates[future])
+        else:
+            weights, knots = np.zeros((0, 1)), pd.DatetimeIndex([self.df_history.index.max()])
+
+        npv, delta, sens = self._greeks(contract, dates, actions, prices, future, weights[:, 1:])
+        return npv, pd.Series(delta, index=knots[1:], name='delta'), pd.Series(sens, name='sensitivity')
+
+    def _greeks(self, contract, dates, actions, prices, future, weights):
+        """
+        Nucleo vettoriale: 'weights' è la matrice (eventi futuri x bucket) dei pesi
+        dei nodi mensili bumpabili (esclusa l'ultima data storica, già nota).
+        """
+        n_buckets = weights.shape[1]
+        n_params = len(SENSITIVITY_PARAMS)
+        n_scen = 1 + 2 * n_buckets + 2 * n_params
+
+        # Scenari: [base, +bump nodo k, -bump nodo k, +shock parametro j, -shock parametro j]
+        scenarios = np.tile(prices, (n_scen, 1))
+        bump = self.curve_bump * weights.T
+        cols = np.flatnonzero(future)
+        scenarios[np.ix_(np.arange(1, 1 + n_buckets), cols)] += bump
+        scenarios[np.ix_(np.arange(1 + n_buckets, 1 + 2 * n_buckets), cols)] -= bump
+
+        shocks, steps = {}, {}
+        first = 1 + 2 * n_buckets
+        for j, name in enumerate(SENSITIVITY_PARAMS):
+            value = float(getattr(contract, CONTRACT_ATTRIBUTES[name]))
+            # Shock relativo; per un parametro nullo si usa lo shock come valore assoluto
+            h = abs(value) * self.param_bump or self.param_bump
+            column = np.full(n_scen, value)
+            column[first + 2 * j] += h
+            column[first + 2 * j + 1] -= h
+            shocks[name], steps[name] = column, h
+
+        npv = contract._value_batch(dates, actions, scenarios, **shocks)
+
+        delta = (npv[1:1 + n_buckets] - npv[1 + n_buckets:first]) / (2 * self.curve_bump)
+        sens = {name: (npv[first + 2 * j] - npv[first + 2 * j + 1]) / (2 * steps[name])
+                for j, name in enumerate(SENSITIVITY_PARAMS)}
+        return npv[0], delta, sens
+
+    @timed("sensitivities.book")
+    def book_greeks(self, contracts):
+        """
+        Greche dell'intero portafoglio (stesso formato di StoragePortfolio.value).
+        Prezzi e pesi dei nodi sono calcolati una sola volta per tutte le date uniche,
+        su una griglia di bucket comune. Restituisce (tabella per contratto, matrice
+        dei delta contratti x bucket); la somma delle colonne è il delta del libro.
+        """
+        start = time.perf_counter()
+        portfolio = StoragePortfolio(self.price_model, self.df_history)
+        price_lookup, date_lookup = portfolio.lookups(contracts)
+
+        last_hist_date = self.df_history.index.max()
+        unique_dates = list(price_lookup)
+        unique_ns = np.array([date_lookup[d] for d in unique_dates], dtype=np.int64)
+        unique_prices = np.array([price_lookup[d] for d in unique_dates], dtype=float)
+        is_future = (unique_ns > last_hist_date.value) & ~np.isnan(unique_prices)
+
+        future_idx = pd.DatetimeIndex(unique_ns[is_future])
+        if is_future.any():
+            weights_all, knots = knot_weights(last_hist_date, future_idx)
+        else:
+            weights_all, knots = np.zeros((0, 1)), pd.DatetimeIndex([last_hist_date])
+        # Riga di weights_all per ogni data futura (le altre non vengono bumpate)
+        bucket_row = dict(zip(np.asarray(unique_dates, dtype=object)[is_future], range(is_future.sum())))
+
+        summaries, deltas = [], []
+        for rows in portfolio.iter_chunks(contracts):
+            batch = event_matrix(rows, date_lookup, price=price_lookup, bucket=bucket_row)
+            summary, delta = self._book_greeks_batch(batch, weights_all[:, 1:])
+            summaries.append(summary)
+            deltas.append(delta)
+
+        columns = ["contract_id", "NPV", "parallel_delta", *SENSITIVITY_PARAMS]
+        summary = pd.concat(summaries, ignore_index=True) if summaries else pd.DataFrame(columns=columns)
+        delta_matrix = pd.DataFrame(np.vstack(deltas) if deltas else np.zeros((0, len(knots) - 1)),
+                                    index=summary['contract_id'], columns=knots[1:])
+
+        elapsed = time.perf_counter() - start
+        print(f">> Greche: {len(summary)} contratti x {len(knots) - 1} bucket in {elapsed:.2f}s")
+        return summary, delta_matrix
+
+    def _book_greeks_batch(self, batch, weights):
+        """
+        Stessi scenari di _greeks per un blocco di contratti (event_matrix), valutati
+        insieme: ogni contratto ha n_scen righe consecutive nella matrice degli scenari.
+        """
+        prices = batch.values['price']
+        n_contracts, width = prices.shape
+        n_buckets = weights.shape[1]
+        n_scen = 1 + 2 * n_buckets + 2 * len(SENSITIVITY_PARAMS)
+        first = 1 + 2 * n_buckets
+
+        # Pesi dei nodi per ogni cella (zero dove la data non è futura)
+        bucket = batch.values['bucket']
+        future = ~np.isnan(bucket)
+        cell_weights = np.zeros((n_contracts, width, n_buckets))
+        cell_weights[future] = weights[bucket[future].astype(np.int64)]
+        bump = self.curve_bump * cell_weights.transpose(0, 2, 1)
+
+        # Scenari: [base, +bump nodo k, -bump nodo k, +shock parametro j, -shock parametro j]
+        scenarios = np.repeat(prices[:, None, :], n_scen, axis=1)
+        scenarios[:, 1:1 + n_buckets] += bump
+        scenarios[:, 1 + n_buckets:first] -= bump
+
+        shocks, steps = {}, {}
+        for j, name in enumerate(SENSITIVITY_PARAMS):
+            value = batch.params[name]
+            # Shock relativo; per un parametro nullo si usa lo shock come valore assoluto
+            h = np.abs(value) * self.param_bump
+            h[h == 0] = self.param_bump
+            column = np.repeat(value[:, None], n_scen, axis=1)
+            column[:, first + 2 * j] += h
+            column[:, first + 2 * j + 1] -= h
+            shocks[name], steps[name] = column.ravel(), h
+
+        # Le date valide sono le stesse in tutti gli scenari (gli shock non creano NaN)
+        valid = np.repeat(batch.events & ~np.isnan(prices), n_scen, axis=0)
+        npv, _ = value_rows(batch, scenarios.reshape(-1, width), valid, repeat=n_scen, **shocks)
+        npv = npv.reshape(n_contracts, n_scen)
+
+        delta = (npv[:, 1:1 + n_buckets] - npv[:, 1 + n_buckets:first]) / (2 * self.curve_bump)
+        summary = pd.DataFrame({"contract_id": batch.contract_ids, "NPV": npv[:, 0], "parallel_delta": delta.sum(axis=1)})
+        for j, name in enumerate(SENSITIVITY_PARAMS):
+            summary[name] = (npv[:, first + 2 * j] - npv[:, first + 2 * j + 1]) / (2 * steps[name])
+        return summary, delta
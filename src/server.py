@@ -0,0 +1,392 @@
+import os
+import copy
+import json
+import time
+import asyncio
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+import pandas as pd
+import numpy as np
+from src.pricing import StorageContract
+from src.data_loader import DataLoader
+from src.utils import to_epoch_days
+
+# Campioni di latenza conservati per endpoint (finestra mobile)
+LATENCY_WINDOW = 10_000
+
+# Stato servito: modello, storico e curva precalcolata vengono sostituiti insieme dal refit
+ServingState = namedtuple('ServingState', ['model', 'df_history', 'curve', 'first_hist_date',
+                                           'last_hist_date', 'model_label', 'first_hist_day', 'last_hist_day'])
+# Origine dei giorni-epoch usati dalla curva (DailyInterpolator.knot_days)
+EPOCH = datetime(1970, 1, 1)
+
+
+class PricingServer:
+    def __init__(self, model, df_history, horizon_months=36, max_workers=2):
+        """
+        Servizio di pricing HTTP (asyncio, solo libreria standard) a lunga vita.
+        Il modello viene caricato una volta e la curva storico+previsione è
+        precalcolata fino a 'horizon_months': le richieste di prezzo sono semplici
+        lookup vettoriali. I lavori pesanti (refit, Monte Carlo) girano in un
+        executor per non bloccare l'event loop; il refit costruisce un modello e
+        una curva nuovi e li sostituisce a quelli in uso con un'unica assegnazione.
+        """
+        self.horizon_months = horizon_months
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._server = None
+        self.state = self._build_state(model, df_history)
+
+        self.routes = {
+            ('GET', '/health'): self._health,
+            ('GET', '/metrics'): self._metrics,
+            ('GET', '/price'): self._price,
+            ('POST', '/prices'): self._prices,
+            ('POST', '/quantiles'): self._quantiles,
+            ('POST', '/value'): self._value,
+            ('POST', '/montecarlo'): self._montecarlo,
+            ('POST', '/refit'): self._refit,
+        }
+
+    def _build_state(self, model, df_history):
+        last_hist_date = df_history.index.max()
+        horizon = last_hist_date + pd.DateOffset(months=self.horizon_months)
+        first_hist_date = df_history.index.min()
+        first_day, last_day = to_epoch_days([first_hist_date, last_hist_date])
+        return ServingState(model, df_history, model._build_curve(df_history, horizon),
+                            first_hist_date, last_hist_date, model.label, int(first_day), int(last_day))
+
+    @property
+    def model(self):
+        return self.state.model
+
+    @property
+    def df_history(self):
+        return self.state.df_history
+
+    @property
+    def curve(self):
+        return self.state.curve
+
+    # --- Interfaccia "price model" (usata anche da StorageContract) ---
+
+    def predict_values(self, dates, df_history=None):
+        """
+        Stesso output di GasModel.predict_values, ma dalla curva precalcolata.
+        Le date oltre l'orizzonte precalcolato vengono delegate al modello.
+        """
+        state = self.state
+        raw = pd.Series(list(dates))
+        if not pd.api.types.is_datetime64_any_dtype(raw):
+            raw = pd.to_datetime(raw, format='%m/%d/%y', errors='coerce')
+        target = pd.DatetimeIndex(raw)
+
+        if len(target) and target.max() > state.curve.end:
+            return state.model.predict_values(target, state.df_history)
+
+        valid = ~target.isna()
+        is_hist = valid & (target >= state.first_hist_date) & (target <= state.last_hist_date)
+        is_future = valid & (target > state.last_hist_date)
+
+        prices = np.full(len(target), np.nan)
+        lookup = is_hist | is_future
+        prices[lookup] = state.curve(target[lookup])
+
+        labels = np.where(is_hist, "STORICO", np.where(is_future, "PREVISIONE", None)).astype(object)
+        status = np.full(len(target), "Formato data errato (usa MM/GG/AA)", dtype=object)
+        status[valid & (target < state.first_hist_date)] = "Data antecedente allo storico"
+        status[is_hist] = "Dato recuperato dallo storico"
+        status[is_future] = state.model_label
+        return pd.DataFrame({"Date": target, "Price": prices, "Label": labels, "Status": status})
+
+    # --- Endpoint ---
+
+    async def _health(self, query, body):
+        return 200, {"status": "ok", "curve_end": str(self.curve.end.date())}
+
+    async def _metrics(self, query, body):
+        metrics = {}
+        for route, samples in self.latencies.items():
+            values = np.fromiter(samples, dtype=float) * 1000
+            metrics[route] = {
+                "count": len(values),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p99_ms": float(np.percentile(values, 99))
+            }
+        return 200, metrics
+
+    async def _price(self, query, body):
+        dates = query.get('date', [])
+        if not dates:
+            return 400, {"error": "Parametro 'date' mancante (MM/GG/AA)"}
+        row = self._price_one(dates[0])
+        if row is None:
+            table = await self._offload(True, self.predict_values, dates[:1])
+            row = self._row_to_json(table.iloc[0])
+        return 200, row
+
+    def _price_one(self, date_str):
+        """
+        Percorso scalare di /price: stessa logica di predict_values, ma senza pandas
+        (strptime + una sola interpolazione sui nodi della curva precalcolata).
+        Restituisce None per le date oltre l'orizzonte (serve una previsione del modello).
+        """
+        state = self.state
+        try:
+            target = datetime.strptime(date_str, '%m/%d/%y')
+        except ValueError:
+            return {"date": None, "price": None, "label": None, "status": "Formato data errato (usa MM/GG/AA)"}
+
+        day = (target - EPOCH).days
+        if day > state.curve.knot_days[-1]:
+            return None
+
+        row = {"date": target.date().isoformat(), "price": None, "label": None,
+               "status": "Data antecedente allo storico"}
+        if day >= state.first_hist_day:
+            is_hist = day <= state.last_hist_day
+            row.update(price=self._json_float(state.curve.at_days(np.array([day]))[0]),
+                       label="STORICO" if is_hist else "PREVISIONE",
+                       status="Dato recuperato dallo storico" if is_hist else state.model_label)
+        return row
+
+    async def _prices(self, query, body):
+        dates = body.get('dates')
+        if not isinstance(dates, list):
+            return 400, {"error": "Campo 'dates' mancante (lista di date MM/GG/AA)"}
+        table = await self._offload(self._beyond_curve(dates), self.predict_values, dates)
+        return 200, {
+            "prices": [self._json_float(p) for p in table['Price']],
+            "labels": table['Label'].tolist(),
+            "status": table['Status'].tolist()
+        }
+
+    async def _quantiles(self, query, body):
+        from src.model import DEFAULT_QUANTILES
+
+        dates = body.get('dates')
+        if not isinstance(dates, list):
+            return 400, {"error": "Campo 'dates' mancante (lista di date MM/GG/AA)"}
+        state = self.state
+        try:
+            # Le bande mensili sono in cache nel modello: solo interpolazione vettoriale
+            table = await self._offload(self._beyond_curve(dates), state.model.predict_quantiles,
+                                        dates, state.df_history, body.get('quantiles', DEFAULT_QUANTILES))
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        bands = table.columns[3:-2]
+        return 200, {
+            "quantiles": {c: [self._json_float(v) for v in table[c]] for c in bands},
+            "std": [self._json_float(v) for v in table['Std']],
+            "labels": table['Label'].tolist(),
+            "status": table['Status'].tolist()
+        }
+
+    async def _value(self, query, body):
+        contract, injections, withdrawals = self._parse_contract(body)
+        value, df_ledger = await self._offload(self._beyond_curve(injections + withdrawals),
+                                               contract.calculate_valuation_vectorized,
+                                               injections, withdrawals, self, self.df_history)
+        return 200, {"npv": self._json_float(value), "ledger": self._ledger_to_json(df_ledger)}
+
+    async def _montecarlo(self, query, body):
+        from src.montecarlo import MonteCarloValuator
+
+        contract, injections, withdrawals = self._parse_contract(body)
+        state = self.state
+        valuator = MonteCarloValuator(state.model, state.df_history,
+                                      n_paths=int(body.get('n_paths', 10000)), seed=body.get('seed'))
+        loop = asyncio.get_running_loop()
+        stats, _ = await loop.run_in_executor(
+            self.executor, valuator.value_schedule, contract, injections, withdrawals)
+        return 200, {k: self._json_float(v) for k, v in stats.items()}
+
+    async def _refit(self, query, body):
+        """
+        Ristima completa del modello (ricerca degli ordini inclusa, senza passare dal registro)
+        sullo storico esteso con le eventuali nuove osservazioni mensili della richiesta
+        ('dates' in MM/GG/AA e 'prices'). Il modello in uso continua a servire le
+        richieste finché il nuovo stato non è pronto.
+        """
+        df_history = self._extend_history(self.state.df_history, body.get('dates', []), body.get('prices', []))
+        loop = asyncio.get_running_loop()
+        state = await loop.run_in_executor(self.executor, self._refit_state, self.state.model, df_history)
+        self.state = state
+        return 200, {"status": "ok", "model": state.model_label,
+                     "last_date": str(state.last_hist_date.date()), "curve_end": str(state.curve.end.date())}
+
+    def _refit_state(self, model, df_history):
+        """Eseguito nell'executor: lavora su una copia, il modello servito non viene toccato."""
+        new_model = copy.copy(model)
+        new_model._invalidate_forecast_cache()
+        df_prices = df_history.iloc[:, 0]
+        if new_model.engine is not None:
+            new_model.engine = new_model.engine.clone()
+            new_model._fit_engine(df_prices)
+        else:
+            new_model._optimize_params(df_prices)
+            new_model._validate_and_train(df_prices)
+        return self._build_state(new_model, df_history)
+
+    @staticmethod
+    def _extend_history(df_history, dates, prices):
+        """
+        Nuove osservazioni mensili: si aggiungono allo storico (o sostituiscono i mesi già presenti).
+        Il risultato passa dalla stessa normalizzazione del training (DataLoader._clean):
+        frequenza mensile esplicita e mesi mancanti riempiti con l'ultimo prezzo.
+        """
+        if not isinstance(dates, list) or not isinstance(prices, list) or len(dates) != len(prices):
+            raise ValueError("'dates' e 'prices' devono essere liste della stessa lunghezza.")
+        if not dates:
+            return df_history
+
+        index = pd.to_datetime(pd.Series(dates), format='%m/%d/%y', errors='coerce')
+        values = np.asarray(prices, dtype=float)
+        if index.isna().any() or not np.isfinite(values).all():
+            raise ValueError("Nuove osservazioni non valide (date MM/GG/AA e prezzi numerici).")
+        if not index.dt.is_month_end.all():
+            raise ValueError("Le nuove osservazioni devono cadere a fine mese (serie mensile).")
+
+        new_rows = pd.DataFrame({df_history.columns[0]: values}, index=pd.DatetimeIndex(index, name=df_history.index.name))
+        combined = pd.concat([df_history, new_rows])
+        combined = combined[~combined.index.duplicated(keep='last')]
+
+        gaps = len(pd.date_range(combined.index.min(), combined.index.max(), freq='ME')) - len(combined)
+        if gaps:
+            print(f">> ⚠️ Refit: {gaps} mesi mancanti tra lo storico e le nuove osservazioni.")
+        return DataLoader._clean(combined)
+
+    def _beyond_curve(self, dates):
+        """True se qualche data supera la curva precalcolata (e richiede quindi una previsione)."""
+        parsed = pd.to_datetime(pd.Series(list(dates), dtype=object), format='mixed', errors='coerce')
+        return bool((parsed > self.state.curve.end).any())
+
+    async def _offload(self, blocking, func, *args):
+        """
+        Le previsioni del modello (SARIMA) sono sincrone e lente: girano nell'executor
+        per non bloccare l'event loop. I lookup sulla curva restano sul loop.
+        """
+        if not blocking:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    # --- HTTP ---
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, host='127.0.0.1', port=8080):
+        async def serve():
+            server = await self.start(host, port)
+            print(f">> Pricing server in ascolto su http://{host}:{port}")
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                # Ctrl-C: asyncio.run cancella il task principale
+                pass
+            finally:
+                await self.stop()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        print(">> Pricing server arrestato.")
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                raw_body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self._dispatch(method.upper(), target, raw_body)
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'ERROR'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, raw_body):
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            return 404, {"error": f"Endpoint non trovato: {method} {url.path}"}
+
+        start = time.perf_counter()
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+            status, payload = await handler(parse_qs(url.query), body)
+        except (ValueError, KeyError, TypeError) as e:
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+        self.latencies[url.path].append(time.perf_counter() - start)
+        return status, payload
+
+    # --- Utility ---
+
+    @staticmethod
+    def _parse_contract(body):
+        params = {k: body[k] for k in ('max_volume', 'inj_rate', 'with_rate', 'inj_cost', 'with_cost', 'storage_cost')
+                  if k in body}
+        injections = body.get('injection_dates', [])
+        withdrawals = body.get('withdrawal_dates', [])
+        if not injections and not withdrawals:
+            raise ValueError("Servono 'injection_dates' e/o 'withdrawal_dates'.")
+        return StorageContract(**params), injections, withdrawals
+
+    @staticmethod
+    def _json_float(value):
+        value = float(value)
+        return None if np.isnan(value) else value
+
+    @classmethod
+    def _row_to_json(cls, row):
+        return {"date": None if pd.isna(row['Date']) else str(row['Date'].date()),
+                "price": cls._json_float(row['Price']), "label": row['Label'], "status": row['Status']}
+
+    @staticmethod
+    def _ledger_to_json(df_ledger):
+        return json.loads(df_ledger.to_json(orient='records'))
+
+
+if __name__ == "__main__":
+    from src.model import GasModel
+
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    df = DataLoader(os.path.join(BASE_DIR, 'data', 'Nat_Gas.csv')).get_clean_data()
+    model_system = GasModel(save_dir=os.path.join(BASE_DIR, 'models'), n_jobs=-1)
+    model_system.load_or_train(df['Prices'])
+
+    PricingServer(model_system, df[['Prices']]).run(port=int(os.environ.get('PORT', 8080)))
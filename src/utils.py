@@ -1,5 +1,11 @@
+import os
+import warnings
+import contextlib
+import numpy as np
 import pandas as pd
 
+NS_PER_DAY = 86_400 * 10**9
+
 def to_daily_resolution(df_monthly, method='linear'):
     
     # Resample giornaliero crea righe vuote (NaN) tra i mesi
@@ -12,3 +18,100 @@ def to_daily_resolution(df_monthly, method='linear'):
     
 
     return df_interpolated
+
+
+@contextlib.contextmanager
+def quiet_fit():
+    """Silenzia i warning di convergenza dei modelli solo durante fit e previsione."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+
+def resolve_n_jobs(n_jobs, n_tasks=None):
+    """
+    Numero effettivo di processi: n_jobs=1 (o None) è seriale, un valore negativo
+    usa tutti i core. Mai più processi che lavori da eseguire ('n_tasks').
+    """
+    n_jobs = n_jobs or 1
+    if n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    if n_tasks is not None:
+        n_jobs = min(n_jobs, n_tasks)
+    return max(1, n_jobs)
+
+
+def to_epoch_days(dates):
+    """Converte date (scalari o array) in giorni interi dall'epoch, arrotondando al giorno più vicino."""
+    idx = pd.DatetimeIndex(np.atleast_1d(pd.to_datetime(dates))).as_unit('ns')
+    return np.floor_divide(idx.asi8 + NS_PER_DAY // 2, NS_PER_DAY)
+
+
+class DailyInterpolator:
+    """
+    Interpolatore compatto costruito una sola volta sui nodi mensili.
+    Risponde a query puntuali o vettoriali in O(log n) senza materializzare
+    il DataFrame giornaliero. Con method='linear' restituisce esattamente
+    gli stessi valori di to_daily_resolution.
+    """
+    METHODS = ('linear', 'quadratic', 'cubic', 'spline')
+
+    def __init__(self, knot_days, knot_values, method='linear', order=3):
+        if method not in self.METHODS:
+            raise ValueError(f"Metodo di interpolazione non supportato: {method} (usa {self.METHODS})")
+
+        knot_days = np.asarray(knot_days, dtype=np.int64)
+        knot_values = np.asarray(knot_values, dtype=float)
+        valid = ~np.isnan(knot_values)
+
+        self.knot_days = knot_days[valid]
+        self.knot_values = knot_values[valid]
+        self.method = method
+        self._spline = None
+
+        # I metodi non lineari usano gli stessi backend scipy di pandas.interpolate
+        if method in ('quadratic', 'cubic'):
+            from scipy.interpolate import interp1d
+            self._spline = interp1d(self.knot_days, self.knot_values, kind=method)
+        elif method == 'spline':
+            from scipy.interpolate import UnivariateSpline
+            self._spline = UnivariateSpline(self.knot_days, self.knot_values, k=order)
+
+    @classmethod
+    def from_frame(cls, df_monthly, method='linear', order=3):
+        """Costruisce l'interpolatore dalla prima colonna di un DataFrame (o da una Series) mensile."""
+        series = df_monthly.iloc[:, 0] if isinstance(df_monthly, pd.DataFrame) else df_monthly
+        knot_days = series.index.values.astype('datetime64[D]').astype(np.int64)
+        return cls(knot_days, series.values, method=method, order=order)
+
+    @property
+    def start(self):
+        return pd.Timestamp(self.knot_days[0], unit='D')
+
+    @property
+    def end(self):
+        return pd.Timestamp(self.knot_days[-1], unit='D')
+
+    def contains(self, dates):
+        days = to_epoch_days(dates)
+        return (days >= self.knot_days[0]) & (days <= self.knot_days[-1])
+
+    def at_days(self, days):
+        """Valori ai giorni-epoch indicati (array di interi)."""
+        days = np.asarray(days)
+        if self._spline is None:
+            return np.interp(days, self.knot_days, self.knot_values)
+
+        values = np.asarray(self._spline(days), dtype=float)
+        # Come pandas.interpolate: sui nodi si conserva il dato originale
+        # (la 'spline' con smoothing non passa esattamente per i nodi)
+        pos = np.minimum(np.searchsorted(self.knot_days, days), len(self.knot_days) - 1)
+        on_knot = self.knot_days[pos] == days
+        values[on_knot] = self.knot_values[pos[on_knot]]
+        return values
+
+    def __call__(self, dates):
+        """Prezzo a una data (scalare) o a un array di date (ndarray)."""
+        values = self.at_days(to_epoch_days(dates))
+        return values if np.ndim(dates) else values[0]
+
@@ -1,9 +1,7 @@
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-from statsmodels.stats.diagnostic import acorr_ljungbox
-from sklearn.metrics import mean_squared_error
-import matplotlib.pyplot as plt
+from src.backtest import holdout_forecast, WalkForwardBacktest
+from src.utils import resolve_n_jobs
 
 class GasValidator:
     def __init__(self, model_instance):
@@ -20,26 +18,14 @@ class GasValidator:
         """
         print(f"\n--- 📉 AVVIO BACKTEST (Ultimi {test_months} mesi nascosti) ---")
         
-        train = df.iloc[:-test_months]
-        test = df.iloc[-test_months:]
-        
-        # Usiamo gli STESSI iperparametri ottimali trovati dal modello principale
+        # Usiamo gli STESSI iperparametri ottimali (o lo stesso motore) del modello principale
+        train, test, pred_mean = holdout_forecast(df, self.model_ref.best_order,
+                                                  self.model_ref.best_seasonal, test_months,
+                                                  forecaster=self.model_ref.engine)
         print(f">> Training set parziale: {len(train)} mesi")
         
-        temp_model = sm.tsa.statespace.SARIMAX(train, 
-                                               order=self.model_ref.best_order, 
-                                               seasonal_order=self.model_ref.best_seasonal,
-                                               enforce_stationarity=False, 
-                                               enforce_invertibility=False)
-        temp_res = temp_model.fit(disp=False)
-        
-        # Previsione
-        forecast = temp_res.get_forecast(steps=test_months)
-        pred_mean = forecast.predicted_mean
-        pred_mean.index = test.index # Allineamento indici
-        
         # Calcolo Metriche
-        rmse = np.sqrt(mean_squared_error(test, pred_mean))
+        rmse = np.sqrt(np.mean((test.iloc[:,0] - pred_mean) ** 2))
         mape = np.mean(np.abs((test.iloc[:,0] - pred_mean) / test.iloc[:,0])) * 100
         
         print(f">> RMSE: ${rmse:.2f} | MAPE: {mape:.2f}%")
@@ -53,11 +39,30 @@ class GasValidator:
             
         return test, pred_mean
 
+    def run_walk_forward(self, df, n_origins=12, horizons=(1, 3, 6), n_jobs=1, warm_start=False):
+        """
+        Backtest a origine mobile: molte origini e più orizzonti invece di un solo split.
+        Le ristime sulle diverse origini girano in parallelo (n_jobs), tranne con warm_start.
+        """
+        print(f"\n--- 📉 AVVIO WALK-FORWARD ({n_origins} origini, orizzonti {list(horizons)}) ---")
+        
+        engine = WalkForwardBacktest(self.model_ref.best_order, self.model_ref.best_seasonal,
+                                     horizons=horizons, n_jobs=n_jobs, warm_start=warm_start,
+                                     forecaster=self.model_ref.engine)
+        # Il warm start parte dai coefficienti del modello principale, se disponibili
+        start_params = None
+        if warm_start and self.model_ref.engine is None and self.model_ref.results is not None:
+            start_params = self.model_ref.results.params.values
+        errors, metrics = engine.run(df, n_origins=n_origins, start_params=start_params)
+        
+        print(metrics.to_string(float_format=lambda x: f"{x:.2f}"))
+        return errors, metrics
+
     def check_ljung_box(self):
         """
         Esegue il test statistico sui residui del modello principale.
         """
-        if self.model_ref.results is None:
+        if not self.model_ref.is_loaded():
             print("⚠️ Errore: Il modello principale non è addestrato.")
             return
 
@@ -65,7 +70,9 @@ class GasValidator:
         print("  ANALISI STATISTICA (Ljung-Box Test)")
         print("="*50)
         
-        resid = self.model_ref.results.resid
+        from statsmodels.stats.diagnostic import acorr_ljungbox
+
+        resid = self.model_ref.resid
         
         # Test su 6 e 12 mesi (ciclo annuale)
         # return_df=True restituisce un DataFrame pandas facile da leggere
@@ -85,20 +92,101 @@ class GasValidator:
             
         print("="*50)
 
-    def plot_diagnostics(self):
-        """Genera i grafici dei residui con lag ridotti per dataset piccoli"""
-        if self.model_ref.results is None: 
+    def compare_engines(self, df, engines=None, n_origins=12, horizons=(1, 3, 6), n_jobs=1):
+        """
+        Confronto dei motori di previsione sullo stesso walk-forward: MAE/RMSE/MAPE
+        e tempi di fit e previsione. Di default i motori veloci più il SARIMA del modello.
+        """
+        from src.forecasters import SarimaForecaster, default_members, compare_forecasters
+
+        if engines is None:
+            engines = default_members() + [SarimaForecaster(self.model_ref.best_order, self.model_ref.best_seasonal)]
+
+        print(f"\n--- ⚙️ CONFRONTO MOTORI ({len(engines)} motori, {n_origins} origini) ---")
+        table = compare_forecasters(df, engines, n_origins=n_origins, horizons=horizons, n_jobs=n_jobs)
+        print(table.sort_values('RMSE').to_string(float_format=lambda x: f"{x:.3f}"))
+        return table
+
+    def run_diagnostics(self, df=None, lags=(6, 12), alpha=0.05, top=None, out_dir=None, n_figures=5):
+        """
+        Batteria diagnostica (Ljung-Box, Jarque-Bera, eteroschedasticità, ACF) su tutti
+        i candidati della ricerca degli ordini, calcolata in modo vettoriale sui residui impilati.
+        Se la ricerca non ha conservato i residui (keep_residuals=False) i candidati
+        (i 'top' migliori per AIC, o il solo modello finale) vengono ristimati su 'df'.
+        Restituisce la tabella ordinata; le figure vengono scritte solo se out_dir è indicato.
+        """
+        from src.diagnostics import diagnostics_table, save_figures
+
+        print(f"\n--- 🔬 DIAGNOSTICA RESIDUI (lag {list(lags)}, alpha {alpha}) ---")
+        search = self.model_ref.search_results
+        if search is not None:
+            search = search[search['status'] == "OK"].sort_values('aic', kind='mergesort')
+            if top:
+                search = search.head(top)
+
+        if search is None or 'resid' not in search.columns:
+            if df is None:
+                raise ValueError("Residui dei candidati non disponibili: passa 'df' per ristimarli.")
+            series = df.iloc[:, 0] if isinstance(df, pd.DataFrame) else df
+            candidates = (list(zip(search['order'], search['seasonal_order'])) if search is not None
+                          else [(self.model_ref.best_order, self.model_ref.best_seasonal)])
+            search = self._refit_candidates(series, candidates)
+
+        residuals = {f"{o}x{s}": r for o, s, r in zip(search['order'], search['seasonal_order'], search['resid'])}
+        aic = {f"{o}x{s}": a for o, s, a in zip(search['order'], search['seasonal_order'], search['aic'])}
+        table = diagnostics_table(residuals, lags=lags, alpha=alpha, aic=aic)
+
+        print(f">> Modelli analizzati: {len(table)} | Promossi a tutti i test: {int(table['passed'].sum())}")
+        print(table[['rank', 'aic', 'tests_failed', 'min_pvalue']].head(10).to_string(float_format=lambda x: f"{x:.4f}"))
+
+        if out_dir:
+            paths = save_figures(residuals, table, out_dir, top=n_figures)
+            print(f">> {len(paths)} figure salvate in: {out_dir}")
+        return table
+
+    def diagnose_series(self, residuals, lags=(6, 12), alpha=0.05, out_dir=None, n_figures=5):
+        """Stessa batteria su un batch di serie (dict serie_id -> residui, es. MultiSeriesModel.residuals())."""
+        from src.diagnostics import diagnostics_table, save_figures
+
+        table = diagnostics_table(residuals, lags=lags, alpha=alpha)
+        print(f">> Serie analizzate: {len(table)} | Promosse a tutti i test: {int(table['passed'].sum())}")
+        if out_dir:
+            save_figures(residuals, table, out_dir, top=n_figures)
+        return table
+
+    def _refit_candidates(self, series, candidates):
+        from concurrent.futures import ProcessPoolExecutor
+
+        model = self.model_ref
+        n_workers = resolve_n_jobs(model.n_jobs, len(candidates))
+        if n_workers == 1:
+            rows = model._fit_batch(series, candidates, keep_resid=True)
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                rows = model._fit_batch(series, candidates, executor, n_workers, keep_resid=True)
+        table = pd.DataFrame(rows)
+        return table[table['status'] == "OK"]
+
+    def plot_diagnostics(self, save_path=None):
+        """
+        Genera i grafici dei residui con lag ridotti per dataset piccoli.
+        Con save_path il grafico viene scritto su file invece di essere mostrato.
+        """
+        if not self.model_ref.is_loaded():
             return
         
         print("\n>> Apertura grafici diagnostici...")
+        import matplotlib.pyplot as plt
         
         try:
             # FIX: Aggiunto lags=8 per evitare l'errore "Length of endogenous variable..."
             # Questo limita l'analisi dell'autocorrelazione a 8 mesi indietro, 
             # compatibile con uno storico breve (48 mesi).
+            if self.model_ref.engine is not None:
+                raise ValueError(f"diagnostica completa disponibile solo per SARIMA ({self.model_ref.label})")
             fig = self.model_ref.results.plot_diagnostics(figsize=(12, 8), lags=8)
             fig.tight_layout()
-            plt.show()
+            self._show_or_save(plt, save_path)
             
         except ValueError as e:
             # Fallback se i dati sono davvero troppo pochi
@@ -106,8 +194,17 @@ class GasValidator:
             print(">> Genero grafico semplificato dei soli residui...")
             
             plt.figure(figsize=(10, 4))
-            plt.plot(self.model_ref.results.resid)
+            plt.plot(self.model_ref.resid)
             plt.title("Residui del Modello (Semplificato)")
             plt.xlabel("Tempo")
             plt.ylabel("Errore")
+            self._show_or_save(plt, save_path)
+
+    @staticmethod
+    def _show_or_save(plt, save_path):
+        if save_path:
+            plt.savefig(save_path, dpi=100)
+            plt.close()
+            print(f">> Grafico salvato in: {save_path}")
+        else:
             plt.show()
\ No newline at end of file
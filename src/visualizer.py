@@ -1,10 +1,79 @@
-import plotly.graph_objects as go
-from src.utils import to_daily_resolution
+from src.utils import to_daily_resolution, DailyInterpolator, NS_PER_DAY
 import pandas as pd
+import numpy as np
+
+# Punti per traccia nella modalità WebGL (oltre si sottocampiona)
+DEFAULT_MAX_POINTS = 2000
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indici degli n_out punti che conservano
+    meglio la forma della curva (primo e ultimo punto sempre inclusi).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # n_out - 2 bucket per i punti interni
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    # Vertice fisso del triangolo: media del bucket successivo (per l'ultimo, l'ultimo punto)
+    sizes = np.diff(edges)
+    cx = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / sizes, x[-1])[1:]
+    cy = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / sizes, y[-1])[1:]
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - cx[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax_downsample(y, n_out):
+    """Indici di minimo e massimo per ciascuno di n_out / 2 bucket (picchi sempre visibili)."""
+    n = len(y)
+    # Primo e ultimo punto più un minimo e un massimo per bucket
+    n_buckets = (n_out - 2) // 2
+    if n <= n_out or n_buckets < 1:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    # Ordinati per bucket e poi per valore: il primo di ogni bucket è il minimo, l'ultimo il massimo
+    order = np.lexsort((np.asarray(y, dtype=float), bucket))
+    return np.unique(np.concatenate([order[edges[:-1]], order[edges[1:] - 1], [0, n - 1]]))
+
+
+DOWNSAMPLERS = {
+    'lttb': lambda x, y, n_out: lttb(x, y, n_out),
+    'minmax': lambda x, y, n_out: minmax_downsample(y, n_out),
+}
+
 
 class GasVisualizer:
     @staticmethod
-    def create_dashboard(df_historical, pred_series, conf_int):
+    def create_dashboard(df_historical, pred_series, conf_int, mode='svg',
+                         max_points=DEFAULT_MAX_POINTS, downsample='lttb', curve=None, label=None):
+        """
+        mode='svg': grafico originale (resample giornaliero, tracce SVG).
+        mode='webgl': tracce Scattergl dalla curva storico+previsione già calcolata
+        ('curve', es. GasModel._build_curve) senza resample, al più max_points per traccia.
+        'label' è il motore di previsione mostrato nel titolo (es. GasModel.label).
+        """
+        if mode == 'webgl':
+            return GasVisualizer._create_dashboard_gl(df_historical, pred_series, conf_int,
+                                                      max_points, downsample, curve, label)
+        if mode != 'svg':
+            raise ValueError(f"Modalità non valida: {mode} (usa 'svg' o 'webgl')")
+
+        import plotly.graph_objects as go
         
         hist_daily = to_daily_resolution(df_historical)
         
@@ -59,11 +128,114 @@ class GasVisualizer:
             pass # Se l'intervallo confidenza fallisce, mostra comunque il grafico
 
         fig.update_layout(
-            title='Analisi Prezzo Gas Naturale (SARIMA Refactored)',
+            title=GasVisualizer._dashboard_title(label),
+            xaxis_title='Data',
+            yaxis_title='Prezzo ($)',
+            template='plotly_white',
+            hovermode="x unified"
+        )
+
+        return fig
+
+    @staticmethod
+    def _dashboard_title(label):
+        return f'Analisi Prezzo Gas Naturale ({label or "SARIMA Refactored"})'
+
+    @staticmethod
+    def _create_dashboard_gl(df_historical, pred_series, conf_int, max_points, downsample, curve, label=None):
+        import plotly.graph_objects as go
+
+        history = df_historical.iloc[:, 0]
+        if curve is None:
+            curve = DailyInterpolator.from_frame(pd.concat([history, pred_series]))
+
+        # La curva è unica: lo storico finisce e la previsione parte dall'ultimo dato reale
+        split_day = history.index.max().value // NS_PER_DAY
+        end_day = min(curve.knot_days[-1], pred_series.index.max().value // NS_PER_DAY)
+        hist_x, hist_y = GasVisualizer._curve_points(curve, curve.knot_days[0], split_day, max_points, downsample)
+        pred_x, pred_y = GasVisualizer._curve_points(curve, split_day, end_day, max_points, downsample)
+
+        fig = go.Figure()
+        fig.add_trace(go.Scattergl(x=hist_x, y=hist_y, mode='lines', name='Storico',
+                                   line=dict(color='royalblue', width=2)))
+        fig.add_trace(go.Scattergl(x=pred_x, y=pred_y, mode='lines', name='Previsione AI',
+                                   line=dict(color='darkorange', dash='dot', width=2)))
+        fig.add_trace(go.Scattergl(x=history.index, y=history.values, mode='markers', name='Dati Mensili',
+                                   marker=dict(color='navy', size=5)))
+
+        if conf_int is not None and conf_int.shape[1] >= 2:
+            fig.add_trace(go.Scattergl(x=conf_int.index, y=conf_int.iloc[:, 0], mode='lines',
+                                       line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig.add_trace(go.Scattergl(x=conf_int.index, y=conf_int.iloc[:, 1], mode='lines',
+                                       line=dict(width=0), fill='tonexty',
+                                       fillcolor='rgba(255, 165, 0, 0.1)', name='Intervallo Confidenza'))
+
+        fig.update_layout(
+            title=GasVisualizer._dashboard_title(label),
             xaxis_title='Data',
             yaxis_title='Prezzo ($)',
             template='plotly_white',
             hovermode="x unified"
         )
+        return fig
+
+    @staticmethod
+    def create_multi_series(series, max_points=1000, downsample='lttb', title='Prezzi Gas per Hub'):
+        """
+        Una traccia Scattergl per serie (dict nome -> DailyInterpolator, Series o DataFrame),
+        ciascuna sottocampionata a max_points: centinaia di hub restano leggibili nel browser.
+        """
+        import plotly.graph_objects as go
+
+        fig = go.Figure()
+        for name, data in series.items():
+            if isinstance(data, DailyInterpolator):
+                x, y = GasVisualizer._curve_points(data, data.knot_days[0], data.knot_days[-1],
+                                                   max_points, downsample)
+            else:
+                values = data.iloc[:, 0] if isinstance(data, pd.DataFrame) else data
+                values = values.dropna()
+                idx = GasVisualizer._downsample(values.index.asi8, values.values, max_points, downsample)
+                x, y = values.index[idx], values.values[idx]
+            fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', name=str(name), line=dict(width=1)))
 
+        fig.update_layout(title=title, xaxis_title='Data', yaxis_title='Prezzo ($)',
+                          template='plotly_white', showlegend=len(series) <= 30)
         return fig
+
+    @staticmethod
+    def save(fig, path):
+        """
+        Scrive il grafico senza aprire il browser: HTML autonomo (plotly.js incluso,
+        funziona offline) oppure immagine statica (PNG/SVG/PDF, richiede kaleido).
+        """
+        if path.lower().endswith('.html'):
+            fig.write_html(path, include_plotlyjs=True, full_html=True, auto_open=False)
+            return path
+        try:
+            fig.write_image(path)
+        except (ImportError, ValueError) as e:
+            raise ImportError(f"L'esportazione in immagine richiede kaleido (pip install kaleido): {e}")
+        return path
+
+    @staticmethod
+    def _curve_points(curve, start_day, end_day, max_points, downsample):
+        """
+        Punti della curva tra due giorni-epoch. Con interpolazione lineare bastano i nodi
+        (la retta tra due nodi è esatta); altrimenti si campiona ogni giorno e si sottocampiona.
+        """
+        if curve.method == 'linear':
+            inner = curve.knot_days[(curve.knot_days > start_day) & (curve.knot_days < end_day)]
+            days = np.concatenate([[start_day], inner, [end_day]])
+        else:
+            days = np.arange(start_day, end_day + 1)
+
+        values = curve.at_days(days)
+        idx = GasVisualizer._downsample(days, values, max_points, downsample)
+        return pd.to_datetime(days[idx], unit='D'), values[idx]
+
+    @staticmethod
+    def _downsample(x, y, max_points, downsample):
+        if downsample not in DOWNSAMPLERS:
+            raise ValueError(f"Sottocampionamento non valido: {downsample} (usa {tuple(DOWNSAMPLERS)})")
+        return DOWNSAMPLERS[downsample](x, y, max_points)
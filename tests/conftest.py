@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# I moduli si importano come 'src.x' dalla radice del repository
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+@pytest.fixture(scope='session')
+def history():
+    from src.data_loader import DataLoader
+    return DataLoader(os.path.join(BASE_DIR, 'data', 'Nat_Gas.csv')).get_clean_data()[['Prices']]
+
+
+@pytest.fixture(scope='session')
+def price_model(history):
+    """Modello con un motore veloce: stessa interfaccia del SARIMA, senza ricerca degli ordini."""
+    from src.model import GasModel
+    from src.forecasters import make_engine
+
+    model = GasModel(save_dir=tempfile.mkdtemp(), engine=make_engine('holt-winters'))
+    model.load_or_train(history['Prices'])
+    return model
+
+
+@pytest.fixture(scope='session')
+def sarima_dir(history):
+    """Registro con un SARIMA già stimato (griglia ridotta: max_pq=0, 16 candidati)."""
+    from src.model import GasModel
+
+    save_dir = tempfile.mkdtemp()
+    GasModel(save_dir=save_dir, max_pq=0).load_or_train(history['Prices'])
+    return save_dir
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.backtest import WalkForwardBacktest
+from src.forecasters import make_engine
+
+
+@pytest.fixture(scope='module')
+def series():
+    rng = np.random.default_rng(0)
+    t = np.arange(60)
+    values = 10 + np.sin(t / 12 * 2 * np.pi) + 0.01 * t + 0.1 * rng.standard_normal(60)
+    return pd.Series(values, index=pd.date_range('2015-01-31', periods=60, freq='ME'), name='Prices')
+
+
+@pytest.mark.parametrize('warm_start', [False, True])
+def test_walk_forward_independent_of_n_jobs(series, warm_start):
+    def run(n_jobs):
+        engine = WalkForwardBacktest((1, 0, 0), (0, 1, 1, 12), n_jobs=n_jobs, warm_start=warm_start)
+        return engine.run(series, n_origins=6)
+
+    errors_serial, metrics_serial = run(1)
+    errors_parallel, metrics_parallel = run(3)
+
+    columns = ['cutoff', 'horizon', 'date', 'actual', 'forecast', 'error']
+    pd.testing.assert_frame_equal(errors_parallel[columns], errors_serial[columns])
+    pd.testing.assert_frame_equal(metrics_parallel, metrics_serial)
+
+
+def test_walk_forward_with_engine(series):
+    errors, _ = WalkForwardBacktest(None, None, n_jobs=2, forecaster=make_engine('seasonal-naive')).run(series, n_origins=4)
+    # Seasonal naive: la previsione a h mesi è il valore di 12 mesi prima
+    row = errors.iloc[0]
+    assert row['forecast'] == series[row['date'] - pd.DateOffset(months=12) + pd.offsets.MonthEnd(0)]
+
+
+def test_every_origin_covers_all_horizons(series):
+    errors, metrics = WalkForwardBacktest(None, None, horizons=(1, 3, 12),
+                                          forecaster=make_engine('seasonal-naive')).run(series, n_origins=5)
+    assert errors.groupby('horizon')['cutoff'].nunique().to_dict() == {1: 5, 3: 5, 12: 5}
+    assert errors['date'].max() == series.index[-1]
+    assert list(metrics['n']) == [5, 5, 5, 15]
+
+
+def test_horizon_longer_than_history_raises(series):
+    with pytest.raises(ValueError, match="Storico troppo corto"):
+        WalkForwardBacktest(None, None, horizons=(1, 48),
+                            forecaster=make_engine('seasonal-naive')).run(series, n_origins=5)
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+import tempfile
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('statsmodels', 'plotly', 'matplotlib', 'scipy')
+
+
+def _run(code):
+    """Esegue 'code' in un interprete nuovo: sys.modules parte vuoto."""
+    result = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_import_main_is_light():
+    loaded = _run(f"import sys, main; print(sorted(m for m in {HEAVY!r} if m in sys.modules))")
+    assert loaded == "[]"
+
+
+def test_price_job_with_fast_engine_skips_heavy_imports():
+    work_dir = tempfile.mkdtemp()
+    dates, out = os.path.join(work_dir, 'dates.csv'), os.path.join(work_dir, 'prices.csv')
+    pd.DataFrame({'Dates': ['2023-01-31', '2025-03-15', 'non una data']}).to_csv(dates, index=False)
+
+    loaded = _run(
+        "import sys, main\n"
+        f"code = main.run_batch(['--engine', 'seasonal-naive', '--models', {work_dir!r}, "
+        f"'price', '--dates', {dates!r}, '--out', {out!r}])\n"
+        f"print(code, sorted(m for m in {HEAVY!r} if m in sys.modules))")
+    assert loaded == "0 []"
+
+    priced = pd.read_csv(out)
+    assert list(priced['Label'].fillna('')) == ['STORICO', 'PREVISIONE', '']
+    assert priced['Price'].notna().sum() == 2
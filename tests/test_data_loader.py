@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import pandas as pd
+import pytest
+from src.data_loader import DataLoader
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def csv_path():
+    path = os.path.join(tempfile.mkdtemp(), 'Nat_Gas.csv')
+    shutil.copy(os.path.join(BASE_DIR, 'data', 'Nat_Gas.csv'), path)
+    return path
+
+
+def test_mmap_cache_matches_csv(csv_path):
+    plain = DataLoader(csv_path).get_clean_data()
+    loader = DataLoader(csv_path, use_cache=True)
+
+    built = loader.get_clean_data()
+    assert os.path.exists(os.path.join(loader.cache_dir, 'Nat_Gas.csv.values.npy'))
+    cached = loader.get_clean_data()
+    pd.testing.assert_frame_equal(built, plain)
+    pd.testing.assert_frame_equal(cached, plain)
+
+    # Stesso contenuto con mtime diverso: la cache resta valida
+    os.utime(csv_path, ns=(0, 0))
+    pd.testing.assert_frame_equal(loader.get_clean_data(), plain)
+
+
+def test_mmap_cache_rebuilt_when_csv_changes(csv_path):
+    loader = DataLoader(csv_path, use_cache=True)
+    loader.get_clean_data()
+
+    with open(csv_path, 'a') as f:
+        f.write("\n10/31/24,12.5")
+    updated = loader.get_clean_data()
+    pd.testing.assert_frame_equal(updated, DataLoader(csv_path).get_clean_data())
+    assert updated['Prices'].iloc[-1] == 12.5
+
+
+def test_parquet_matches_csv(csv_path):
+    pytest.importorskip('pyarrow')
+    plain = DataLoader(csv_path).get_clean_data()
+    parquet_path = csv_path.replace('.csv', '.parquet')
+    plain.reset_index().to_parquet(parquet_path)
+    pd.testing.assert_frame_equal(DataLoader(parquet_path).get_clean_data(), plain, check_freq=False)
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from src.diagnostics import acf_matrix, diagnostics_table, jarque_bera, ljung_box, stack_residuals
+
+LAGS = [1, 6, 12]
+
+
+@pytest.fixture(scope='module')
+def residuals():
+    rng = np.random.default_rng(11)
+    ar = np.zeros(60)
+    noise = rng.standard_normal(60)
+    for t in range(1, 60):
+        ar[t] = 0.7 * ar[t - 1] + noise[t]
+    # Lunghezze diverse: le serie corte sono completate con NaN
+    return {'bianco': rng.standard_normal(48), 'ar1': ar, 'student_t': rng.standard_t(3, 55)}
+
+
+def test_matches_statsmodels(residuals):
+    from statsmodels.stats.diagnostic import acorr_ljungbox
+    from statsmodels.stats.stattools import jarque_bera as sm_jarque_bera
+    from statsmodels.tsa.stattools import acf
+
+    labels, R = stack_residuals(residuals)
+    lb_stat, lb_pvalue = ljung_box(R, LAGS)
+    jb_stat, jb_pvalue, skew, kurtosis = jarque_bera(R)
+    acf_rows = acf_matrix(R, 12)
+
+    for i, label in enumerate(labels):
+        resid = residuals[label]
+        expected = acorr_ljungbox(resid, lags=LAGS, return_df=True)
+        np.testing.assert_allclose(lb_stat[i], expected['lb_stat'], rtol=1e-10)
+        np.testing.assert_allclose(lb_pvalue[i], expected['lb_pvalue'], rtol=1e-8)
+        np.testing.assert_allclose([jb_stat[i], jb_pvalue[i], skew[i], kurtosis[i]],
+                                   sm_jarque_bera(resid), rtol=1e-10)
+        np.testing.assert_allclose(acf_rows[i], acf(resid, nlags=12, fft=False), rtol=1e-10)
+
+
+def test_table_ranks_white_noise_first(residuals):
+    table = diagnostics_table(residuals, lags=(6, 12))
+    assert list(table['rank']) == [1, 2, 3]
+    assert table.index[0] == 'bianco' and table.loc['bianco', 'passed']
+    assert not table.loc['ar1', 'passed']
+    assert (table['tests_failed'].diff().dropna() >= 0).all()
+    assert table.loc['ar1', 'lb_pvalue_6'] < 0.05
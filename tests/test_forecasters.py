@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.forecasters import ENGINES, EnsembleForecaster, Forecaster, make_engine
+
+
+@pytest.mark.parametrize('name', list(ENGINES))
+def test_engine_contract(history, name):
+    engine = make_engine(name)
+    assert isinstance(engine, Forecaster) and not engine.is_fitted()
+    with pytest.raises(ValueError, match="non stimato"):
+        engine.get_forecast(6)
+
+    assert engine.fit(history) is engine
+    forecast = engine.get_forecast(18)
+    mean, var = forecast.predicted_mean, forecast.var_pred_mean
+    pd.testing.assert_index_equal(mean.index, pd.date_range(history.index[-1], periods=19, freq='ME')[1:])
+    assert np.isfinite(mean).all() and (var > 0).all()
+
+    conf = forecast.conf_int()
+    assert list(conf.columns) == ['lower Prices', 'upper Prices']
+    assert ((conf.iloc[:, 0] < mean) & (mean < conf.iloc[:, 1])).all()
+    assert np.isfinite(engine.resid).all()
+
+    # La copia ha la stessa configurazione ma non è stimata; ristimata prevede lo stesso
+    clone = engine.clone()
+    assert type(clone) is type(engine) and not clone.is_fitted()
+    np.testing.assert_allclose(clone.fit(history).get_forecast(18).predicted_mean, mean, rtol=1e-12)
+
+
+def test_ensemble_is_weighted_mean_of_members(history):
+    weights = np.array([3.0, 1.0, 1.0])
+    ensemble = EnsembleForecaster(weights=weights).fit(history)
+    forecast = ensemble.get_forecast(12)
+
+    members = [m.clone().fit(history).get_forecast(12) for m in ensemble.members]
+    w = weights / weights.sum()
+    np.testing.assert_allclose(forecast.predicted_mean, sum(wi * f.predicted_mean for wi, f in zip(w, members)),
+                               rtol=1e-12)
+    np.testing.assert_allclose(np.sqrt(forecast.var_pred_mean),
+                               sum(wi * np.sqrt(f.var_pred_mean) for wi, f in zip(w, members)), rtol=1e-12)
+
+    # Un solo membro con peso: l'ensemble coincide con quel motore
+    single = EnsembleForecaster(weights=[0.0, 1.0, 0.0]).fit(history).get_forecast(12)
+    np.testing.assert_allclose(single.predicted_mean, members[1].predicted_mean, rtol=1e-12)
+
+
+def test_calibrated_weights_favour_lower_error(history):
+    ensemble = EnsembleForecaster()
+    table = ensemble.calibrate(history, n_origins=6)
+    assert table['weight'].sum() == pytest.approx(1.0)
+    assert table['weight'].idxmax() == table['RMSE'].idxmin()
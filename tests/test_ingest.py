@@ -0,0 +1,60 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from src.ingest import TickAggregator
+
+
+@pytest.fixture
+def ticks():
+    rng = np.random.default_rng(5)
+    ts = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.sort(rng.uniform(0, 120, 3000)), unit='D')
+    return pd.DataFrame({'Dates': ts.strftime('%Y-%m-%d %H:%M:%S'),
+                         'Prices': rng.uniform(9, 12, len(ts)).round(4),
+                         'Volume': rng.integers(1, 500, len(ts))})
+
+
+def _write(df, path, header=True, mode='w'):
+    df.to_csv(path, index=False, header=header, mode=mode)
+
+
+def _expected(ticks, how):
+    frame = ticks.assign(Dates=pd.to_datetime(ticks['Dates'])).set_index('Dates')
+    grouped = frame.resample('ME')
+    if how == 'vwap':
+        return (frame['Prices'] * frame['Volume']).resample('ME').sum() / grouped['Volume'].sum()
+    return grouped['Prices'].last() if how == 'last' else grouped['Prices'].mean()
+
+
+@pytest.mark.parametrize('how', ['last', 'mean', 'vwap'])
+def test_aggregates_match_pandas(ticks, how):
+    path = os.path.join(tempfile.mkdtemp(), 'ticks.csv')
+    _write(ticks, path)
+
+    df = TickAggregator(how=how, volume_col='Volume', batch_size=257).ingest(path)
+    np.testing.assert_allclose(df['Prices'].values, _expected(ticks, how).values, rtol=1e-12)
+    assert df.index.freqstr == 'ME'
+
+
+def test_checkpoint_resumes_from_last_offset(ticks, capsys):
+    work_dir = tempfile.mkdtemp()
+    path, checkpoint = os.path.join(work_dir, 'ticks.csv'), os.path.join(work_dir, 'ckpt.json')
+    _write(ticks.iloc[:2000], path)
+    TickAggregator(how='vwap', volume_col='Volume', batch_size=300, checkpoint_path=checkpoint).ingest(path)
+
+    # Append: un nuovo aggregatore elabora solo le righe nuove
+    _write(ticks.iloc[2000:], path, header=False, mode='a')
+    resumed = TickAggregator(how='vwap', volume_col='Volume', batch_size=300, checkpoint_path=checkpoint)
+    capsys.readouterr()
+    df = resumed.ingest(path)
+    assert ">> Ingestione: 1000 nuove righe" in capsys.readouterr().out
+    assert resumed.rows_processed == len(ticks)
+    np.testing.assert_allclose(df['Prices'].values, _expected(ticks, 'vwap').values, rtol=1e-12)
+
+    # File riscritto: il checkpoint viene scartato e si riparte da zero
+    _write(ticks.iloc[:1000], path)
+    restarted = TickAggregator(how='vwap', volume_col='Volume', checkpoint_path=checkpoint)
+    df = restarted.ingest(path)
+    assert restarted.rows_processed == 1000
+    np.testing.assert_allclose(df['Prices'].values, _expected(ticks.iloc[:1000], 'vwap').values, rtol=1e-12)
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import pytest
+from src import instrumentation
+from src.instrumentation import METRICS, timed, count
+
+
+@pytest.fixture
+def metrics():
+    was_enabled = instrumentation.is_enabled()
+    METRICS.reset()
+    yield METRICS
+    instrumentation.enable(was_enabled)
+    METRICS.reset()
+
+
+def test_disabled_records_nothing(metrics, history, price_model):
+    instrumentation.enable(False)
+    price_model.predict_values(['11/30/24'], history)
+    with timed("test.block"):
+        pass
+    count("test.counter")
+    assert metrics.snapshot() == {"timers": {}, "counters": {}, "gauges": {}}
+
+
+def test_pipeline_timers_and_counters(metrics, history, price_model):
+    instrumentation.enable()
+    for _ in range(3):
+        price_model.predict_values(['11/30/24', '06/15/25'], history)
+
+    snap = metrics.snapshot()
+    timer = snap["timers"]["model.predict_values"]
+    assert timer["count"] == 3
+    assert 0 <= timer["min"] <= timer["p50"] <= timer["max"]
+    assert timer["sum"] == pytest.approx(timer["mean"] * 3)
+    assert snap["counters"]["model.forecast_cache.hits"] >= 2
+
+
+def test_export_formats(metrics):
+    instrumentation.enable()
+    with timed("data.load"):
+        pass
+    count("server.requests", 2)
+    with instrumentation.capture("job", memory=True):
+        sum(range(1000))
+
+    out_dir = tempfile.mkdtemp()
+    metrics.export(os.path.join(out_dir, "metrics.prom"))
+    metrics.export(os.path.join(out_dir, "metrics.json"))
+
+    with open(os.path.join(out_dir, "metrics.prom")) as f:
+        text = f.read()
+    assert "gas_data_load_seconds_count 1" in text
+    assert "gas_server_requests_total 2" in text
+    assert "# TYPE gas_job_peak_bytes gauge" in text
+    with open(os.path.join(out_dir, "metrics.json")) as f:
+        assert json.load(f)["counters"] == {"server.requests": 2}
+    assert "cumulative" in metrics.profiles["job"]
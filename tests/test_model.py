@@ -0,0 +1,167 @@
+import copy
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from src.model import GasModel
+from src.backtest import _fit
+from src.utils import quiet_fit
+from src.registry import FORECAST_STEPS
+
+
+def test_registry_forecast_cache_hit_after_rebuild(history, sarima_dir):
+    model = GasModel(save_dir=sarima_dir, max_pq=0)
+    model.load_or_train(history['Prices'])
+    assert model._pending_entry is not None
+
+    # Oltre l'orizzonte salvato nel registro: il modello viene ricostruito (miss)
+    model.get_cached_forecast(FORECAST_STEPS + 17)
+    assert model.cache_info()['misses'] == 1
+
+    model.get_cached_forecast(FORECAST_STEPS + 17)
+    model.get_cached_forecast(12)
+    assert model.cache_info() == {'hits': 2, 'misses': 1, 'steps': FORECAST_STEPS + 17}
+
+
+@pytest.fixture(scope='module')
+def prefix_model(history):
+    """GasModel senza registro stimato sullo storico senza gli ultimi 6 mesi."""
+    model = GasModel(save_dir=tempfile.mkdtemp(), use_registry=False)
+    model.best_order, model.best_seasonal = (1, 0, 0), (0, 1, 1, 12)
+    model.results = _fit(history['Prices'].iloc[:-6], model.best_order, model.best_seasonal)
+    return model
+
+
+def test_update_append_matches_full_refit(history, prefix_model):
+    import statsmodels.api as sm
+
+    model = copy.deepcopy(prefix_model)
+    assert model.update(history['Prices']) == 'aggiornato'
+    assert model.results.nobs == len(history)
+
+    # Stessi parametri sullo storico completo: stesse previsioni
+    full = sm.tsa.statespace.SARIMAX(history['Prices'], order=model.best_order, seasonal_order=model.best_seasonal,
+                                     enforce_stationarity=False, enforce_invertibility=False)
+    reference = full.filter(prefix_model.results.params)
+    np.testing.assert_allclose(model.results.get_forecast(24).predicted_mean,
+                               reference.get_forecast(24).predicted_mean, rtol=1e-10)
+
+    # Con refit=True coincide con un fit completo partito dagli stessi parametri
+    model = copy.deepcopy(prefix_model)
+    assert model.update(history['Prices'], refit=True) == 'aggiornato'
+    with quiet_fit():
+        reference = full.fit(disp=False, start_params=prefix_model.results.params)
+    np.testing.assert_allclose(model.results.get_forecast(24).predicted_mean,
+                               reference.get_forecast(24).predicted_mean, rtol=1e-6)
+
+
+def test_update_detects_drift_and_rewritten_history(history, prefix_model, capsys):
+    model = copy.deepcopy(prefix_model)
+    drifted = history['Prices'].copy()
+    drifted.iloc[-6:] *= 1.5
+    assert model.update(drifted) == 'retrain'
+    assert "Drift rilevato" in capsys.readouterr().out
+    # Il modello resta quello di partenza
+    assert model.results.nobs == len(history) - 6
+
+    rewritten = history['Prices'].copy()
+    rewritten.iloc[10] += 1.0
+    assert model.update(rewritten) == 'retrain'
+    assert "Storico diverso" in capsys.readouterr().out
+    assert model.update(history['Prices'].iloc[:-6]) == 'invariato'
+
+
+@pytest.fixture(scope='module')
+def grid_model(history):
+    """Grid Search seriale sulla griglia ridotta (max_pq=0, 16 candidati)."""
+    model = GasModel(save_dir=tempfile.mkdtemp(), max_pq=0, n_jobs=1)
+    model._optimize_params(history['Prices'])
+    return model
+
+
+def test_parallel_grid_search_matches_serial(history, grid_model):
+    model = GasModel(save_dir=tempfile.mkdtemp(), max_pq=0, n_jobs=2)
+    model._optimize_params(history['Prices'])
+
+    columns = ['order', 'seasonal_order', 'aic', 'bic', 'status']
+    assert len(model.search_results) == 16
+    pd.testing.assert_frame_equal(model.search_results[columns], grid_model.search_results[columns])
+    assert (model.best_order, model.best_seasonal) == (grid_model.best_order, grid_model.best_seasonal)
+
+
+def test_stepwise_finds_grid_optimum(history, grid_model):
+    model = GasModel(save_dir=tempfile.mkdtemp(), max_pq=0, search='stepwise')
+    model._optimize_params(history['Prices'])
+
+    assert (model.best_order, model.best_seasonal) == (grid_model.best_order, grid_model.best_seasonal)
+    # Ogni candidato è stimato una sola volta, e meno che nella griglia completa
+    orders = list(zip(model.search_results['order'], model.search_results['seasonal_order']))
+    assert len(orders) == len(set(orders)) < len(grid_model.search_results)
+
+
+def test_predict_values_matches_pandas_interpolation(history, price_model):
+    pred, _ = price_model.get_cached_forecast(20)
+    curve = pd.concat([history['Prices'], pred]).to_frame().resample('D').mean().interpolate(method='linear')
+    dates = pd.date_range(history.index[0], pred.index[-3], freq='D')
+
+    priced = price_model.predict_values(dates, history)
+    np.testing.assert_allclose(priced['Price'], curve.loc[dates].iloc[:, 0], rtol=1e-12)
+    assert (priced['Label'] == np.where(dates <= history.index[-1], 'STORICO', 'PREVISIONE')).all()
+
+    # Stesso prezzo della versione scalare, date in formato MM/GG/AA comprese
+    for date in ['10/31/20', '03/15/22', '11/07/24', '06/30/25']:
+        price, label, _ = price_model.predict_value(date, history)
+        batch = price_model.predict_values([date], history).iloc[0]
+        assert batch['Price'] == pytest.approx(price, rel=1e-12)
+        assert batch['Label'] == label
+
+
+def test_forecast_cache_hits_and_invalidation(history, prefix_model):
+    model = copy.deepcopy(prefix_model)
+    model._invalidate_forecast_cache()
+    model.cache_hits = model.cache_misses = 0
+
+    mean_24, conf_24 = model.get_cached_forecast(24)
+    mean_12, conf_12 = model.get_cached_forecast(12)
+    # Orizzonte più corto: servito tagliando quello già calcolato
+    pd.testing.assert_series_equal(mean_12, mean_24.iloc[:12])
+    pd.testing.assert_frame_equal(conf_12, conf_24.iloc[:12])
+    assert model.cache_info() == {'hits': 1, 'misses': 1, 'steps': 24}
+
+    model.get_cached_forecast(30)
+    assert model.cache_info() == {'hits': 1, 'misses': 2, 'steps': 30}
+
+    # Nuovi dati: cambia l'impronta del modello e la previsione viene ricalcolata
+    assert model.update(history['Prices']) == 'aggiornato'
+    mean_new, _ = model.get_cached_forecast(12)
+    assert model.cache_info()['misses'] == 3
+    assert mean_new.index[0] > mean_24.index[0]
+
+    # Parametri modificati senza passare da update(): la chiave cambia comunque
+    model.results = model.results.model.filter(model.results.params * 1.01)
+    model.get_cached_forecast(12)
+    assert model.cache_info()['misses'] == 4
+
+
+def test_quantile_bands_are_monotone(history, price_model):
+    dates = pd.date_range(history.index[-3], periods=400, freq='D')
+    quantiles = [0.05, 0.25, 0.5, 0.75, 0.95]
+    table = price_model.predict_quantiles(dates, history, quantiles)
+
+    bands = table[['P5', 'P25', 'P50', 'P75', 'P95']].values
+    assert (np.diff(bands, axis=1) >= 0).all()
+    np.testing.assert_allclose(table['P50'], table['Price'], rtol=1e-12)
+
+    # Sullo storico nessuna incertezza; nel futuro la banda si allarga con l'orizzonte
+    future = (table['Label'] == 'PREVISIONE').values
+    assert (table.loc[~future, 'Std'] == 0).all()
+    assert (np.diff(table.loc[future, 'Std']) >= 0).all()
+
+    # Ai nodi mensili la banda al 95% coincide con l'intervallo di confidenza della previsione
+    _, conf = price_model.get_cached_forecast(6)
+    at_knots = table.set_index('Date').loc[conf.index]
+    np.testing.assert_allclose(at_knots['Std'] * 2 * 1.959964,
+                               conf.iloc[:, 1] - conf.iloc[:, 0], rtol=1e-6)
+
+    with pytest.raises(ValueError, match="Quantili non validi"):
+        price_model.predict_quantiles(dates, history, [0.5, 1.0])
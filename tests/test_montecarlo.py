@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from src.model import GasModel
+from src.pricing import StorageContract
+from src.montecarlo import MonteCarloValuator
+
+INJECTIONS = ['06/30/24', '11/15/24', '05/31/25']
+WITHDRAWALS = ['01/31/25', '02/15/25', '12/31/25']
+
+
+@pytest.fixture(scope='module')
+def sarima_model(history, sarima_dir):
+    model = GasModel(save_dir=sarima_dir, max_pq=0)
+    model.load_or_train(history['Prices'])
+    return model
+
+
+def test_mean_converges_to_intrinsic_value(history, sarima_model):
+    contract = StorageContract()
+    intrinsic, _ = contract.calculate_valuation(INJECTIONS, WITHDRAWALS, sarima_model, history)
+
+    valuator = MonteCarloValuator(sarima_model, history, n_paths=20000, chunk_size=7000, seed=0)
+    stats, npv = valuator.value_schedule(contract, INJECTIONS, WITHDRAWALS)
+    assert len(npv) == 20000
+    # Media entro 4 errori standard dal valore sulla curva attesa
+    assert abs(stats['mean'] - intrinsic) < 4 * stats['std'] / np.sqrt(len(npv))
+    assert stats['std'] > 0
+
+
+def test_simulated_paths_match_forecast(history, sarima_model):
+    valuator = MonteCarloValuator(sarima_model, history, n_paths=20000, seed=1)
+    paths = np.vstack(list(valuator.iter_paths(12)))
+    assert paths.shape == (20000, 13)
+    assert (paths[:, 0] == history.iloc[-1, 0]).all()
+
+    mean, conf = sarima_model.get_cached_forecast(12)
+    se = (conf.iloc[:, 1] - conf.iloc[:, 0]).values / (2 * 1.959964)
+    np.testing.assert_allclose(paths[:, 1:].mean(axis=0), mean.values, atol=4 * se.max() / np.sqrt(20000))
+    np.testing.assert_allclose(paths[:, 1:].std(axis=0), se, rtol=0.05)
+
+
+def test_same_seed_is_reproducible(history, sarima_model):
+    def run():
+        valuator = MonteCarloValuator(sarima_model, history, n_paths=3000, chunk_size=1000, seed=7)
+        return valuator.value_schedule(StorageContract(), INJECTIONS, WITHDRAWALS)[1]
+
+    np.testing.assert_array_equal(run(), run())
@@ -0,0 +1,53 @@
+import tempfile
+import numpy as np
+import pytest
+from src.model import GasModel
+from src.multiseries import MultiSeriesModel, _train_series
+from src.forecasters import make_engine
+
+DATES = ['2025-03-31', '2025-12-31', '2026-06-30']
+
+
+@pytest.fixture(scope='module')
+def panel(history):
+    return {'HUB_A': history, 'HUB_B': history * 1.5 + 1.0}
+
+
+def test_train_series_overrides_n_jobs(history):
+    row, fitted = _train_series('HUB_A', history, tempfile.mkdtemp(),
+                                {'n_jobs': 4, 'engine': make_engine('holt-winters')})
+    assert row['status'] == "OK"
+    assert fitted.is_fitted()
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_engine_panel_matches_single_models(panel, n_jobs):
+    engine = make_engine('holt-winters')
+    multi = MultiSeriesModel(save_dir=tempfile.mkdtemp(), n_jobs=n_jobs, engine=engine)
+    report = multi.train(panel)
+    assert list(report.index) == list(panel)
+    assert (report['status'] == "OK").all()
+    # Il motore passato non viene stimato: ogni serie usa una propria copia
+    assert not engine.is_fitted()
+
+    for series_id, df in panel.items():
+        single = GasModel(save_dir=tempfile.mkdtemp(), engine=make_engine('holt-winters'))
+        single.load_or_train(df['Prices'])
+        np.testing.assert_allclose(multi.predict_values(series_id, DATES)['Price'],
+                                   single.predict_values(DATES, df)['Price'], rtol=1e-12)
+
+
+def test_sarima_without_registry_is_trained_once(panel, history, sarima_dir, monkeypatch):
+    calls = []
+    train = GasModel._validate_and_train
+    monkeypatch.setattr(GasModel, '_validate_and_train', lambda self, df: calls.append(1) or train(self, df))
+
+    multi = MultiSeriesModel(save_dir=tempfile.mkdtemp(), n_jobs=1, max_pq=0, use_registry=False)
+    multi.train(panel)
+    # Il processo principale ricostruisce i modelli dai parametri dei worker
+    assert len(calls) == len(panel)
+
+    reference = GasModel(save_dir=sarima_dir, max_pq=0)
+    reference.load_or_train(history['Prices'])
+    np.testing.assert_allclose(multi.predict_values('HUB_A', DATES)['Price'],
+                               reference.predict_values(DATES, history)['Price'], rtol=1e-8)
@@ -0,0 +1,53 @@
+import time
+import itertools
+import numpy as np
+import pandas as pd
+import pytest
+from src.pricing import StorageContract
+from src.optimizer import StorageOptimizer, MAX_LEVELS
+
+
+def test_grid_capped_for_non_round_rates():
+    # Il MCD di 1.000.000 e 33.333 è 1: senza tetto la griglia avrebbe 1.000.001 livelli
+    contract = StorageContract(inj_rate=33333, with_rate=33333)
+    optimizer = StorageOptimizer(contract)
+    assert optimizer.n_levels <= MAX_LEVELS
+    assert optimizer.inj_levels >= 1 and optimizer.with_levels >= 1
+
+    dates = pd.date_range('2025-01-01', periods=365, freq='D')
+    prices = 10 + np.sin(np.arange(365) / 365 * 2 * np.pi)
+    start = time.perf_counter()
+    value, df_ledger, schedule = optimizer.solve_prices(dates, prices)
+    assert time.perf_counter() - start < 10
+    assert np.isfinite(value) and value > 0
+    assert len(schedule) > 0
+
+
+def test_round_rates_keep_exact_grid():
+    optimizer = StorageOptimizer(StorageContract())
+    assert optimizer.volume_step == 50000
+    assert optimizer.n_levels == 21
+
+
+@pytest.mark.parametrize('params', [
+    {'max_volume': 200000, 'inj_rate': 100000, 'with_rate': 100000},
+    {'max_volume': 200000, 'inj_rate': 100000, 'with_rate': 200000, 'storage_cost': 0.5},
+])
+def test_dp_matches_brute_force(params):
+    contract = StorageContract(**params)
+    rng = np.random.default_rng(3)
+    dates = pd.date_range('2025-01-01', periods=7, freq='5D')
+    prices = rng.uniform(8, 12, len(dates))
+
+    value, _, _ = StorageOptimizer(contract).solve_prices(dates, prices)
+
+    # Tutte le sequenze di azioni che lasciano il magazzino vuoto a fine orizzonte
+    best = -np.inf
+    for plan in itertools.product((None, 'INJECTION', 'WITHDRAWAL'), repeat=len(dates)):
+        active = np.array([a is not None for a in plan])
+        actions = np.array(plan, dtype=object)[active]
+        npv, ledger = contract._value_schedule(dates[active], actions, prices[active])
+        if len(ledger) == 0 or ledger['Inventory'].iloc[-1] == 0:
+            best = max(best, npv)
+
+    assert value == pytest.approx(best, rel=1e-12)
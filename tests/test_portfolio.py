@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+from src.pricing import StorageContract
+from src.portfolio import StoragePortfolio, contract_records
+
+CONTRACTS = pd.DataFrame({
+    'injection_dates': [['06/30/23', '07/15/23'], ['04/30/25', '05/31/25', '06/15/25'], ['08/31/24'], []],
+    'withdrawal_dates': [['12/31/23', '01/31/24'], ['01/15/26', '02/28/26'], ['01/01/10', '03/31/26'], ['12/31/24']],
+    'max_volume': [1000000, 120000, 137000.5, 500000],
+    'inj_rate': [50000, 50000, 33333.3, 50000],
+    'with_rate': [50000, 70000, 41000.7, 50000],
+    'storage_cost': [0.05, 0.05, 0.08, 0.05],
+}, index=['A', 'B', 'C', 'D'])
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+@pytest.mark.parametrize('keep_ledgers', [False, True])
+def test_portfolio_matches_single_contract(price_model, history, n_jobs, keep_ledgers):
+    portfolio = StoragePortfolio(price_model, history, n_jobs=n_jobs, chunk_size=2)
+    summary, ledgers = portfolio.value(CONTRACTS, keep_ledgers=keep_ledgers)
+    summary = summary.set_index('contract_id')
+
+    for contract_id, params, inj_dates, wit_dates in contract_records(CONTRACTS):
+        value, ledger = StorageContract(**params).calculate_valuation(inj_dates, wit_dates, price_model, history)
+
+        assert summary.loc[contract_id, 'NPV'] == pytest.approx(value, rel=1e-12, abs=1e-6)
+        assert summary.loc[contract_id, 'Events'] == len(inj_dates) + len(wit_dates)
+        assert summary.loc[contract_id, 'FinalInventory'] == pytest.approx(ledger['Inventory'].iloc[-1])
+        if keep_ledgers:
+            pd.testing.assert_frame_equal(ledgers[contract_id], ledger, check_dtype=False, rtol=1e-12)
+        else:
+            assert ledgers is None
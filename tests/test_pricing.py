@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.pricing import StorageContract
+
+INJECTIONS = ['06/30/23', '07/15/23', '08/31/24', '04/30/25', '05/31/25', '06/15/25', '06/30/25']
+WITHDRAWALS = ['12/31/23', '01/31/24', '01/15/26', '02/28/26', '03/31/26', '01/01/10']
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'max_volume': 120000, 'inj_rate': 50000, 'with_rate': 70000},
+    {'max_volume': 137000.5, 'inj_rate': 33333.3, 'with_rate': 41000.7, 'storage_cost': 0.08},
+])
+def test_vectorized_matches_loop(price_model, history, params):
+    contract = StorageContract(**params)
+    value, ledger = contract.calculate_valuation(INJECTIONS, WITHDRAWALS, price_model, history)
+    value_vec, ledger_vec = contract.calculate_valuation_vectorized(INJECTIONS, WITHDRAWALS, price_model, history)
+
+    assert value_vec == pytest.approx(value, rel=1e-12)
+    pd.testing.assert_frame_equal(ledger_vec.reset_index(drop=True), ledger, check_dtype=False, rtol=1e-12)
+
+
+def test_batch_matches_schedule(price_model, history):
+    contract = StorageContract(max_volume=120000, inj_rate=50000, with_rate=70000)
+    dates, actions, raw_dates = contract._sort_events(INJECTIONS, WITHDRAWALS)
+    prices = price_model.predict_values(raw_dates, history)['Price'].values
+
+    value, _ = contract._value_schedule(dates, actions, prices)
+    batch = contract._value_batch(dates, actions, np.vstack([prices, prices]))
+    np.testing.assert_allclose(batch, value, rtol=1e-12)
@@ -0,0 +1,65 @@
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from src.model import GasModel
+from src.registry import ModelRegistry
+
+DATES = ['2025-03-31', '2025-12-31', '2027-06-30']
+
+
+@pytest.fixture
+def registry_dir(sarima_dir):
+    """Copia del registro di sessione: i test possono aggiungere voci."""
+    copy_dir = tempfile.mkdtemp()
+    shutil.copytree(sarima_dir, copy_dir, dirs_exist_ok=True)
+    return copy_dir
+
+
+def test_round_trip_lazy_load(history, sarima_dir):
+    model = GasModel(save_dir=sarima_dir, max_pq=0)
+    model.load_or_train(history['Prices'])
+    # Caricamento pigro: le previsioni arrivano dal JSON, senza ricostruire il modello
+    assert model._pending_entry is not None
+    prices = model.predict_values(DATES, history)['Price']
+    assert model._pending_entry is not None
+
+    # Ricostruito dai parametri salvati, il modello prevede gli stessi prezzi
+    rebuilt = GasModel(save_dir=sarima_dir, max_pq=0)
+    rebuilt.load_or_train(history['Prices'])
+    rebuilt.results.get_forecast(1)
+    rebuilt._invalidate_forecast_cache()
+    np.testing.assert_allclose(rebuilt.predict_values(DATES, history)['Price'], prices, rtol=1e-10)
+
+
+def test_find_prefix_reads_only_the_match(history, registry_dir, monkeypatch):
+    series = history['Prices']
+    months = pd.date_range(series.index[-1], periods=3, freq='ME')[1:]
+    extended = pd.concat([series, pd.Series(series.iloc[-12:-10].values, index=months, name=series.name)]).asfreq('ME')
+
+    model = GasModel(save_dir=registry_dir, max_pq=0)
+    # Voci di altre configurazioni: non devono essere lette
+    for max_pq in (1, 2, 3):
+        key = model.registry.key(series, {**model._search_config(), 'max_pq': max_pq})
+        with open(model.registry._path(key), 'w') as f:
+            json.dump({'key': key}, f)
+
+    loads = []
+    real_load = json.load
+    monkeypatch.setattr(json, 'load', lambda f: loads.append(f.name) or real_load(f))
+    entry = model.registry.find_prefix(extended, model._search_config())
+    assert entry['nobs'] == len(series)
+    assert len(loads) == 1
+    monkeypatch.undo()
+
+    # Aggiornamento incrementale dal prefisso: stesso risultato del filtro sullo storico esteso
+    model.load_or_train(extended)
+    assert model.results.nobs == len(extended)
+    reference = ModelRegistry.rebuild(entry, extended)
+    np.testing.assert_allclose(model.results.get_forecast(12).predicted_mean,
+                               reference.get_forecast(12).predicted_mean, rtol=1e-10)
+
+    # La voce estesa è registrata: ora la ricerca per dati esatti la trova
+    assert model.registry.get(extended, model._search_config())['nobs'] == len(extended)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.pricing import StorageContract
+from src.portfolio import contract_records
+from src.sensitivities import SensitivityEngine, SENSITIVITY_PARAMS
+
+CONTRACTS = pd.DataFrame({
+    'injection_dates': [['06/30/24', '07/31/24', '08/31/24'], ['04/30/25', '05/31/25'], ['10/31/20'], []],
+    'withdrawal_dates': [['12/31/24', '01/31/25'], ['01/15/26', '02/28/26', '03/31/26'], ['01/31/21'], ['12/31/24']],
+    'max_volume': [1000000, 120000, 500000, 500000],
+    'inj_rate': [50000, 50000, 40000, 50000],
+    'with_rate': [50000, 70000, 40000, 50000],
+    'inj_cost': [0.01, 0.0, 0.02, 0.01],
+}, index=['A', 'B', 'C', 'D'])
+
+
+def test_book_matches_single_contract(price_model, history):
+    engine = SensitivityEngine(price_model, history)
+    summary, deltas = engine.book_greeks(CONTRACTS)
+    summary = summary.set_index('contract_id')
+
+    for contract_id, params, inj_dates, wit_dates in contract_records(CONTRACTS):
+        npv, delta, sens = engine.contract_greeks(StorageContract(**params), inj_dates, wit_dates)
+
+        assert summary.loc[contract_id, 'NPV'] == pytest.approx(npv, rel=1e-12, abs=1e-6)
+        for name in SENSITIVITY_PARAMS:
+            assert summary.loc[contract_id, name] == pytest.approx(sens[name], rel=1e-9, abs=1e-6)
+        book_delta = deltas.loc[contract_id]
+        np.testing.assert_allclose(book_delta[delta.index], delta, rtol=1e-9, atol=1e-6)
+        # I bucket che il contratto non tocca hanno delta nullo
+        assert (book_delta.drop(delta.index) == 0).all()
+
+
+def test_greeks_match_full_revaluation(price_model, history):
+    engine = SensitivityEngine(price_model, history)
+    summary, _ = engine.book_greeks(CONTRACTS.loc[['A']])
+    greeks = summary.iloc[0]
+    inj_dates, wit_dates = CONTRACTS.loc['A', 'injection_dates'], CONTRACTS.loc['A', 'withdrawal_dates']
+
+    def revalue(storage_cost):
+        contract = StorageContract(storage_cost=storage_cost)
+        return contract.calculate_valuation(inj_dates, wit_dates, price_model, history)[0]
+
+    # L'NPV è lineare nel costo di stoccaggio: la differenza centrale è esatta
+    h = 0.01
+    full = (revalue(0.05 + h) - revalue(0.05 - h)) / (2 * h)
+    assert greeks['storage_cost'] == pytest.approx(full, rel=1e-9)
+    # A mano: volume in magazzino x giorni / 30 tra un evento e il successivo
+    assert greeks['storage_cost'] == pytest.approx(-(50000 * 31 + 100000 * 31 + 150000 * 122 + 100000 * 31) / 30)
+
+    # Delta parallelo: spostamento uniforme dei prezzi previsti
+    contract = StorageContract()
+    dates, actions, raw_dates = contract._sort_events(inj_dates, wit_dates)
+    base = price_model.predict_values(raw_dates, history)
+    future = (base['Label'] == 'PREVISIONE').values
+    bumped = [contract._value_schedule(dates, actions, base['Price'].values + b * future)[0] for b in (1.0, -1.0)]
+    assert greeks['parallel_delta'] == pytest.approx((bumped[0] - bumped[1]) / 2, rel=1e-9)
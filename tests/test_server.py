@@ -0,0 +1,86 @@
+import json
+import time
+import asyncio
+import tempfile
+import threading
+import urllib.request
+import pytest
+from src.model import GasModel
+from src.forecasters import make_engine
+from src.server import PricingServer
+
+
+@pytest.fixture
+def server(history):
+    """Server reale su una porta libera di localhost, con il suo event loop in un thread."""
+    model = GasModel(save_dir=tempfile.mkdtemp(), engine=make_engine('holt-winters'))
+    model.load_or_train(history['Prices'])
+    pricing = PricingServer(model, history, horizon_months=12)
+
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(pricing.start('127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    pricing.url = f"http://127.0.0.1:{listener.sockets[0].getsockname()[1]}"
+    yield pricing
+
+    asyncio.run_coroutine_threadsafe(pricing.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def request(server, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    with urllib.request.urlopen(urllib.request.Request(server.url + path, data=data), timeout=30) as response:
+        return json.loads(response.read())
+
+
+def test_price_matches_model(server, history):
+    expected = server.model.predict_values(['10/31/23', '05/15/25', '03/15/30'], history)
+    for i, date in enumerate(['10/31/23', '05/15/25', '03/15/30']):
+        row = request(server, f'/price?date={date}')
+        assert row['price'] == pytest.approx(expected['Price'].iloc[i], rel=1e-12)
+        assert row['label'] == expected['Label'].iloc[i]
+
+
+def test_value_matches_contract(server, history):
+    from src.pricing import StorageContract
+
+    body = {'injection_dates': ['06/30/24', '07/31/24'], 'withdrawal_dates': ['12/31/24', '01/31/31'],
+            'max_volume': 80000}
+    npv, ledger = StorageContract(max_volume=80000).calculate_valuation_vectorized(
+        body['injection_dates'], body['withdrawal_dates'], server.model, history)
+
+    payload = request(server, '/value', body)
+    assert payload['npv'] == pytest.approx(npv, rel=1e-12)
+    assert len(payload['ledger']) == len(ledger)
+
+
+def test_refit_extends_history(server):
+    before = server.state
+    payload = request(server, '/refit', {'dates': ['10/31/24', '11/30/24'], 'prices': [12.4, 12.9]})
+
+    assert payload['last_date'] == '2024-11-30'
+    assert server.state.model is not before.model
+    assert server.df_history.index.freqstr == 'ME'
+    assert request(server, '/price?date=11/30/24')['price'] == pytest.approx(12.9)
+
+
+def test_forecast_past_curve_does_not_block_loop(server, monkeypatch):
+    # Previsione lenta oltre la curva precalcolata: /health deve rispondere nel frattempo
+    slow = server.model.predict_values
+
+    def predict_values(*args, **kwargs):
+        time.sleep(1.0)
+        return slow(*args, **kwargs)
+
+    monkeypatch.setattr(server.model, 'predict_values', predict_values)
+    worker = threading.Thread(target=request, args=(server, '/price?date=12/31/35'))
+    worker.start()
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    assert request(server, '/health')['status'] == 'ok'
+    assert time.perf_counter() - start < 0.5
+    worker.join()
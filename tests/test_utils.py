@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from src.utils import DailyInterpolator, resolve_n_jobs, to_daily_resolution
+
+
+@pytest.mark.parametrize('method', ['linear', 'quadratic', 'cubic'])
+def test_interpolator_matches_daily_resolution(history, method):
+    daily = to_daily_resolution(history, method=method)
+    curve = DailyInterpolator.from_frame(history, method=method)
+
+    values = curve(daily.index)
+    if method == 'linear':
+        np.testing.assert_array_equal(values, daily.iloc[:, 0].values)
+    else:
+        np.testing.assert_allclose(values, daily.iloc[:, 0].values, rtol=1e-10)
+
+
+def test_interpolator_scalar_query(history):
+    curve = DailyInterpolator.from_frame(history)
+    day = history.index[10]
+    assert curve(day) == history.iloc[10, 0]
+
+
+def test_resolve_n_jobs():
+    assert resolve_n_jobs(1, 10) == 1
+    assert resolve_n_jobs(None) == 1
+    assert resolve_n_jobs(8, 3) == 3
+    assert resolve_n_jobs(-1, 0) == 1
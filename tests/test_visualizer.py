@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from src.visualizer import lttb, minmax_downsample
+
+
+@pytest.fixture
+def signal():
+    rng = np.random.default_rng(2)
+    x = np.arange(10_000)
+    return x, np.sin(x / 500) + rng.standard_normal(len(x)) * 0.1
+
+
+@pytest.mark.parametrize('n_out', [3, 10, 2000])
+def test_lttb_point_count_and_endpoints(signal, n_out):
+    x, y = signal
+    idx = lttb(x, y, n_out)
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert (np.diff(idx) > 0).all()
+
+    # Un punto interno per ciascun bucket
+    edges = np.linspace(1, len(x) - 1, n_out - 1).astype(np.int64)
+    assert ((idx[1:-1] >= edges[:-1]) & (idx[1:-1] < edges[1:])).all()
+
+
+def test_lttb_keeps_short_series(signal):
+    x, y = signal
+    np.testing.assert_array_equal(lttb(x[:50], y[:50], 100), np.arange(50))
+
+
+@pytest.mark.parametrize('n_out', [4, 101, 2000])
+def test_minmax_point_count_and_extremes(signal, n_out):
+    _, y = signal
+    idx = minmax_downsample(y, n_out)
+    assert len(idx) <= n_out
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+    assert (np.diff(idx) > 0).all()
+
+    # Minimo e massimo di ogni bucket sono sempre conservati
+    n_buckets = (n_out - 2) // 2
+    edges = np.linspace(0, len(y), n_buckets + 1).astype(np.int64)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        assert lo + np.argmin(y[lo:hi]) in idx
+        assert lo + np.argmax(y[lo:hi]) in idx
+
+
+def test_minmax_keeps_short_series(signal):
+    _, y = signal
+    np.testing.assert_array_equal(minmax_downsample(y[:50], 100), np.arange(50))